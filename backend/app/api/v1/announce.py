@@ -1,14 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.models.models import Announcement
+from app.core.pagination import MAX_PAGE_SIZE, page_of
+from app.db.session import get_async_db, get_db
+from app.models.models import Announcement, AnnouncementDelivery
 from app.schemas.announce import (
     AnnounceGenerateRequest,
     AnnounceGenerateResponse,
     AnnounceSendRequest,
     AnnounceSendResponse,
+    AnnouncementDeliveriesResponse,
+)
+from app.services.announce_dispatch import (
+    CHANNELS,
+    ProviderNotConfigured,
+    WhatsAppLinkBackend,
+    delivery_counts,
+    dispatcher,
+    normalize_recipients,
 )
-import urllib.parse
 
 router = APIRouter(prefix="/api/v1/announce", tags=["announce"])
 
@@ -37,24 +49,66 @@ def generate_announcement(payload: AnnounceGenerateRequest, db: Session = Depend
 
 # 2. Send announcement
 @router.post("/send", response_model=AnnounceSendResponse)
-def send_announcement(payload: AnnounceSendRequest, db: Session = Depends(get_db)):
-    announcement = db.query(Announcement).filter(Announcement.id == payload.announcement_id).first()
+async def send_announcement(payload: AnnounceSendRequest, db: AsyncSession = Depends(get_async_db)):
+    if payload.channel not in CHANNELS:
+        raise HTTPException(status_code=400, detail=f"Unknown channel. Use one of: {', '.join(CHANNELS)}")
+    try:
+        dispatcher.backend(payload.channel)
+    except ProviderNotConfigured as e:
+        # Nothing would be delivered; don't report recipients as queued
+        raise HTTPException(status_code=400, detail=str(e))
+
+    announcement = await db.get(Announcement, payload.announcement_id)
     if not announcement:
         raise HTTPException(status_code=404, detail="Announcement not found")
+    content = announcement.content
+    # Fan-out uses its own sessions; don't hold this connection meanwhile
+    await db.close()
+
+    recipients = normalize_recipients(payload.channel, payload.recipients)
+    if not recipients:
+        raise HTTPException(status_code=400, detail="No valid recipients")
 
     link = None
     if payload.channel == "whatsapp":
-        text = announcement.content
-        encoded_text = urllib.parse.quote(text)
-
         # WhatsApp expects one recipient per link
-        recipient = payload.recipients[0].replace("+", "").replace(" ", "")
-        link = f"https://wa.me/{recipient}?text={encoded_text}"
+        link = WhatsAppLinkBackend.link(recipients[0], content)
+
+    dispatcher.submit(announcement.id, payload.channel, content, recipients)
 
     return AnnounceSendResponse(
         announcement_id=announcement.id,
         channel=payload.channel,
-        recipients=payload.recipients,
+        recipients=recipients,
         link=link,
-        status="sent"
+        status="queued"
     )
+
+
+@router.get("/{announcement_id}/deliveries", response_model=AnnouncementDeliveriesResponse)
+async def get_deliveries(
+    announcement_id: int,
+    status: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Delivery counts per channel and status, plus one keyset page of per-recipient rows."""
+    query = (
+        select(AnnouncementDelivery)
+        .where(AnnouncementDelivery.announcement_id == announcement_id)
+        .order_by(AnnouncementDelivery.id)
+        .limit(limit + 1)
+    )
+    if status:
+        query = query.where(AnnouncementDelivery.status == status)
+    if after is not None:
+        query = query.where(AnnouncementDelivery.id > after)
+    deliveries, next_cursor = page_of((await db.execute(query)).scalars().all(), limit, "id")
+
+    return {
+        "announcement_id": announcement_id,
+        "counts": await delivery_counts(announcement_id),
+        "deliveries": deliveries,
+        "next_cursor": next_cursor,
+    }
@@ -1,15 +1,62 @@
-from fastapi import APIRouter, Depends,HTTPException
+import hashlib
+import json
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.core.cache import ReadThroughCache
+from app.core.pagination import MAX_PAGE_SIZE, page_of, parse_fields
+from app.core.sessions import GRACE_SECONDS, session_store
+from app.core.sse import KEEPALIVE, SSE_HEADERS, sse_event, with_keepalive
+from app.db.session import AsyncSessionLocal, get_async_db, get_db
 from app.models.models import *
 from app.schemas.exams import *
 from app.models.models import Student
-import uuid
-
-from app.schemas.marks import ExamStatsResponse, MarksResponse, MarksSummaryResponse
+from app.services.autosave import autosave_buffer, clear_drafts, exam_items, load_drafts
+from app.services.exam_events import publish_exam_event, publish_exam_event_from_thread, watch_exam
+from app.services.export import stream_export
+from app.services.generation_stream import stream_exam_preview
+from app.services import item_analysis
+from app.services.item_analysis import analyze_items
+from app.services.stats import summary_from_rollup
+from app.services.grading import first_items, grade_exam_responses, grade_many, load_answer_key_async, resolve_item
+from typing import Literal, Optional
+
+from app.schemas.marks import ExamStatsResponse, ItemAnalysisResponse, MarksResponse, MarksSummaryResponse
 
 router = APIRouter(prefix="/api/v1/exams", tags=["exams"])
 
+DEFAULT_EXAM_MINUTES = 180
+MAX_EXAM_MINUTES = 12 * 60
+STATS_FIELDS = ("student_id", "name", "total_marks", "max_marks")
+LIVE_KEEPALIVE_SECONDS = 15
+
+# Idempotency-Key -> payload digest, newline, serialized ExamSubmitResponse
+submission_results = ReadThroughCache("exam-submissions", ttl=float(os.getenv("SUBMISSION_IDEMPOTENCY_TTL", "86400")))
+
+# Marks.results trimmed to the MarksSummaryResponse shape, serialized by Postgres
+EXAM_RESULTS_QUERY = text("""
+    SELECT json_build_object(
+        'total_marks', m.total_marks,
+        'results', COALESCE((
+            SELECT jsonb_agg(jsonb_build_object(
+                'feedback', r.value -> 'feedback',
+                'correct_answer', r.value -> 'correct_answer',
+                'student_answer', r.value -> 'student_answer',
+                'is_correct', r.value -> 'is_correct'
+            ) ORDER BY r.ordinality)
+            FROM jsonb_array_elements(m.results) WITH ORDINALITY AS r(value, ordinality)
+        ), '[]'::jsonb)
+    )::text
+    FROM marks m
+    WHERE m.exam_id = :exam_id AND m.student_id = :student_id
+    LIMIT 1
+""")
+
 @router.post("/generate", response_model=ExamGenerateResponse)
 def generate_exam(payload: ExamGenerateRequest, db: Session = Depends(get_db)):
     # 1. Create exam record
@@ -53,143 +100,214 @@ def generate_exam(payload: ExamGenerateRequest, db: Session = Depends(get_db)):
 
 
 
-@router.post("/{exam_id}/submit", response_model=ExamSubmitResponse)
-def submit_exam(exam_id: int, payload: ExamSubmitRequest, db: Session = Depends(get_db)):
-    partial_grades = []
-    submission_id = None
-
-    for ans in payload.answers:
-        # Fetch the question to grade
-        question = db.query(Question).filter(
-            Question.id == ans.question_id,
-            Question.exam_id == exam_id
-        ).first()
-
-        if not question:
-            raise HTTPException(status_code=404, detail=f"Question {ans.question_id} not found")
-
-        # Simple grading logic
-        marks_obtained = 0
-        if question.question_type == "multiple_choice":
-            if ans.response.strip().lower() == question.answer.strip().lower():
-                marks_obtained = question.marks
-        elif question.question_type == "short_answer":
-            if ans.response.strip().lower() == question.answer.strip().lower():
-                marks_obtained = question.marks
-        # (extend with fuzzy matching, partial credit, etc.)
-
-        # Save student response
-        submission = StudentResponse(
-            student_id=payload.student_id,
-            exam_id=exam_id,
-            question_id=ans.question_id,
-            response=ans.response,
-            marks_obtained=marks_obtained
-        )
-        db.add(submission)
-        db.commit()
-        db.refresh(submission)
-
-        submission_id = submission.id
-        partial_grades.append({
-            "question_id": ans.question_id,
-            "marks_obtained": marks_obtained
-        })
-
-    return ExamSubmitResponse(
-        submission_id=submission_id,
-        partial_grades=partial_grades,
-        status="received"
+@router.post("/generate/stream")
+async def stream_generated_exam(payload: ExamGenerateRequest, regenerate: bool = False):
+    """
+    Generates an exam and streams each preview question as a Server-Sent
+    Event while it is produced, then `done` with the saved exam_id.
+    """
+    return StreamingResponse(
+        with_keepalive(stream_exam_preview(payload, regenerate)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
     )
-    
-@router.post("/{exam_id}/grade", response_model=ExamGradeResponse)
-def grade_exam(exam_id: int, payload: ExamGradeRequest, db: Session = Depends(get_db)):
-    responses = db.query(StudentResponse).filter(
-        StudentResponse.exam_id == exam_id,
-        StudentResponse.student_id == payload.student_id  # use student_id instead of submission_id
-    ).all()
 
-    if not responses:
-        raise HTTPException(status_code=404, detail="Submission not found")
-
-    total_marks = 0
-    details = []
 
-    for resp in responses:
-        question = db.query(Question).filter(Question.id == resp.question_id).first()
-        if not question:
-            continue
+@router.get("/export")
+async def export_results(
+    exam_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    kind: Literal["marks", "responses"] = "marks",
+    format: Literal["csv", "ndjson"] = "csv",
+):
+    """Streams every Marks or StudentResponse row of an exam or class as CSV/NDJSON."""
+    if exam_id is None and class_id is None:
+        raise HTTPException(status_code=400, detail="Provide exam_id or class_id")
+
+    scope = f"exam_{exam_id}" if exam_id is not None else f"class_{class_id}"
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(kind, format, exam_id=exam_id, class_id=class_id),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={scope}_{kind}.{format}"}
+    )
 
-        marks_obtained = 0
-        if question.answer and resp.response.strip().lower() == question.answer.strip().lower():
-            marks_obtained = question.marks
 
-        resp.marks_obtained = marks_obtained
-        db.add(resp)
-        db.commit()
-        db.refresh(resp)
+@router.post("/{exam_id}/submit", response_model=ExamSubmitResponse)
+async def submit_exam(exam_id: int, payload: ExamSubmitRequest, idempotency_key: Optional[str] = Header(None)):
+    # Hash lookup in the session store, no DB round-trip
+    if not await session_store.validate(payload.session_token, exam_id, payload.student_id):
+        raise HTTPException(status_code=403, detail="Invalid or expired exam session")
 
-        total_marks += marks_obtained
-        details.append({
-            "question_id": resp.question_id,
-            "response": resp.response,
-            "marks_obtained": marks_obtained
-        })
+    if idempotency_key is None:
+        body = await _submit_answers(exam_id, payload)
+    else:
+        # Retries (and concurrent duplicates) with the same key share one
+        # submission and get its stored response back
+        digest = _submission_digest(payload)
+
+        async def submit():
+            return digest + b"\n" + await _submit_answers(exam_id, payload)
+
+        stored = await submission_results.get_or_load(f"{exam_id}:{payload.student_id}:{idempotency_key}", submit)
+        stored_digest, _, body = stored.partition(b"\n")
+        if stored_digest != digest:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with different answers")
+    return Response(content=body, media_type="application/json")
+
+
+def _submission_digest(payload: ExamSubmitRequest) -> bytes:
+    """Hash of the submitted answers, stored with the result of an Idempotency-Key."""
+    answers = json.dumps(jsonable_encoder(payload.answers), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(answers.encode("utf-8")).hexdigest().encode("ascii")
+
+
+def _resolve_answers(items, answers) -> dict:
+    """item_id -> response for the submitted answers; 404 for anything not in the exam."""
+    first = first_items(items)
+    resolved = {}
+    for ans in answers:
+        item_id = resolve_item(items, first, ans.item_id, ans.question_id)
+        if item_id is None:
+            if ans.item_id is not None:
+                raise HTTPException(status_code=404, detail=f"Question item {ans.item_id} not found")
+            raise HTTPException(status_code=404, detail=f"Question {ans.question_id} not found")
+        resolved[item_id] = ans.response
+    return resolved
+
+
+async def _submit_answers(exam_id: int, payload: ExamSubmitRequest) -> bytes:
+    async with AsyncSessionLocal() as db:
+        # The exam's whole answer key, every question item, in one query
+        answer_key = await load_answer_key_async(db, exam_id)
+        submitted = _resolve_answers(answer_key, payload.answers)
+
+        # Autosaved answers (buffer first, flushed drafts otherwise), overridden by the payload
+        drafts = autosave_buffer.peek(exam_id, payload.student_id)
+        if drafts is None:
+            drafts = await load_drafts(db, exam_id, payload.student_id)
+        # A draft whose item has since left the exam is dropped, not fatal
+        merged = {**{item_id: r for item_id, r in drafts.items() if item_id in answer_key}, **submitted}
+        if not merged:
+            raise HTTPException(status_code=400, detail="No answers submitted")
+        answers = list(merged.items())
+
+        # Grade in memory
+        scores = grade_many(answer_key, answers)
+        rows = []
+        partial_grades = []
+        for (item_id, response), marks_obtained in zip(answers, scores):
+            question_id = answer_key[item_id]["question_id"]
+            rows.append({
+                "student_id": payload.student_id,
+                "exam_id": exam_id,
+                "question_id": question_id,
+                "item_id": item_id,
+                "response": response,
+                "marks_obtained": marks_obtained
+            })
+            partial_grades.append({
+                "question_id": question_id,
+                "item_id": item_id,
+                "marks_obtained": marks_obtained
+            })
+
+        # Save all responses with one multi-row upsert and a single commit;
+        # a resubmission overwrites the same rows instead of duplicating them
+        stmt = pg_insert(StudentResponse).values(rows)
+        inserted_ids = (await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StudentResponse.exam_id, StudentResponse.student_id, StudentResponse.item_id],
+                set_={"response": stmt.excluded.response, "marks_obtained": stmt.excluded.marks_obtained}
+            ).returning(StudentResponse.id)
+        )).scalars().all()
+        await clear_drafts(db, exam_id, payload.student_id)
+        await db.commit()
+        autosave_buffer.discard(exam_id, payload.student_id)
+        item_analysis.invalidate(exam_id)
+
+    # Inside the idempotent loader, so replayed submissions don't re-announce
+    await publish_exam_event(exam_id, "submitted", student_id=payload.student_id, answered=len(rows), score=sum(scores))
+
+    result = ExamSubmitResponse(
+        submission_id=max(inserted_ids),
+        partial_grades=partial_grades,
+        status="received"
+    )
+    return json.dumps(jsonable_encoder(result)).encode("utf-8")
+
+@router.put("/{exam_id}/autosave", response_model=AutosaveResponse)
+async def autosave_answers(exam_id: int, payload: AutosaveRequest):
+    if not await session_store.validate(payload.session_token, exam_id, payload.student_id):
+        raise HTTPException(status_code=403, detail="Invalid or expired exam session")
+
+    # Checked against the cached item list, so a bad id never reaches the flush
+    items = await exam_items(
+        exam_id,
+        expected_items=(ans.item_id for ans in payload.answers),
+        expected_questions=(ans.question_id for ans in payload.answers if ans.item_id is None),
+    )
+    answers = _resolve_answers(items, payload.answers)
 
-    # 🔑 Insert or update Marks record
-    marks_record = db.query(Marks).filter(
-        Marks.exam_id == exam_id,
-        Marks.student_id == payload.student_id
-    ).first()
+    # Buffered in memory; flushed to draft_responses in batches by a background task
+    autosave_buffer.save(
+        exam_id, payload.student_id,
+        ((item_id, items[item_id]["question_id"], response) for item_id, response in answers.items())
+    )
+    await publish_exam_event(exam_id, "autosaved", student_id=payload.student_id, saved=len(payload.answers))
+    return AutosaveResponse(exam_id=exam_id, saved=len(payload.answers))
 
-    if marks_record:
-        marks_record.total_marks = total_marks
-    else:
-        marks_record = Marks(
-            student_id=payload.student_id,
-            exam_id=exam_id,
-            total_marks=total_marks,
-            max_marks=sum(q.marks for q in db.query(Question).filter(Question.exam_id == exam_id).all())
-        )
-        db.add(marks_record)
 
-    db.commit()
-    db.refresh(marks_record)
+@router.post("/{exam_id}/grade", response_model=ExamGradeResponse)
+def grade_exam(exam_id: int, payload: ExamGradeRequest, db: Session = Depends(get_db)):
+    graded = grade_exam_responses(db, exam_id, student_id=payload.student_id)
+    item_analysis.invalidate(exam_id)
+    if not graded["responses_graded"]:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    publish_exam_event_from_thread(
+        exam_id, "graded",
+        student_id=payload.student_id, total_marks=graded["total_marks"], max_marks=graded["max_marks"]
+    )
 
     return ExamGradeResponse(
         submission_id=payload.submission_id,
-        total_marks=total_marks,
+        total_marks=graded["total_marks"],
         graded=True,
-        details=details
+        details=graded["details"]
     )
 
-    
-@router.get("/{exam_id}/student/{student_id}", response_model=MarksSummaryResponse)
-def get_exam_results(exam_id: int, student_id: int, db: Session = Depends(get_db)):
-    record = (
-        db.query(Marks)
-        .filter(Marks.exam_id == exam_id, Marks.student_id == student_id)
-        .first()
+
+@router.post("/{exam_id}/grade-all", response_model=ExamBatchGradeResponse)
+def grade_whole_exam(exam_id: int, db: Session = Depends(get_db)):
+    graded = grade_exam_responses(db, exam_id)
+    item_analysis.invalidate(exam_id)
+    if not graded["responses_graded"]:
+        raise HTTPException(status_code=404, detail="No submissions found for this exam")
+    publish_exam_event_from_thread(
+        exam_id, "graded",
+        students_graded=graded["students_graded"], max_marks=graded["max_marks"]
     )
 
-    if not record:
+    return ExamBatchGradeResponse(
+        exam_id=exam_id,
+        students_graded=graded["students_graded"],
+        responses_graded=graded["responses_graded"],
+        max_marks=graded["max_marks"]
+    )
+
+    
+@router.get("/{exam_id}/student/{student_id}", response_model=MarksSummaryResponse)
+async def get_exam_results(exam_id: int, student_id: int, db: AsyncSession = Depends(get_async_db)):
+    # The projection runs in Postgres, so only the four keys the client
+    # needs leave the database and the JSON is returned as-is.
+    document = (await db.execute(
+        EXAM_RESULTS_QUERY, {"exam_id": exam_id, "student_id": student_id}
+    )).scalar()
+
+    if document is None:
         raise HTTPException(status_code=404, detail="No results found for this exam/student")
 
-    # Extract only the fields you want from results JSON
-    filtered_results = [
-        {
-            "feedback": r.get("feedback"),
-            "correct_answer": r.get("correct_answer"),
-            "student_answer": r.get("student_answer"),
-            "is_correct": r.get("is_correct"),
-        }
-        for r in record.results
-    ]
-
-    return {
-        "total_marks": record.total_marks,
-        "results": filtered_results
-    }
+    return Response(content=document, media_type="application/json")
 
 
 
@@ -221,43 +339,151 @@ def download_exam(exam_id: int, db: Session = Depends(get_db)):
 
 # 3. Start exam session
 @router.post("/{exam_id}/start", response_model=ExamStartResponse)
-def start_exam_session(exam_id: int, db: Session = Depends(get_db)):
-    exam = db.query(Exam).filter(Exam.id == exam_id).first()
+async def start_exam_session(
+    exam_id: int,
+    student_id: int,
+    duration_minutes: int = Query(DEFAULT_EXAM_MINUTES, ge=1, le=MAX_EXAM_MINUTES),
+    db: AsyncSession = Depends(get_async_db),
+):
+    exam = await db.get(Exam, exam_id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
 
     if exam.status != "published":
         raise HTTPException(status_code=400, detail="Exam must be published before starting")
 
-    session_token = str(uuid.uuid4())
+    ttl = duration_minutes * 60 + GRACE_SECONDS
+    session = await session_store.create(exam_id, ttl, student_id=student_id)
+    session_token = session["token"]
+    await publish_exam_event(exam_id, "started", student_id=student_id, expires_in=ttl)
     link = f"https://teach-assistant.com/exams/{exam_id}/session/{session_token}"
 
     return ExamStartResponse(
         exam_id=exam.id,
         session_token=session_token,
-        link=link
+        link=link,
+        expires_in=ttl
+    )
+
+
+@router.get("/{exam_id}/sessions", response_model=ExamSessionsResponse)
+async def get_active_sessions(exam_id: int):
+    sessions = await session_store.active_for_exam(exam_id)
+    return ExamSessionsResponse(
+        exam_id=exam_id,
+        active_sessions=len(sessions),
+        student_ids=sorted({s["student_id"] for s in sessions if s["student_id"] is not None})
+    )
+
+
+@router.post("/{exam_id}/close", response_model=ExamCloseResponse)
+async def close_exam(exam_id: int, db: AsyncSession = Depends(get_async_db)):
+    exam = await db.get(Exam, exam_id)
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    exam.status = "completed"
+    await db.commit()
+    expired = await session_store.expire_exam(exam_id)
+    await publish_exam_event(exam_id, "closed", sessions_expired=expired)
+
+    return ExamCloseResponse(
+        exam_id=exam_id,
+        status=exam.status,
+        sessions_expired=expired
     )
     
-@router.get("/{exam_id}/stats", response_model=ExamStatsResponse)
-def get_exam_stats(exam_id: int, db: Session = Depends(get_db)):
-    records = db.query(Marks).filter(Marks.exam_id == exam_id).all()
+@router.get("/{exam_id}/live")
+async def watch_exam_live(exam_id: int):
+    """
+    Server-Sent Events feed of the exam: a `snapshot` of the active sessions,
+    then started / autosaved / submitted / graded / closed as they happen.
+    """
+    async def events():
+        async for message in watch_exam(exam_id, lambda: _live_snapshot(exam_id), LIVE_KEEPALIVE_SECONDS):
+            yield KEEPALIVE if message is None else sse_event(message["type"], message)
 
-    if not records:
-        raise HTTPException(status_code=404, detail="No students attended this exam")
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
 
-    stats = []
-    for rec in records:
-        student = db.query(User).filter(User.id == rec.student_id).first()
-        student_name = student.name if student else f"Student {rec.student_id}"
-
-        stats.append({
-            "student_id": rec.student_id,
-            "name": student_name,
-            "total_marks": rec.total_marks,
-            "max_marks": rec.max_marks
-        })
 
+@router.websocket("/{exam_id}/live/ws")
+async def watch_exam_live_ws(websocket: WebSocket, exam_id: int):
+    """Same feed as /live, one JSON message per event."""
+    await websocket.accept()
+    try:
+        async for message in watch_exam(exam_id, lambda: _live_snapshot(exam_id), LIVE_KEEPALIVE_SECONDS):
+            # Keepalives double as disconnect detection: sending to a closed socket raises
+            await websocket.send_json(message or {"type": "keepalive", "exam_id": exam_id})
+    except WebSocketDisconnect:
+        pass
+
+
+async def _live_snapshot(exam_id: int):
+    sessions = await session_store.active_for_exam(exam_id)
     return {
-        "exam_id": exam_id,
-        "stats": stats
+        "active_sessions": len(sessions),
+        "student_ids": sorted({s["student_id"] for s in sessions if s["student_id"] is not None}),
     }
+
+
+@router.get("/{exam_id}/stats", response_model=ExamStatsResponse, response_model_exclude_unset=True)
+async def get_exam_stats(
+    exam_id: int,
+    fields: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Per-student scores plus the exam summary. With `limit`/`after` the stats
+    come in keyset pages on student_id (the summary only on the first page);
+    `fields=` picks which stats columns are selected and returned.
+    """
+    selected = parse_fields(fields, STATS_FIELDS)
+    paged = after is not None or limit is not None
+
+    columns = [Marks.student_id]
+    columns += [getattr(Marks, name) for name in ("total_marks", "max_marks") if name in selected]
+    query = select(*columns).where(Marks.exam_id == exam_id)
+    if "name" in selected:
+        # One JOIN instead of a User lookup per Marks row
+        query = query.add_columns(User.name).outerjoin(User, User.id == Marks.student_id)
+    if paged:
+        # Served by uq_marks_exam_student (exam_id, student_id)
+        query = query.order_by(Marks.student_id)
+        if after is not None:
+            query = query.where(Marks.student_id > after)
+        if limit is not None:
+            query = query.limit(limit + 1)
+    else:
+        query = query.order_by(Marks.total_marks.desc())
+
+    records, next_cursor = page_of((await db.execute(query)).all(), limit, "student_id")
+
+    if not records and after is None:
+        raise HTTPException(status_code=404, detail="No students attended this exam")
+
+    stats = []
+    for record in records:
+        row = record._mapping
+        entry = {name: row[name] for name in selected if name != "name"}
+        if "name" in selected:
+            entry["name"] = row["name"] or f"Student {record.student_id}"
+        stats.append(entry)
+
+    response = {"exam_id": exam_id, "stats": stats}
+    if paged:
+        response["next_cursor"] = next_cursor
+    if after is None:
+        # The summary covers the whole exam: one primary-key read of the
+        # trigger-maintained rollup, whatever page or fields were asked for
+        response["summary"] = summary_from_rollup(await db.get(ExamRollup, exam_id))
+    return response
+
+
+@router.get("/{exam_id}/item-analysis", response_model=ItemAnalysisResponse)
+def get_item_analysis(exam_id: int, db: Session = Depends(get_db)):
+    analysis = analyze_items(db, exam_id)
+    if not analysis["items"]:
+        raise HTTPException(status_code=404, detail="No questions found for this exam")
+    return analysis
@@ -0,0 +1,73 @@
+from typing import Any, Dict, Literal
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+from app.core.sse import KEEPALIVE, SSE_HEADERS, sse_event
+from app.schemas.jobs import JobQueueStats, JobStatusResponse, JobSubmitResponse
+from app.services.generation_jobs import Job, job_queue
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["jobs"])
+
+MAX_WAIT_SECONDS = 30
+STREAM_KEEPALIVE_SECONDS = 15
+
+JobKind = Literal["exam", "lessonplan", "announcement", "exam_submit"]
+
+
+@router.post("/{kind}", response_model=JobSubmitResponse, status_code=202)
+async def submit_job(kind: JobKind, payload: Dict[str, Any], response: Response, regenerate: bool = False):
+    """
+    Queues a generation webhook call and returns its job id immediately.
+    The payload is forwarded to the n8n webhook unchanged. Exam and lesson
+    plan requests may be answered from the generation cache (or joined to an
+    identical running job) unless regenerate=true.
+    """
+    job = job_queue.submit(kind, payload, regenerate=regenerate)
+    response.headers["Location"] = f"{router.prefix}/{job.id}"
+    return {"job_id": job.id, "kind": job.kind, "status": job.status}
+
+
+@router.get("/stats", response_model=JobQueueStats)
+def get_job_stats():
+    return job_queue.stats()
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS)):
+    """Job status and result. `wait` long-polls up to that many seconds for the job to finish."""
+    job = _get_job_or_404(job_id)
+    if wait:
+        await job.wait(wait)
+    return job.to_dict()
+
+
+@router.get("/{job_id}/stream")
+async def stream_job(job_id: str):
+    """Server-Sent Events: a `status` event per change, then `result` (or `error`) when done."""
+    job = _get_job_or_404(job_id)
+    return StreamingResponse(
+        _job_events(job),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+def _get_job_or_404(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+async def _job_events(job: Job):
+    status = job.status
+    yield sse_event("status", {"job_id": job.id, "status": status})
+    while not job.finished:
+        changed = await job.wait_for_change(status, timeout=STREAM_KEEPALIVE_SECONDS)
+        if changed == status:
+            yield KEEPALIVE
+            continue
+        status = changed
+        yield sse_event("status", {"job_id": job.id, "status": status})
+    yield sse_event("result" if job.error is None else "error", job.to_dict())
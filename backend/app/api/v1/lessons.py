@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from app.core.sse import SSE_HEADERS, with_keepalive
 from app.db.session import get_db
 from app.models.models import LessonPlan
-from app.schemas.lessonplan import LessonPlanCreate, LessonPlanResponse
+from app.schemas.lessonplan import LessonPlanCreate, LessonPlanGenerateRequest, LessonPlanResponse
+from app.services.generation_stream import stream_lesson_plan
 
 router = APIRouter(prefix="/api/v1/lessonplan", tags=["lessonplan"])
 
@@ -25,3 +28,16 @@ def create_lessonplan(payload: LessonPlanCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(new_plan)
     return new_plan
+
+@router.post("/generate/stream")
+async def stream_lessonplan(payload: LessonPlanGenerateRequest, regenerate: bool = False):
+    """
+    Generates a lesson plan and streams it as Server-Sent Events: one
+    `section` event per plan section as soon as it is written, then `done`
+    with the saved lessonplan_id.
+    """
+    return StreamingResponse(
+        with_keepalive(stream_lesson_plan(payload, regenerate)),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
@@ -1,25 +1,35 @@
-from typing import List, Any, Union, Dict
-from fastapi import APIRouter, Depends, HTTPException
+import json
+import os
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-import io
-
-# --- ReportLab Imports ---
-from reportlab.lib.pagesizes import A4 # type: ignore
-from reportlab.pdfgen import canvas # pyright: ignore[reportMissingModuleSource]
-from reportlab.lib.units import inch # type: ignore
-from reportlab.pdfbase.pdfmetrics import stringWidth # type: ignore
 
 # --- App Imports (Adjust paths as per your project structure) ---
 # Assuming these exist based on your snippet
-from app.db.session import get_db
-from app.models.models import Question, Exam
-from app.schemas.questions import QuestionCreate, QuestionResponse
+from app.core.cache import ReadThroughCache
+from app.core.pagination import MAX_PAGE_SIZE, page_of, parse_fields
+from app.db.session import AsyncSessionLocal, get_async_db, get_db
+from app.models.models import Question, QuestionItem, Exam
+from app.schemas.questions import BulkPdfExportRequest, QuestionCreate, QuestionItemResponse, QuestionResponse
+from app.services import item_analysis, pdf_cache, pdf_renderer
+from app.services.autosave import exam_items_cache
+from app.services.bulk_pdf import stream_pdf_zip
+from app.services.exam_pdf import exam_pdf_payload
 
 router = APIRouter(prefix="/api/v1/questions", tags=["questions"])
 
+# Serialized GET /exam/{exam_id} bodies
+exam_questions_cache = ReadThroughCache("exam-questions", ttl=float(os.getenv("QUESTIONS_CACHE_TTL", "300")))
+
+QUESTION_FIELDS = ("mcq", "one_mark", "three_mark")
+
 @router.post("/", response_model=QuestionResponse)
-def create_question(payload: QuestionCreate, db: Session = Depends(get_db)):
+async def create_question(payload: QuestionCreate, db: AsyncSession = Depends(get_async_db)):
     new_question = Question(
         exam_id=payload.exam_id,
         mcq=payload.mcq,
@@ -27,16 +37,105 @@ def create_question(payload: QuestionCreate, db: Session = Depends(get_db)):
         three_mark=payload.three_mark
     )
     db.add(new_question)
-    db.commit()
-    db.refresh(new_question)
+    await db.commit()
+    await db.refresh(new_question)
+    await exam_questions_cache.invalidate(payload.exam_id)
+    await exam_items_cache.invalidate(payload.exam_id)
+    item_analysis.invalidate(payload.exam_id)
     return new_question
 
 @router.get("/exam/{exam_id}", response_model=List[QuestionResponse])
-def get_questions_for_exam(exam_id: int, db: Session = Depends(get_db)):
-    questions = db.query(Question).filter(Question.exam_id == exam_id).all()
-    if not questions:
+async def get_questions_for_exam(
+    exam_id: int,
+    fields: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    All questions of an exam, or one keyset page of them when `limit`/`after`
+    are given. `fields=mcq,one_mark` selects which JSONB columns are fetched
+    and returned (id and exam_id always are). The next page's cursor is sent
+    in the X-Next-Cursor header.
+    """
+    if fields is None and after is None and limit is None:
+        # Every student's exam page asks for this at the same moment: serve the
+        # serialized bytes from cache, and let concurrent misses share one query.
+        body = await exam_questions_cache.get_or_load(exam_id, lambda: _load_exam_questions_json(exam_id))
+        if body is None:
+            raise HTTPException(status_code=404, detail="No questions found for this exam")
+        return Response(content=body, media_type="application/json")
+
+    selected = parse_fields(fields, QUESTION_FIELDS)
+    query = (
+        select(Question.id, Question.exam_id, *(getattr(Question, name) for name in selected))
+        .where(Question.exam_id == exam_id)
+        .order_by(Question.id)
+    )
+    if after is not None:
+        query = query.where(Question.id > after)
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    async with AsyncSessionLocal() as db:
+        rows, next_cursor = page_of((await db.execute(query)).all(), limit, "id")
+    if not rows and after is None:
         raise HTTPException(status_code=404, detail="No questions found for this exam")
-    return questions
+
+    include = {"id", "exam_id", *selected}
+    body = json.dumps(jsonable_encoder([
+        QuestionResponse.parse_obj(dict(row._mapping)).dict(include=include) for row in rows
+    ])).encode("utf-8")
+    headers = {"X-Next-Cursor": str(next_cursor)} if next_cursor is not None else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _load_exam_questions_json(exam_id: int):
+    async with AsyncSessionLocal() as db:
+        questions = (await db.execute(
+            select(Question).where(Question.exam_id == exam_id)
+        )).scalars().all()
+    if not questions:
+        return None
+    return json.dumps(jsonable_encoder([QuestionResponse.from_orm(q) for q in questions])).encode("utf-8")
+
+@router.get("/exam/{exam_id}/items", response_model=List[QuestionItemResponse])
+async def get_question_items(
+    exam_id: int,
+    item_type: Optional[str] = Query(None, alias="type"),
+    q: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Individual question items, optionally by type and full-text search (GIN-indexed)."""
+    query = select(QuestionItem).where(QuestionItem.exam_id == exam_id)
+    if item_type:
+        query = query.where(QuestionItem.type == item_type)
+    if q:
+        query = query.where(
+            func.to_tsvector(literal_column("'english'"), QuestionItem.text).op("@@")(func.plainto_tsquery("english", q))
+        )
+    items = (await db.execute(
+        query.order_by(QuestionItem.question_id, QuestionItem.type, QuestionItem.position)
+    )).scalars().all()
+    return items
+
+@router.post("/exams/pdf")
+async def export_exams_to_pdf_zip(payload: BulkPdfExportRequest, db: Session = Depends(get_db)):
+    """
+    Streams the PDFs of several exams (by id or by class) as one ZIP archive.
+    Exams and questions are fetched in two queries, then the session is released.
+    """
+    if not payload.exam_ids and payload.class_id is None:
+        raise HTTPException(status_code=400, detail="Provide exam_ids or class_id")
+
+    payloads = await run_in_threadpool(_load_bulk_pdf_payloads, payload, db)
+    db.close()
+    if not payloads:
+        raise HTTPException(status_code=404, detail="No questions found for these exams")
+
+    return StreamingResponse(
+        stream_pdf_zip(payloads),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=exams.zip"}
+    )
 
 @router.get("/{question_id}", response_model=QuestionResponse)
 def get_question(question_id: int, db: Session = Depends(get_db)):
@@ -46,200 +145,73 @@ def get_question(question_id: int, db: Session = Depends(get_db)):
     return question
 
 @router.get("/exam/{exam_id}/pdf")
-def export_exam_to_pdf(exam_id: int, db: Session = Depends(get_db)):
+async def export_exam_to_pdf(exam_id: int, if_none_match: Optional[str] = Header(None), db: Session = Depends(get_db)):
     """
-    Generates a structured Exam PDF with dynamic total marks calculation.
+    Serves the exam PDF from the render cache, rendering only on a miss.
+    The content hash is recomputed from question_items on every request, so
+    repeat downloads with a matching If-None-Match get a 304 until the
+    questions change, whoever changed them.
+    Rendering runs in the process pool after the DB session is released.
     """
-    # Fetch Questions
-    questions = db.query(Question).filter(Question.exam_id == exam_id).all()
-    if not questions:
+    payload = await run_in_threadpool(_load_pdf_payload, exam_id, db)
+    # Give the connection back to the pool before the slow part
+    db.close()
+    digest = pdf_cache.content_digest(payload)
+
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    pdf = pdf_cache.get(digest)
+    if pdf is None:
+        try:
+            pdf = await pdf_renderer.render(payload)
+        except pdf_renderer.RendererBusy:
+            raise HTTPException(status_code=503, detail="PDF renderer is busy, please retry shortly")
+        pdf_cache.put(digest, pdf)
+
+    headers["Content-Disposition"] = f"inline; filename=exam_{exam_id}.pdf"
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+
+def _load_pdf_payload(exam_id: int, db: Session):
+    # Fetch only the fields the paper prints
+    items = _pdf_items_query(db).filter(QuestionItem.exam_id == exam_id).all()
+    if not items:
         raise HTTPException(status_code=404, detail="No questions found for this exam")
 
     # Fetch Exam Title
     exam = db.query(Exam).filter(Exam.id == exam_id).first()
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found")
-    
+
     exam_title = exam.title if exam.title else f"Subject ID {exam_id}"
+    return exam_pdf_payload(exam_id, exam_title, items)
 
-    # --- 1. Pre-process Data & Calculate Marks ---
-    
-    def normalize_to_list(data: Union[Dict, List, None]) -> List[Any]:
-        """Safely converts single dicts or None into a list for iteration."""
-        if not data:
-            return []
-        if isinstance(data, dict):
-            return [data] if data else []
-        return data
-
-    all_mcqs = []
-    all_short_questions = []  # Formerly 'one_mark'
-    all_long_questions = []   # Formerly 'three_mark'
-
-    for q in questions:
-        all_mcqs.extend(normalize_to_list(q.mcq))
-        all_short_questions.extend(normalize_to_list(q.one_mark))
-        all_long_questions.extend(normalize_to_list(q.three_mark))
-
-    # Calculate Total Marks based on user logic
-    # MCQ = 1 mark, Short (one_mark) = 3 marks, Long (three_mark) = 7 marks
-    total_marks = (len(all_mcqs) * 1) + (len(all_short_questions) * 3) + (len(all_long_questions) * 7)
-
-    # --- 2. PDF Generation Setup ---
-
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # Layout Constants
-    MARGIN_X = inch * 0.75
-    MARGIN_Y = inch * 0.75
-    CONTENT_WIDTH = width - (2 * MARGIN_X)
-    FONT_STD = "Helvetica"
-    FONT_BOLD = "Helvetica-Bold"
-    FONT_SIZE = 11
-    LINE_HEIGHT = 14
-
-    def draw_border():
-        """Draws the outline box on the current page."""
-        p.setLineWidth(1)
-        p.rect(MARGIN_X, MARGIN_Y, CONTENT_WIDTH, height - (2 * MARGIN_Y))
-
-    def check_page_break(y_pos, required_space=50):
-        """Checks if we need a new page. Returns new Y position."""
-        if y_pos < MARGIN_Y + required_space:
-            p.showPage()
-            draw_border()
-            p.setFont(FONT_STD, 9)
-            p.drawRightString(width - MARGIN_X - 10, height - MARGIN_Y - 15, "(Page Cont.)")
-            p.setFont(FONT_STD, FONT_SIZE)
-            return height - MARGIN_Y - 30
-        return y_pos
-
-    def draw_wrapped_text(text, x, y, max_w, font=FONT_STD, size=FONT_SIZE, line_height=None):
-        """Wraps text to fit within max_w and updates Y position."""
-        lh = line_height if line_height else LINE_HEIGHT
-        p.setFont(font, size)
-        words = text.split()
-        line = ""
-        for word in words:
-            if stringWidth(line + " " + word, font, size) < max_w:
-                line += " " + word
-            else:
-                p.drawString(x, y, line.strip())
-                y -= lh
-                y = check_page_break(y)
-                line = word
-        if line:
-            p.drawString(x, y, line.strip())
-            y -= lh
-        return check_page_break(y, 10)
-
-    def draw_header(current_y, calculated_marks):
-        """Draws the exam header with the dynamic total marks."""
-        # Top Left: Code
-        p.setFont(FONT_STD, 10)
-        p.drawString(MARGIN_X + 10, current_y, f"TED (21)-1001 (Rev. 2021)")
-        
-        # Top Right: Reg No
-        p.drawRightString(width - MARGIN_X - 10, current_y, "Reg. No. _______________")
-        current_y -= 15
-        p.drawRightString(width - MARGIN_X - 10, current_y, "Signature _______________")
-        
-        current_y -= 20
-        
-        # Centered Titles
-        p.setFont(FONT_BOLD, 14)
-        p.drawCentredString(width / 2, current_y, "DIPLOMA EXAMINATION IN ENGINEERING/TECHNOLOGY")
-        current_y -= 20
-        p.setFont(FONT_BOLD, 16)
-        p.drawCentredString(width / 2, current_y, f"EXAM PAPER - {exam_title.upper()}")
-        current_y -= 20
-        
-        # Meta Info (Time / Marks)
-        p.setFont(FONT_STD, 10)
-        p.drawString(MARGIN_X + 10, current_y, "[Time: 3 Hours]")
-        # Dynamic Marks Display
-        p.drawRightString(width - MARGIN_X - 10, current_y, f"(Maximum Marks: {calculated_marks})")
-        
-        # Separator Line
-        current_y -= 10
-        p.setLineWidth(0.5)
-        p.line(MARGIN_X, current_y, width - MARGIN_X, current_y)
-        current_y -= 20
-        
-        return current_y
-
-    # --- 3. Start Drawing ---
-    
-    draw_border()
-    y = height - MARGIN_Y - 20
-    # Pass total_marks to header
-    y = draw_header(y, total_marks)
-
-    # --- PART A: MCQ (1 Mark) ---
-    if all_mcqs:
-        p.setFont(FONT_BOLD, 12)
-        p.drawCentredString(width / 2, y, "PART - A")
-        y -= 20
-        p.setFont(FONT_STD, 10)
-        y = draw_wrapped_text("I. Answer all the following questions. (1 Mark each)", MARGIN_X + 10, y, CONTENT_WIDTH)
-        y -= 10
-        
-        for i, mcq in enumerate(all_mcqs):
-            text = mcq.get("question", "") if isinstance(mcq, dict) else str(mcq)
-            y = draw_wrapped_text(f"{i+1}. {text}", MARGIN_X + 20, y, CONTENT_WIDTH - 30)
-            
-            if isinstance(mcq, dict):
-                options = mcq.get("options", [])
-                opt_str = "    ".join(options)
-                # Check if options fit on one line
-                if stringWidth(opt_str, FONT_STD, 10) < (CONTENT_WIDTH - 40):
-                     y = draw_wrapped_text(opt_str, MARGIN_X + 40, y, CONTENT_WIDTH - 50, size=10)
-                else:
-                    for opt in options:
-                        y = draw_wrapped_text(f"- {opt}", MARGIN_X + 40, y, CONTENT_WIDTH - 50, size=10)
-            y -= 5
-        y -= 15
-
-    # --- PART B: Short Questions (3 Marks) ---
-    if all_short_questions:
-        y = check_page_break(y, 60)
-        p.setFont(FONT_BOLD, 12)
-        p.drawCentredString(width / 2, y, "PART - B")
-        y -= 20
-        p.setFont(FONT_STD, 10)
-        # Updated text for 3 marks
-        y = draw_wrapped_text("II. Answer the following questions. (3 Marks each)", MARGIN_X + 10, y, CONTENT_WIDTH)
-        y -= 10
-        
-        for i, om in enumerate(all_short_questions):
-            text = om.get("question", "") if isinstance(om, dict) else str(om)
-            y = draw_wrapped_text(f"{i+1}. {text}", MARGIN_X + 20, y, CONTENT_WIDTH - 30)
-            y -= 10
-        y -= 15
-
-    # --- PART C: Long Questions (7 Marks) ---
-    if all_long_questions:
-        y = check_page_break(y, 60)
-        p.setFont(FONT_BOLD, 12)
-        p.drawCentredString(width / 2, y, "PART - C")
-        y -= 20
-        p.setFont(FONT_STD, 10)
-        # Updated text for 7 marks
-        y = draw_wrapped_text("III. Answer the following questions in detail. (7 Marks each)", MARGIN_X + 10, y, CONTENT_WIDTH)
-        y -= 10
-        
-        for i, tm in enumerate(all_long_questions):
-            text = tm.get("question", "") if isinstance(tm, dict) else str(tm)
-            y = draw_wrapped_text(f"{i+1}. {text}", MARGIN_X + 20, y, CONTENT_WIDTH - 30)
-            y -= 20
-
-    p.save()
-    buffer.seek(0)
 
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"inline; filename=exam_{exam_id}.pdf"}
-    )
\ No newline at end of file
+def _load_bulk_pdf_payloads(payload: BulkPdfExportRequest, db: Session):
+    exam_query = db.query(Exam)
+    if payload.exam_ids:
+        exam_query = exam_query.filter(Exam.id.in_(payload.exam_ids))
+    if payload.class_id is not None:
+        exam_query = exam_query.filter(Exam.class_id == payload.class_id)
+    exams = {exam.id: exam for exam in exam_query.all()}
+    if not exams:
+        return []
+
+    items_by_exam = {}
+    for item in _pdf_items_query(db).filter(QuestionItem.exam_id.in_(exams)).all():
+        items_by_exam.setdefault(item.exam_id, []).append(item)
+
+    return [
+        exam_pdf_payload(exam_id, exams[exam_id].title or f"Subject ID {exam_id}", items)
+        for exam_id, items in items_by_exam.items()
+    ]
+
+
+def _pdf_items_query(db: Session):
+    return (
+        db.query(QuestionItem.exam_id, QuestionItem.type, QuestionItem.text, QuestionItem.options)
+        .order_by(QuestionItem.exam_id, QuestionItem.question_id, QuestionItem.position)
+    )
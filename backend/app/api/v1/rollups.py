@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.models.models import ClassRollup, ExamRollup, StudentRollup
+from app.schemas.rollups import RollupResponse
+from app.services.rollups import rollup_summary
+
+router = APIRouter(prefix="/api/v1/rollups", tags=["rollups"])
+
+
+@router.get("/exam/{exam_id}", response_model=RollupResponse)
+def get_exam_rollup(exam_id: int, db: Session = Depends(get_db)):
+    rollup = db.get(ExamRollup, exam_id)
+    return {"level": "exam", "key": exam_id, **rollup_summary(rollup)}
+
+
+@router.get("/class/{class_id}", response_model=RollupResponse)
+def get_class_rollup(class_id: int, db: Session = Depends(get_db)):
+    rollup = db.get(ClassRollup, class_id)
+    return {"level": "class", "key": class_id, **rollup_summary(rollup)}
+
+
+@router.get("/student/{student_id}", response_model=RollupResponse)
+def get_student_rollup(student_id: int, db: Session = Depends(get_db)):
+    rollup = db.get(StudentRollup, student_id)
+    return {"level": "student", "key": student_id, **rollup_summary(rollup)}
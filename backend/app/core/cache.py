@@ -0,0 +1,121 @@
+"""
+Pluggable byte cache with read-through loading and single-flight.
+
+CACHE_BACKEND=memory (default) keeps a per-process TTL/LRU map;
+CACHE_BACKEND=redis uses any Redis-compatible server at REDIS_URL so
+several workers share entries (requires the optional `redis` package; see
+app.core.redis_client).
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.redis_client import get_redis
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class RedisBackend:
+    def __init__(self, client: Any):
+        self._client = client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._client.set(key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+
+def make_backend():
+    if os.getenv("CACHE_BACKEND", "memory") == "redis":
+        return RedisBackend(get_redis("CACHE_BACKEND"))
+    return MemoryBackend(int(os.getenv("CACHE_MAX_ENTRIES", "1024")))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight task.
+    The task is shielded, so a caller disconnecting does not cancel it for
+    the others; loaders should therefore not depend on request-scoped state.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+
+class ReadThroughCache:
+    """
+    get_or_load returns cached bytes, or runs `loader` once for all concurrent
+    misses and stores its result. Loaders return None for "nothing to cache".
+    """
+
+    def __init__(self, namespace: str, ttl: float, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.backend = backend or make_backend()
+        self._flight = SingleFlight()
+        # bumped by invalidate so a load that raced with it is not stored
+        self._generation: Dict[str, int] = {}
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def get_or_load(self, key, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        full_key = self._key(key)
+        value = await self.backend.get(full_key)
+        if value is not None:
+            return value
+
+        # Read at the miss, not when the load task first runs, so an
+        # invalidate in between is noticed too
+        generation = self._generation.get(full_key, 0)
+
+        async def load():
+            loaded = await loader()
+            if loaded is not None and self._generation.get(full_key, 0) == generation:
+                await self.backend.set(full_key, loaded, self.ttl)
+            return loaded
+
+        return await self._flight.do(full_key, load)
+
+    async def invalidate(self, key) -> None:
+        full_key = self._key(key)
+        self._generation[full_key] = self._generation.get(full_key, 0) + 1
+        await self.backend.delete(full_key)
@@ -0,0 +1,198 @@
+"""
+Shared outbound HTTP client for the n8n generation webhooks.
+
+One pooled httpx.AsyncClient is reused by every request (created lazily,
+closed on shutdown). Each upstream webhook has its own concurrency limit
+and timeout; transient failures (connection errors, timeouts, 429, 502-504)
+are retried with exponential backoff and jitter.
+
+stream_json yields a webhook's output as it arrives when the flow answers
+with NDJSON (n8n streaming responses), and the whole body otherwise; it
+retries only until the first chunk has been received.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+N8N_BASE_URL = os.getenv("N8N_BASE_URL", "http://localhost:5678/webhook").rstrip("/")
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "50"))
+RETRY_STATUSES = {429, 502, 503, 504}
+STREAM_CONTENT_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-seq")
+
+
+class UpstreamError(Exception):
+    def __init__(self, upstream: str, message: str, status_code: Optional[int] = None):
+        super().__init__(f"{upstream}: {message}")
+        self.upstream = upstream
+        self.status_code = status_code
+
+
+class Upstream:
+    def __init__(self, name: str, path: str, concurrency: int, timeout: float,
+                 retries: int = 2, backoff: float = 0.5):
+        self.name = name
+        self.path = path
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+        self.calls = 0
+        self.retried = 0
+        self.failures = 0
+
+    @property
+    def url(self) -> str:
+        return f"{N8N_BASE_URL}/{self.path}"
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "retried": self.retried,
+            "failures": self.failures,
+        }
+
+
+def _upstream(name: str, path: str, concurrency: int, timeout: float) -> Upstream:
+    prefix = f"UPSTREAM_{name.upper()}"
+    return Upstream(
+        name,
+        path,
+        concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", str(timeout))),
+        retries=int(os.getenv(f"{prefix}_RETRIES", "2")),
+    )
+
+
+# Generations are slow (LLM round trips), formatting and submission are not
+UPSTREAMS: Dict[str, Upstream] = {
+    "exam": _upstream("exam", "exam/generate-ai", concurrency=4, timeout=300),
+    "lessonplan": _upstream("lessonplan", "lessonplan/generate", concurrency=4, timeout=300),
+    "announcement": _upstream("announcement", "announcements/format", concurrency=8, timeout=60),
+    "exam_submit": _upstream("exam_submit", "exam/submit", concurrency=16, timeout=60),
+}
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+            headers={"Content-Type": "application/json"},
+        )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _parse_body(response: httpx.Response) -> Any:
+    # n8n answers with JSON, plain text, or nothing at all depending on the flow
+    if not response.content:
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return response.text
+
+
+async def post_json(upstream: Upstream, payload: Dict[str, Any]) -> Any:
+    """POSTs payload to the upstream webhook and returns the decoded body."""
+    async with upstream._slots:
+        upstream.in_flight += 1
+        upstream.calls += 1
+        try:
+            for attempt in range(upstream.retries + 1):
+                last = attempt == upstream.retries
+                try:
+                    response = await get_client().post(upstream.url, json=payload, timeout=upstream.timeout)
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    if last:
+                        raise UpstreamError(upstream.name, f"request failed: {e!r}")
+                else:
+                    if response.status_code < 400:
+                        return _parse_body(response)
+                    if last or response.status_code not in RETRY_STATUSES:
+                        raise UpstreamError(
+                            upstream.name,
+                            f"HTTP {response.status_code}: {response.text[:200]}",
+                            status_code=response.status_code,
+                        )
+
+                await _backoff(upstream, attempt)
+        except UpstreamError:
+            upstream.failures += 1
+            raise
+        finally:
+            upstream.in_flight -= 1
+
+
+async def stream_json(upstream: Upstream, payload: Dict[str, Any]) -> AsyncIterator[Any]:
+    """POSTs payload and yields decoded NDJSON lines, or the one decoded body."""
+    started = False
+    async with upstream._slots:
+        upstream.in_flight += 1
+        upstream.calls += 1
+        try:
+            for attempt in range(upstream.retries + 1):
+                last = attempt == upstream.retries
+                try:
+                    async with get_client().stream("POST", upstream.url, json=payload, timeout=upstream.timeout) as response:
+                        if response.status_code >= 400:
+                            body = (await response.aread()).decode("utf-8", "replace")
+                            if last or response.status_code not in RETRY_STATUSES:
+                                raise UpstreamError(
+                                    upstream.name,
+                                    f"HTTP {response.status_code}: {body[:200]}",
+                                    status_code=response.status_code,
+                                )
+                        elif response.headers.get("content-type", "").startswith(STREAM_CONTENT_TYPES):
+                            async for line in response.aiter_lines():
+                                if line.strip():
+                                    started = True
+                                    yield _parse_line(upstream, line)
+                            return
+                        else:
+                            await response.aread()
+                            started = True
+                            yield _parse_body(response)
+                            return
+                except (httpx.TimeoutException, httpx.TransportError) as e:
+                    # Past the first chunk a retry would repeat output the caller already has
+                    if last or started:
+                        raise UpstreamError(upstream.name, f"request failed: {e!r}")
+
+                await _backoff(upstream, attempt)
+        except UpstreamError:
+            upstream.failures += 1
+            raise
+        finally:
+            upstream.in_flight -= 1
+
+
+def _parse_line(upstream: Upstream, line: str) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise UpstreamError(upstream.name, f"invalid NDJSON line: {line[:200]}")
+
+
+async def _backoff(upstream: Upstream, attempt: int) -> None:
+    upstream.retried += 1
+    logger.warning("Retrying %s webhook (attempt %d of %d)", upstream.name, attempt + 2, upstream.retries + 1)
+    delay = upstream.backoff * (2 ** attempt)
+    await asyncio.sleep(delay + random.uniform(0, delay))
@@ -0,0 +1,38 @@
+"""
+Keyset pagination and `fields=` selection shared by list endpoints.
+
+Pages are requested with `after=<last id seen>&limit=<n>`; the next cursor
+is the id of the last row returned, or None once the list is exhausted.
+"""
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> Tuple[str, ...]:
+    """Comma-separated field names -> tuple in `allowed` order; all of them when omitted."""
+    if not fields:
+        return tuple(allowed)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+    return tuple(name for name in allowed if name in requested)
+
+
+def page_of(rows: Iterable, limit: Optional[int], key: str) -> Tuple[List, Optional[int]]:
+    """
+    Splits a result fetched with LIMIT limit + 1 into (page, next_cursor).
+    The extra row only tells whether another page exists.
+    """
+    rows = list(rows)
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, getattr(rows[-1], key)
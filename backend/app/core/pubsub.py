@@ -0,0 +1,135 @@
+"""
+Topic-based publish/subscribe for live updates.
+
+PUBSUB_BACKEND=memory (default) fans messages out to the subscribers of
+this process; PUBSUB_BACKEND=redis publishes through any Redis-compatible
+server at REDIS_URL so subscribers on every worker get them (requires the
+optional `redis` package; see app.core.redis_client). Either way a process holds one queue per local
+subscriber, so a broadcast costs one put per watcher and no queries.
+
+Subscriber queues are bounded (PUBSUB_QUEUE_SIZE): a client that stops
+reading loses its oldest messages instead of slowing publishers down.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Set
+
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("PUBSUB_QUEUE_SIZE", "256"))
+REDIS_CHANNEL_PREFIX = "pubsub:"
+
+
+class Subscription:
+    def __init__(self, broker: "MemoryBroker", topic: str, queue_size: int):
+        self.broker = broker
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+
+    def put(self, message: Dict[str, Any]) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Next message, or None if none arrived within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        await self.broker.unsubscribe(self)
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+class MemoryBroker:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.queue_size)
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.topic)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.topic]
+
+    async def publish(self, topic: str, message: Dict[str, Any]) -> int:
+        return self._deliver(topic, message)
+
+    def _deliver(self, topic: str, message: Dict[str, Any]) -> int:
+        subscribers = self._subscribers.get(topic, ())
+        for subscription in list(subscribers):
+            subscription.put(message)
+        return len(subscribers)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+    async def close(self) -> None:
+        self._subscribers.clear()
+
+
+class RedisBroker(MemoryBroker):
+    """
+    Publishes to Redis; one pattern subscription per process relays every
+    message back to the local subscribers of its topic.
+    """
+
+    def __init__(self, client: Any, queue_size: int = QUEUE_SIZE):
+        super().__init__(queue_size)
+        self._client = client
+        self._listener: Optional[asyncio.Task] = None
+
+    async def subscribe(self, topic: str) -> Subscription:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return await super().subscribe(topic)
+
+    async def publish(self, topic: str, message: Dict[str, Any]) -> int:
+        return await self._client.publish(REDIS_CHANNEL_PREFIX + topic, json.dumps(message, default=str))
+
+    async def _listen(self) -> None:
+        pubsub = self._client.pubsub()
+        await pubsub.psubscribe(REDIS_CHANNEL_PREFIX + "*")
+        try:
+            async for item in pubsub.listen():
+                if item.get("type") != "pmessage":
+                    continue
+                channel = item["channel"]
+                topic = (channel.decode() if isinstance(channel, bytes) else channel)[len(REDIS_CHANNEL_PREFIX):]
+                try:
+                    self._deliver(topic, json.loads(item["data"]))
+                except ValueError:
+                    logger.warning("Dropping malformed pub/sub message on %s", topic)
+        finally:
+            await pubsub.close()
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await super().close()
+
+
+def make_broker():
+    if os.getenv("PUBSUB_BACKEND", "memory") == "redis":
+        return RedisBroker(get_redis("PUBSUB_BACKEND"))
+    return MemoryBroker()
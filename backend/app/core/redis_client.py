@@ -0,0 +1,34 @@
+"""
+Shared client for the optional Redis backends.
+
+CACHE_BACKEND, SESSION_BACKEND and PUBSUB_BACKEND can each be set to
+`redis`; all of them then talk to the server at REDIS_URL through one
+client (and connection pool) per process. The `redis` package is only
+imported when one of them asks for it.
+"""
+import os
+from typing import Any, Dict
+
+DEFAULT_REDIS_URL = "redis://localhost:6379/0"
+
+_clients: Dict[str, Any] = {}
+
+
+def get_redis(setting: str) -> Any:
+    """The process-wide redis.asyncio client; `setting` names the option that asked for it."""
+    url = os.getenv("REDIS_URL", DEFAULT_REDIS_URL)
+    client = _clients.get(url)
+    if client is None:
+        try:
+            import redis.asyncio as redis  # optional dependency
+        except ImportError as e:
+            raise RuntimeError(f"{setting}=redis requires the 'redis' package") from e
+        client = _clients[url] = redis.from_url(url)
+    return client
+
+
+async def close_redis() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
@@ -0,0 +1,155 @@
+"""
+Server-side exam session store.
+
+Tokens minted by start_exam_session are kept with O(1) lookup, indexed per
+exam, and expire with the exam's duration (plus grace). Every token is
+bound to one student and only validates for that student and exam.
+Submit-time validation is a single hash lookup. SESSION_BACKEND=memory (default) keeps
+them in process; SESSION_BACKEND=redis shares them between workers through
+any Redis-compatible server at REDIS_URL (optional `redis` package).
+
+The memory backend is for local single-process runs only: its sessions die
+with the process, so a restart or deploy during an exam makes every
+in-progress student's autosave and submit fail with 403, and with several
+workers a token is only known to the worker that minted it. Production
+deployments must set SESSION_BACKEND=redis; the app logs a warning at
+startup when they don't.
+"""
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.redis_client import get_redis
+
+GRACE_SECONDS = int(os.getenv("EXAM_SESSION_GRACE_SECONDS", "600"))
+
+
+def _new_session(exam_id: int, student_id: int, ttl: int) -> Dict[str, Any]:
+    if student_id is None:
+        raise ValueError("An exam session must belong to a student")
+    if ttl <= 0:
+        raise ValueError(f"Session TTL must be positive, got {ttl}")
+    now = time.time()
+    return {
+        "token": str(uuid.uuid4()),
+        "exam_id": exam_id,
+        "student_id": student_id,
+        "started_at": now,
+        "expires_at": now + ttl,
+    }
+
+
+def _matches(session: Optional[Dict[str, Any]], exam_id: int, student_id: int) -> bool:
+    # No wildcards: a token only ever speaks for the student it was minted for
+    if session is None or session["exam_id"] != exam_id:
+        return False
+    return session["student_id"] is not None and session["student_id"] == student_id
+
+
+class MemorySessionStore:
+    durable = False
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._by_exam: Dict[int, Set[str]] = {}
+
+    def _drop(self, token: str) -> None:
+        session = self._sessions.pop(token, None)
+        if session is not None:
+            tokens = self._by_exam.get(session["exam_id"])
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._by_exam[session["exam_id"]]
+
+    async def create(self, exam_id: int, ttl: int, student_id: int) -> Dict[str, Any]:
+        session = _new_session(exam_id, student_id, ttl)
+        self._sessions[session["token"]] = session
+        self._by_exam.setdefault(exam_id, set()).add(session["token"])
+        return session
+
+    async def get(self, token: str) -> Optional[Dict[str, Any]]:
+        session = self._sessions.get(token)
+        if session is not None and session["expires_at"] < time.time():
+            self._drop(token)
+            return None
+        return session
+
+    async def validate(self, token: str, exam_id: int, student_id: int) -> bool:
+        return _matches(await self.get(token), exam_id, student_id)
+
+    async def active_for_exam(self, exam_id: int) -> List[Dict[str, Any]]:
+        now = time.time()
+        active = []
+        for token in list(self._by_exam.get(exam_id, ())):
+            session = self._sessions[token]
+            if session["expires_at"] < now:
+                self._drop(token)
+            else:
+                active.append(session)
+        return active
+
+    async def expire_exam(self, exam_id: int) -> int:
+        tokens = self._by_exam.pop(exam_id, set())
+        for token in tokens:
+            self._sessions.pop(token, None)
+        return len(tokens)
+
+
+class RedisSessionStore:
+    durable = True
+
+    def __init__(self, client: Any):
+        self._client = client
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return f"exam-session:{token}"
+
+    @staticmethod
+    def _index(exam_id: int) -> str:
+        return f"exam-sessions:{exam_id}"
+
+    async def create(self, exam_id: int, ttl: int, student_id: int) -> Dict[str, Any]:
+        session = _new_session(exam_id, student_id, ttl)
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.set(self._key(session["token"]), json.dumps(session), ex=ttl)
+            pipe.sadd(self._index(exam_id), session["token"])
+            pipe.expire(self._index(exam_id), ttl)
+            await pipe.execute()
+        return session
+
+    async def get(self, token: str) -> Optional[Dict[str, Any]]:
+        raw = await self._client.get(self._key(token))
+        return json.loads(raw) if raw else None
+
+    async def validate(self, token: str, exam_id: int, student_id: int) -> bool:
+        return _matches(await self.get(token), exam_id, student_id)
+
+    async def active_for_exam(self, exam_id: int) -> List[Dict[str, Any]]:
+        tokens = list(await self._client.smembers(self._index(exam_id)))
+        if not tokens:
+            return []
+        raws = await self._client.mget([self._key(t.decode()) for t in tokens])
+        expired = [t for t, raw in zip(tokens, raws) if raw is None]
+        if expired:
+            await self._client.srem(self._index(exam_id), *expired)
+        return [json.loads(raw) for raw in raws if raw]
+
+    async def expire_exam(self, exam_id: int) -> int:
+        tokens = list(await self._client.smembers(self._index(exam_id)))
+        if tokens:
+            await self._client.delete(*[self._key(t.decode()) for t in tokens])
+        await self._client.delete(self._index(exam_id))
+        return len(tokens)
+
+
+def make_session_store():
+    if os.getenv("SESSION_BACKEND", "memory") == "redis":
+        return RedisSessionStore(get_redis("SESSION_BACKEND"))
+    return MemorySessionStore()
+
+
+session_store = make_session_store()
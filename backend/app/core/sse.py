@@ -0,0 +1,49 @@
+"""Server-Sent Events framing for StreamingResponse bodies."""
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+KEEPALIVE = b": keepalive\n\n"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+_END = object()
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode("utf-8")
+
+
+async def with_keepalive(events: AsyncIterator[bytes], interval: float = 15) -> AsyncIterator[bytes]:
+    """
+    Relays `events`, sending a comment line whenever none arrived for
+    `interval` seconds so proxies don't drop a connection that is waiting on
+    a slow producer. The producer runs as a task and is cancelled if the
+    client goes away.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for chunk in events:
+                await queue.put(chunk)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), interval)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
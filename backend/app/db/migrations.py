@@ -0,0 +1,294 @@
+"""
+Versioned schema migrations.
+
+Base.metadata.create_all only creates missing tables; it never adds indexes
+or constraints to tables that already exist. Migrations fill that gap. Each
+runs once and is recorded in schema_migrations. Migrations marked
+`concurrent` run outside a transaction so CREATE INDEX CONCURRENTLY can
+build indexes without blocking writes. A failed concurrent build leaves an
+INVALID index behind, so it is dropped before the retry.
+
+Every statement is idempotent (IF NOT EXISTS), so running against a fresh
+database that create_all already built is a no-op.
+
+Every worker calls run_migrations at startup, so the runner holds a
+Postgres advisory lock for the whole run: the first worker applies the
+pending migrations and the others wait, then find nothing left to do.
+Unique index builds repeat their dedupe right before the build, so rows
+duplicated since an earlier dedupe (e.g. by old code during a rolling
+deploy) cannot leave the index INVALID.
+"""
+import logging
+import time
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.services.rollups import rebuild_statements, trigger_statements
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    statements: List[str]
+    concurrent: bool = False
+    index_name: Optional[str] = None   # for concurrent index builds
+
+
+# advisory lock key held while migrations run ("TAMIGRAT")
+MIGRATION_LOCK_KEY = 0x54414D4947524154
+LOCK_POLL_SECONDS = 1.0
+
+
+def _index(version: int, name: str, table: str, columns: str, unique: bool = False, before: Optional[List[str]] = None) -> Migration:
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    return Migration(
+        version,
+        f"{kind.lower()} {name} on {table}({columns})",
+        list(before or []) + [f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"],
+        concurrent=True,
+        index_name=name,
+    )
+
+
+# Keep the newest row of each duplicate group
+DEDUPE_RESPONSES = """
+DELETE FROM student_responses older
+USING student_responses newer
+WHERE older.exam_id = newer.exam_id
+  AND older.student_id = newer.student_id
+  AND older.question_id = newer.question_id
+  AND older.id < newer.id
+"""
+
+DEDUPE_MARKS = """
+DELETE FROM marks older
+USING marks newer
+WHERE older.exam_id = newer.exam_id
+  AND older.student_id = newer.student_id
+  AND older.id < newer.id
+"""
+
+
+# Rebuilds the question_items rows of one question from its JSONB lists.
+# A single dict is treated as a one-item list, and scalars become text-only items.
+QUESTION_ITEMS_SYNC = """
+CREATE OR REPLACE FUNCTION question_items_sync(p_question_id integer) RETURNS void AS $$
+BEGIN
+    DELETE FROM question_items WHERE question_id = p_question_id;
+    INSERT INTO question_items (question_id, exam_id, type, position, text, options, answer, marks)
+    SELECT q.id, q.exam_id, t.type, e.ordinality - 1,
+           COALESCE(e.item ->> 'question', CASE WHEN jsonb_typeof(e.item) = 'object' THEN '' ELSE e.item #>> '{}' END),
+           e.item -> 'options',
+           COALESCE(e.item ->> 'correct_answer', e.item ->> 'answer'),
+           CASE WHEN e.item ->> 'marks' ~ '^[0-9]+$' THEN (e.item ->> 'marks')::integer ELSE t.default_marks END
+    FROM questions q
+    CROSS JOIN LATERAL (VALUES
+        ('mcq', q.mcq, 1), ('one_mark', q.one_mark, 1), ('three_mark', q.three_mark, 3)
+    ) AS t(type, items, default_marks)
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE jsonb_typeof(t.items)
+            WHEN 'array' THEN t.items
+            WHEN 'object' THEN jsonb_build_array(t.items)
+            ELSE '[]'::jsonb
+        END
+    ) WITH ORDINALITY AS e(item, ordinality)
+    WHERE q.id = p_question_id;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Same source rows as QUESTION_ITEMS_SYNC, but upserted on (question_id,
+# type, position) so an edit keeps the ids that responses reference; only
+# items past the new end of a list are deleted.
+QUESTION_ITEMS_UPSERT = """
+CREATE OR REPLACE FUNCTION question_items_sync(p_question_id integer) RETURNS void AS $$
+BEGIN
+    INSERT INTO question_items (question_id, exam_id, type, position, text, options, answer, marks)
+    SELECT q.id, q.exam_id, t.type, e.ordinality - 1,
+           COALESCE(e.item ->> 'question', CASE WHEN jsonb_typeof(e.item) = 'object' THEN '' ELSE e.item #>> '{}' END),
+           e.item -> 'options',
+           COALESCE(e.item ->> 'correct_answer', e.item ->> 'answer'),
+           CASE WHEN e.item ->> 'marks' ~ '^[0-9]+$' THEN (e.item ->> 'marks')::integer ELSE t.default_marks END
+    FROM questions q
+    CROSS JOIN LATERAL (VALUES
+        ('mcq', q.mcq, 1), ('one_mark', q.one_mark, 1), ('three_mark', q.three_mark, 3)
+    ) AS t(type, items, default_marks)
+    CROSS JOIN LATERAL jsonb_array_elements(
+        CASE jsonb_typeof(t.items)
+            WHEN 'array' THEN t.items
+            WHEN 'object' THEN jsonb_build_array(t.items)
+            ELSE '[]'::jsonb
+        END
+    ) WITH ORDINALITY AS e(item, ordinality)
+    WHERE q.id = p_question_id
+    ON CONFLICT (question_id, type, position) DO UPDATE SET
+        exam_id = EXCLUDED.exam_id, text = EXCLUDED.text, options = EXCLUDED.options,
+        answer = EXCLUDED.answer, marks = EXCLUDED.marks;
+
+    DELETE FROM question_items qi
+    USING questions q
+    WHERE qi.question_id = p_question_id AND q.id = p_question_id
+      AND qi.position >= (
+          SELECT CASE jsonb_typeof(l.items)
+                     WHEN 'array' THEN jsonb_array_length(l.items)
+                     WHEN 'object' THEN 1
+                     ELSE 0
+                 END
+          FROM (SELECT CASE qi.type WHEN 'mcq' THEN q.mcq WHEN 'one_mark' THEN q.one_mark ELSE q.three_mark END) AS l(items)
+      );
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# A response recorded against a whole question refers to the item the old
+# per-question grading used: position 0 of its first non-empty list
+BACKFILL_ITEM_ID = """
+UPDATE {table} r SET item_id = (
+    SELECT qi.id FROM question_items qi
+    WHERE qi.question_id = r.question_id
+    ORDER BY CASE qi.type WHEN 'mcq' THEN 0 WHEN 'one_mark' THEN 1 ELSE 2 END, qi.position
+    LIMIT 1
+)
+WHERE r.item_id IS NULL
+"""
+
+DEDUPE_RESPONSE_ITEMS = """
+DELETE FROM student_responses older
+USING student_responses newer
+WHERE older.exam_id = newer.exam_id
+  AND older.student_id = newer.student_id
+  AND older.item_id = newer.item_id
+  AND older.id < newer.id
+"""
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "dedupe student_responses and marks before unique indexes", [DEDUPE_RESPONSES, DEDUPE_MARKS]),
+    _index(2, "ix_questions_exam_id", "questions", "exam_id"),
+    _index(3, "uq_response_exam_student_question", "student_responses", "exam_id, student_id, question_id",
+           unique=True, before=[DEDUPE_RESPONSES]),
+    _index(4, "uq_marks_exam_student", "marks", "exam_id, student_id", unique=True, before=[DEDUPE_MARKS]),
+    _index(5, "ix_announcements_class_id", "announcements", "class_id"),
+    _index(6, "ix_exams_class_id", "exams", "class_id"),
+    Migration(7, "question_items sync trigger and backfill from questions JSONB", [
+        QUESTION_ITEMS_SYNC,
+        """
+        CREATE OR REPLACE FUNCTION question_items_trigger() RETURNS trigger AS $$
+        BEGIN
+            PERFORM question_items_sync(NEW.id);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        """
+        CREATE OR REPLACE TRIGGER question_items_sync
+        AFTER INSERT OR UPDATE OF exam_id, mcq, one_mark, three_mark ON questions
+        FOR EACH ROW EXECUTE FUNCTION question_items_trigger()
+        """,
+        "SELECT question_items_sync(id) FROM questions",
+    ]),
+    _index(8, "ix_question_items_question_id", "question_items", "question_id"),
+    _index(9, "ix_question_items_exam_type", "question_items", "exam_id, type, position"),
+    _index(10, "ix_question_items_text_fts", "question_items USING gin", "to_tsvector('english', text)"),
+    _index(11, "ix_question_items_options", "question_items USING gin", "options jsonb_path_ops"),
+    Migration(12, "per-item responses: stable question_items ids and item_id on responses and drafts", [
+        # question_items is derived from questions, so it is small enough to
+        # index inside the transaction; the upsert below needs the index
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_question_items_question_type_position ON question_items (question_id, type, position)",
+        QUESTION_ITEMS_UPSERT,
+        "ALTER TABLE student_responses ADD COLUMN IF NOT EXISTS item_id integer REFERENCES question_items (id) ON DELETE SET NULL",
+        BACKFILL_ITEM_ID.format(table="student_responses"),
+        "ALTER TABLE student_responses DROP CONSTRAINT IF EXISTS uq_response_exam_student_question",
+        "DROP INDEX IF EXISTS uq_response_exam_student_question",
+        "ALTER TABLE draft_responses ADD COLUMN IF NOT EXISTS item_id integer REFERENCES question_items (id) ON DELETE CASCADE",
+        BACKFILL_ITEM_ID.format(table="draft_responses"),
+        "DELETE FROM draft_responses WHERE item_id IS NULL",
+        "ALTER TABLE draft_responses ALTER COLUMN item_id SET NOT NULL",
+        "ALTER TABLE draft_responses DROP CONSTRAINT IF EXISTS uq_draft_exam_student_question",
+        "DROP INDEX IF EXISTS uq_draft_exam_student_question",
+    ]),
+    _index(13, "uq_response_exam_student_item", "student_responses", "exam_id, student_id, item_id",
+           unique=True, before=[DEDUPE_RESPONSE_ITEMS]),
+    _index(14, "uq_draft_exam_student_item", "draft_responses", "exam_id, student_id, item_id", unique=True),
+    # The stats summary reads exam_rollups, so marks written before the trigger must be counted
+    Migration(15, "marks rollup trigger and backfill of the rollup tables", [*trigger_statements(), *rebuild_statements()]),
+]
+
+CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version integer PRIMARY KEY,
+    description text NOT NULL,
+    applied_at timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+
+def applied_versions(engine: Engine) -> set:
+    with engine.begin() as connection:
+        connection.execute(text(CREATE_VERSION_TABLE))
+        return set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def _drop_if_invalid(connection, index_name: str) -> None:
+    invalid = connection.execute(text("""
+        SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = :name AND NOT i.indisvalid
+    """), {"name": index_name}).first()
+    if invalid:
+        logger.warning("Dropping invalid index %s left by an interrupted build", index_name)
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}"))
+
+
+def _record(connection, migration: Migration) -> None:
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d) ON CONFLICT DO NOTHING"),
+        {"v": migration.version, "d": migration.description},
+    )
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """
+    Applies pending migrations in version order under the migration
+    advisory lock; returns the versions applied. Raises on the first failure.
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        # Session-level lock on a connection of its own, so it spans the
+        # per-migration transactions and autocommit index builds below.
+        # Polled with pg_try_advisory_lock rather than blocking in
+        # pg_advisory_lock: CREATE INDEX CONCURRENTLY waits for every open
+        # snapshot, including a statement blocked on the lock, which would
+        # deadlock the holder against the waiters.
+        while not lock.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY}).scalar():
+            logger.info("Waiting for another process to finish migrations")
+            time.sleep(LOCK_POLL_SECONDS)
+        try:
+            return _apply_pending(engine)
+        finally:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def _apply_pending(engine: Engine) -> List[int]:
+    # Read under the lock: another worker may have just applied everything
+    done = applied_versions(engine)
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in done:
+            continue
+        logger.info("Applying migration %s: %s", migration.version, migration.description)
+        if migration.concurrent:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                if migration.index_name:
+                    _drop_if_invalid(connection, migration.index_name)
+                for statement in migration.statements:
+                    connection.execute(text(statement))
+                _record(connection, migration)
+        else:
+            with engine.begin() as connection:
+                for statement in migration.statements:
+                    connection.execute(text(statement))
+                _record(connection, migration)
+        applied.append(migration.version)
+    return applied
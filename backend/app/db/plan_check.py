@@ -0,0 +1,48 @@
+"""
+EXPLAIN-based guard for hot query paths.
+
+Each query below is one the API runs per request. With sequential scans
+disabled for the session the planner still picks one only when no usable
+index exists, so any Seq Scan on these tables means a missing index.
+"""
+import json
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+HOT_QUERIES: Dict[str, str] = {
+    "questions for exam": "SELECT * FROM questions WHERE exam_id = 1",
+    "answer key for exam": "SELECT * FROM question_items WHERE exam_id = 1",
+    "drafts for student in exam": "SELECT * FROM draft_responses WHERE exam_id = 1 AND student_id = 1",
+    "responses for student in exam": "SELECT * FROM student_responses WHERE exam_id = 1 AND student_id = 1",
+    "responses for exam": "SELECT * FROM student_responses WHERE exam_id = 1 ORDER BY student_id",
+    "marks for exam": "SELECT * FROM marks WHERE exam_id = 1",
+    "marks for student in exam": "SELECT * FROM marks WHERE exam_id = 1 AND student_id = 1",
+    "announcements for class": "SELECT * FROM announcements WHERE class_id = 1",
+    "exams for class": "SELECT * FROM exams WHERE class_id = 1",
+}
+
+
+def _seq_scans(plan: dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check_query_plans(engine: Engine) -> Dict[str, List[str]]:
+    """Returns {query name: [tables scanned sequentially]} for every failing query."""
+    failures = {}
+    with engine.connect() as connection:
+        connection.execute(text("SET enable_seqscan = off"))
+        for name, sql in HOT_QUERIES.items():
+            raw = connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            scans = _seq_scans(plan)
+            if scans:
+                failures[name] = scans
+        connection.rollback()
+    return failures
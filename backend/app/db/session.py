@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 import os
@@ -23,6 +24,7 @@ if database == "":
 
 
 DATABASE_URL = f"postgresql+pg8000://{user}:{password}@{host}:{port}/{database}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{database}"
 engine = create_engine(
     DATABASE_URL,
     pool_size=5,          # keep pool small
@@ -38,4 +40,21 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Async engine for the hot, high-concurrency routes; its pool is sized for
+# the database rather than for Starlette's threadpool.
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=int(os.getenv("ASYNC_POOL_SIZE", "20")),
+    max_overflow=int(os.getenv("ASYNC_MAX_OVERFLOW", "20")),
+    pool_timeout=30,
+    pool_recycle=1800,
+    )
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
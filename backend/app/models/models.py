@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, UniqueConstraint, func, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from app.db.base import Base
 
 class User(Base):
@@ -22,7 +22,7 @@ class Exam(Base):
     __tablename__ = 'exams'
     id = Column(Integer, primary_key=True, autoincrement=True)
     teacher_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    class_id = Column(Integer, ForeignKey('classes.id'), nullable=False)
+    class_id = Column(Integer, ForeignKey('classes.id'), nullable=False, index=True)
     title = Column(String, nullable=False)
     description = Column(String)
     status = Column(String, nullable=False)  # e.g., 'scheduled', 'completed'
@@ -31,22 +31,59 @@ class Exam(Base):
 class Question(Base):
     __tablename__ = 'questions'
     id = Column(Integer, primary_key=True, autoincrement=True)
-    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
+    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False, index=True)
     mcq = Column(JSONB, nullable=True)  # For MCQ questions
     one_mark = Column(JSONB, nullable=True)  # For 1-mark questions
     three_mark = Column(JSONB, nullable=True)  # For 3-mark questions
 
 
+# one row per item of Question.mcq/one_mark/three_mark, kept in sync by a
+# trigger on questions (see app/db/migrations.py); ids are stable across
+# edits because responses reference them
+class QuestionItem(Base):
+    __tablename__ = 'question_items'
+    __table_args__ = (
+        UniqueConstraint('question_id', 'type', 'position', name='uq_question_items_question_type_position'),
+        Index('ix_question_items_exam_type', 'exam_id', 'type', 'position'),
+        Index('ix_question_items_text_fts', func.to_tsvector(literal_column("'english'"), literal_column('text')), postgresql_using='gin'),
+        Index('ix_question_items_options', 'options', postgresql_using='gin', postgresql_ops={'options': 'jsonb_path_ops'}),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    question_id = Column(Integer, ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)
+    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
+    type = Column(String, nullable=False)  # 'mcq' | 'one_mark' | 'three_mark'
+    position = Column(Integer, nullable=False)  # index within that type's list
+    text = Column(String, nullable=False)
+    options = Column(JSONB, nullable=True)
+    answer = Column(String, nullable=True)
+    marks = Column(Integer, nullable=False)
+
+
 class StudentResponse(Base):
     __tablename__ = 'student_responses'
+    __table_args__ = (UniqueConstraint('exam_id', 'student_id', 'item_id', name='uq_response_exam_student_item'),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     student_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
     question_id = Column(Integer, ForeignKey('questions.id'), nullable=False)
+    # the question item answered; NULL once that item is removed from the question
+    item_id = Column(Integer, ForeignKey('question_items.id', ondelete='SET NULL'), nullable=True)
     response = Column(String, nullable=False)
     marks_obtained = Column(Integer)
 
 
+# in-progress answers flushed from the autosave buffer (app/services/autosave.py)
+class DraftResponse(Base):
+    __tablename__ = 'draft_responses'
+    __table_args__ = (UniqueConstraint('exam_id', 'student_id', 'item_id', name='uq_draft_exam_student_item'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    student_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
+    question_id = Column(Integer, ForeignKey('questions.id'), nullable=False)
+    item_id = Column(Integer, ForeignKey('question_items.id', ondelete='CASCADE'), nullable=False)
+    response = Column(String, nullable=False)
+
+
 class LessonPlan(Base):
     __tablename__ = 'lesson_plans'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -60,7 +97,7 @@ class Announcement(Base):
     __tablename__ = 'announcements'
     id = Column(Integer, primary_key=True, autoincrement=True)
     teacher_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    class_id = Column(Integer, ForeignKey('classes.id'), nullable=False)
+    class_id = Column(Integer, ForeignKey('classes.id'), nullable=False, index=True)
     title = Column(String, nullable=False)
     content = Column(String, nullable=False)
 
@@ -68,12 +105,48 @@ class Announcement(Base):
 #marks table for students
 class Marks(Base):
     __tablename__ = 'marks'
+    __table_args__ = (UniqueConstraint('exam_id', 'student_id', name='uq_marks_exam_student'),)
     id = Column(Integer, primary_key=True, autoincrement=True)
     student_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     exam_id = Column(Integer, ForeignKey('exams.id'), nullable=False)
     total_marks = Column(Integer, nullable=False)
     results = Column(JSONB, nullable=False)
     max_marks = Column(Integer, nullable=False)
+
+
+# rollups of percentage scores, maintained by the marks trigger (app/services/rollups.py)
+class ExamRollup(Base):
+    __tablename__ = 'exam_rollups'
+    exam_id = Column(Integer, ForeignKey('exams.id'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    total_sq = Column(Float, nullable=False, default=0)
+    min_score = Column(Float)
+    max_score = Column(Float)
+    histogram = Column(ARRAY(Integer), nullable=False)  # 10 buckets of 10%
+
+
+class ClassRollup(Base):
+    __tablename__ = 'class_rollups'
+    class_id = Column(Integer, ForeignKey('classes.id'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    total_sq = Column(Float, nullable=False, default=0)
+    min_score = Column(Float)
+    max_score = Column(Float)
+    histogram = Column(ARRAY(Integer), nullable=False)
+
+
+class StudentRollup(Base):
+    __tablename__ = 'student_rollups'
+    student_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0)
+    total_sq = Column(Float, nullable=False, default=0)
+    min_score = Column(Float)
+    max_score = Column(Float)
+    histogram = Column(ARRAY(Integer), nullable=False)
+
     
 class Student(Base):
     __tablename__ = "students"
@@ -83,4 +156,31 @@ class Student(Base):
     email = Column(String, unique=True, index=True)
     # add other fields like class_id if needed
 
-    
\ No newline at end of file
+    
+
+# completed AI generations keyed by request hash (app/services/generation_cache.py)
+class GenerationCacheEntry(Base):
+    __tablename__ = 'generation_cache'
+    key = Column(String(64), primary_key=True)
+    kind = Column(String, nullable=False)
+    request = Column(JSONB, nullable=False)
+    response = Column(JSONB, nullable=False)
+    created_at = Column(Float, nullable=False, index=True)   # epoch seconds
+    hits = Column(Integer, nullable=False, default=0)
+
+
+# one row per (announcement, channel, recipient), bulk-written by app/services/announce_dispatch.py
+class AnnouncementDelivery(Base):
+    __tablename__ = 'announcement_deliveries'
+    __table_args__ = (UniqueConstraint('announcement_id', 'channel', 'recipient', name='uq_delivery_announcement_channel_recipient'),)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    announcement_id = Column(Integer, ForeignKey('announcements.id'), nullable=False)
+    channel = Column(String, nullable=False)   # 'whatsapp' | 'email' | 'sms'
+    recipient = Column(String, nullable=False)
+    provider = Column(String, nullable=False)
+    status = Column(String, nullable=False)    # 'queued' | 'sent' | 'failed'
+    attempts = Column(Integer, nullable=False, default=0)
+    provider_message_id = Column(String)
+    link = Column(String)                      # wa.me link for the whatsapp channel
+    error = Column(String)
+    updated_at = Column(Float, nullable=False)  # epoch seconds
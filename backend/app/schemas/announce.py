@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class AnnounceGenerateRequest(BaseModel):
     raw_text: str
@@ -14,12 +14,31 @@ class AnnounceGenerateResponse(BaseModel):
 
 class AnnounceSendRequest(BaseModel):
     announcement_id: int
-    channel: str  # e.g., "whatsapp"
-    recipients: List[str]
+    channel: str  # "whatsapp" | "email" | "sms"
+    recipients: List[str]  # entries may hold several, separated by , ; or newlines
 
 class AnnounceSendResponse(BaseModel):
     announcement_id: int
     channel: str
-    recipients: List[str]
+    recipients: List[str]  # normalized and deduped
+    link: Optional[str] = None  # wa.me link of the first recipient (whatsapp)
+    status: str  # "queued": delivery runs in the background
+
+class AnnouncementDeliveryResponse(BaseModel):
+    id: int
+    channel: str
+    recipient: str
+    provider: str
+    status: str  # "queued" | "sent" | "ready" | "failed"
+    attempts: int
     link: Optional[str] = None
-    status: str
+    error: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+class AnnouncementDeliveriesResponse(BaseModel):
+    announcement_id: int
+    counts: Dict[str, Dict[str, int]]  # channel -> status -> count
+    deliveries: List[AnnouncementDeliveryResponse]
+    next_cursor: Optional[int] = None
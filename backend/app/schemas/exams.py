@@ -13,7 +13,10 @@ class ExamGenerateResponse(BaseModel):
     preview_questions: List[Any]
 
 class Answer(BaseModel):
-    question_id: int
+    # item_id picks one item of a question (see GET /questions/exam/{id}/items);
+    # an answer with only question_id refers to that question's first item
+    question_id: Optional[int] = None
+    item_id: Optional[int] = None
     response: str
 
 class ExamSubmitRequest(BaseModel):
@@ -21,6 +24,15 @@ class ExamSubmitRequest(BaseModel):
     student_id: int
     answers: List[Answer]
 
+class AutosaveRequest(BaseModel):
+    session_token: str
+    student_id: int
+    answers: List[Answer]
+
+class AutosaveResponse(BaseModel):
+    exam_id: int
+    saved: int
+
 class ExamSubmitResponse(BaseModel):
     submission_id: int
     partial_grades: Optional[List[dict]] = None
@@ -28,12 +40,19 @@ class ExamSubmitResponse(BaseModel):
     
 class ExamGradeRequest(BaseModel):
     submission_id: int
+    student_id: int
 
 class ExamGradeResponse(BaseModel):
     submission_id: int
     total_marks: int
     graded: bool
     details: Optional[List[dict]] = None
+
+class ExamBatchGradeResponse(BaseModel):
+    exam_id: int
+    students_graded: int
+    responses_graded: int
+    max_marks: int
     
 class ExamResultDetail(BaseModel):
     student_id: int
@@ -59,4 +78,15 @@ class ExamDownloadResponse(BaseModel):
 class ExamStartResponse(BaseModel):
     exam_id: int
     session_token: str
-    link: str
\ No newline at end of file
+    link: str
+    expires_in: Optional[int] = None   # seconds
+
+class ExamSessionsResponse(BaseModel):
+    exam_id: int
+    active_sessions: int
+    student_ids: List[int]
+
+class ExamCloseResponse(BaseModel):
+    exam_id: int
+    status: str
+    sessions_expired: int
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str     # "queued" | "running" | "succeeded" | "failed"
+
+
+class JobStatusResponse(JobSubmitResponse):
+    cached: bool = False            # result served from the generation cache
+    result: Optional[Any] = None    # decoded webhook response once succeeded
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+
+
+class JobQueueStats(BaseModel):
+    jobs: Dict[str, int]
+    cache: Dict[str, float]
+    upstreams: Dict[str, Dict[str, int]]
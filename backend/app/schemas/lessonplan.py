@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, Optional
 
 class LessonPlanCreate(BaseModel):
     teacher_id: int
@@ -12,3 +12,10 @@ class LessonPlanResponse(LessonPlanCreate):
 
     class Config:
         orm_mode = True
+
+class LessonPlanGenerateRequest(BaseModel):
+    teacher_id: int
+    topic: str
+    duration_hours: int
+    grade: Optional[str] = None
+    specific_focus: Optional[str] = None   # syllabus text or extracted PDF text
@@ -1,17 +1,36 @@
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 
 
 class ExamStatsDetail(BaseModel):
-    student_id: int
-    name: str
-    total_marks: float
-    max_marks: int
+    # Optional so `fields=` can leave columns out
+    student_id: Optional[int] = None
+    name: Optional[str] = None
+    total_marks: Optional[float] = None
+    max_marks: Optional[int] = None
+
+class HistogramBucket(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+class ExamStatsSummary(BaseModel):
+    count: int
+    mean: float
+    median: float
+    std_dev: float
+    min: float
+    max: float
+    pass_rate: float
+    percentiles: Dict[str, float]
+    histogram: List[HistogramBucket]
 
 class ExamStatsResponse(BaseModel):
     exam_id: int
     stats: List[ExamStatsDetail]
+    summary: Optional[ExamStatsSummary] = None
+    next_cursor: Optional[int] = None
 
 class ResultDetail(BaseModel):
     index: int
@@ -44,3 +63,19 @@ class MarksSummaryResponse(BaseModel):
     class Config:
         orm_mode = True
 
+
+class ItemStats(BaseModel):
+    item_id: int
+    question_id: int
+    type: Optional[str] = None
+    position: Optional[int] = None
+    max_marks: int
+    responses: int
+    difficulty: float         # mean proportion of marks earned (p-value)
+    discrimination: float     # point-biserial correlation with total score
+    option_counts: Optional[Dict[str, int]] = None   # MCQs only
+
+class ItemAnalysisResponse(BaseModel):
+    exam_id: int
+    students: int
+    items: List[ItemStats]
@@ -23,4 +23,22 @@ class QuestionResponse(QuestionBase):
     id: int
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class BulkPdfExportRequest(BaseModel):
+    exam_ids: Optional[List[int]] = None
+    class_id: Optional[int] = None
+
+class QuestionItemResponse(BaseModel):
+    id: int
+    question_id: int
+    exam_id: int
+    type: str
+    position: int
+    text: str
+    options: Optional[List[Any]] = None
+    answer: Optional[str] = None
+    marks: int
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class RollupResponse(BaseModel):
+    level: str      # "exam" | "class" | "student"
+    key: int
+    count: int
+    mean: float
+    std_dev: float
+    min: float
+    max: float
+    histogram: List[int]   # 10 buckets of 10% each
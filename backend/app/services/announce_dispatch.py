@@ -0,0 +1,376 @@
+"""
+Fan-out delivery of announcements.
+
+send_announcement hands the recipients to the dispatcher and returns at
+once. The dispatcher normalizes and dedupes them, records one
+announcement_deliveries row per recipient (multi-row upserts), cuts them
+into provider-sized batches and sends the batches concurrently through the
+channel's backend under a per-channel token-bucket rate limit. Recipients
+that fail with a retryable error are collected into a retry round, sent
+again after a backoff, up to ANNOUNCE_MAX_ATTEMPTS rounds; every batch's
+outcome is written back in bulk. Re-sending an announcement only retries
+recipients that have not been delivered yet.
+
+Backends are chosen per channel with ANNOUNCE_<CHANNEL>_BACKEND:
+  webhook  - POSTs each batch to ANNOUNCE_<CHANNEL>_URL
+  walink   - whatsapp only: builds wa.me click-to-send links (the default)
+  fake     - local provider for tests and demos that accepts everything
+             and remembers the last ANNOUNCE_FAKE_KEEP messages
+             (ANNOUNCE_FAKE_FAILURE_RATE makes a share of sends fail);
+             only used when selected explicitly
+Email and SMS have no default: until a backend is configured, sends on
+those channels are rejected with ProviderNotConfigured.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+import urllib.parse
+import uuid
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import httpx
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.http import get_client
+from app.db.session import AsyncSessionLocal
+from app.models.models import AnnouncementDelivery
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("whatsapp", "email", "sms")
+MAX_ATTEMPTS = int(os.getenv("ANNOUNCE_MAX_ATTEMPTS", "3"))
+RETRY_DELAY_SECONDS = float(os.getenv("ANNOUNCE_RETRY_DELAY_SECONDS", "2"))
+WRITE_CHUNK_ROWS = 1000
+FAKE_KEEP = int(os.getenv("ANNOUNCE_FAKE_KEEP", "1000"))
+
+QUEUED, SENT, READY, FAILED = "queued", "sent", "ready", "failed"
+DELIVERED = (SENT, READY)
+
+_SPLIT_RE = re.compile(r"[,;\n]+")
+_NOT_DIGIT_RE = re.compile(r"\D")
+
+
+class ProviderNotConfigured(RuntimeError):
+    def __init__(self, channel: str):
+        super().__init__(f"No {channel} provider configured; set ANNOUNCE_{channel.upper()}_BACKEND")
+        self.channel = channel
+
+
+class DeliveryResult(NamedTuple):
+    recipient: str
+    status: str                      # SENT, READY or FAILED
+    provider_message_id: Optional[str] = None
+    link: Optional[str] = None
+    error: Optional[str] = None
+    retryable: bool = False
+
+
+class RateLimiter:
+    """Token bucket: `rate` tokens per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1) -> None:
+        tokens = min(tokens, self.burst)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class ChannelBackend:
+    """Sends one message to a batch of recipients; one result per recipient."""
+
+    name = "base"
+
+    def __init__(self, batch_size: int = 100, rate_per_second: float = 50, concurrency: int = 4):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate_per_second, burst=max(rate_per_second, batch_size))
+
+    async def send_batch(self, message: str, recipients: List[str]) -> List[DeliveryResult]:
+        raise NotImplementedError
+
+
+class FakeProvider(ChannelBackend):
+    name = "fake"
+
+    def __init__(self, failure_rate: float = 0.0, keep: int = FAKE_KEEP, **kwargs):
+        super().__init__(**kwargs)
+        self.failure_rate = failure_rate
+        self.sent: "deque[tuple]" = deque(maxlen=keep)   # latest (recipient, message)
+        self.sent_count = 0
+
+    async def send_batch(self, message: str, recipients: List[str]) -> List[DeliveryResult]:
+        results = []
+        for recipient in recipients:
+            if random.random() < self.failure_rate:
+                results.append(DeliveryResult(recipient, FAILED, error="fake provider failure", retryable=True))
+            else:
+                self.sent.append((recipient, message))
+                self.sent_count += 1
+                results.append(DeliveryResult(recipient, SENT, provider_message_id=uuid.uuid4().hex))
+        return results
+
+
+class WhatsAppLinkBackend(ChannelBackend):
+    """No API involved: each recipient gets a wa.me link the teacher opens to send."""
+    name = "walink"
+
+    @staticmethod
+    def link(recipient: str, message: str) -> str:
+        return f"https://wa.me/{recipient}?text={urllib.parse.quote(message)}"
+
+    async def send_batch(self, message: str, recipients: List[str]) -> List[DeliveryResult]:
+        return [DeliveryResult(r, READY, link=self.link(r, message)) for r in recipients]
+
+
+class WebhookProvider(ChannelBackend):
+    """
+    POSTs {"channel", "message", "recipients"} to a provider endpoint.
+    A 2xx answer accepts the whole batch unless it lists per-recipient
+    outcomes as {"results": [{"recipient", "id"?, "error"?}]}.
+    """
+    name = "webhook"
+
+    def __init__(self, channel: str, url: str, timeout: float = 30, **kwargs):
+        super().__init__(**kwargs)
+        self.channel = channel
+        self.url = url
+        self.timeout = timeout
+
+    async def send_batch(self, message: str, recipients: List[str]) -> List[DeliveryResult]:
+        try:
+            response = await get_client().post(
+                self.url,
+                json={"channel": self.channel, "message": message, "recipients": recipients},
+                timeout=self.timeout,
+            )
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            return [DeliveryResult(r, FAILED, error=f"request failed: {e!r}", retryable=True) for r in recipients]
+
+        if response.status_code >= 400:
+            retryable = response.status_code == 429 or response.status_code >= 500
+            error = f"HTTP {response.status_code}: {response.text[:200]}"
+            return [DeliveryResult(r, FAILED, error=error, retryable=retryable) for r in recipients]
+
+        try:
+            outcomes = {item["recipient"]: item for item in (response.json() or {}).get("results", [])}
+        except (ValueError, AttributeError, KeyError, TypeError):
+            outcomes = {}
+        results = []
+        for recipient in recipients:
+            outcome = outcomes.get(recipient, {})
+            if outcome.get("error"):
+                results.append(DeliveryResult(recipient, FAILED, error=str(outcome["error"])[:500]))
+            else:
+                results.append(DeliveryResult(recipient, SENT, provider_message_id=outcome.get("id")))
+        return results
+
+
+def _env(channel: str, setting: str, default: str) -> str:
+    return os.getenv(f"ANNOUNCE_{channel.upper()}_{setting}", default)
+
+
+def make_backend(channel: str) -> ChannelBackend:
+    kind = _env(channel, "BACKEND", "walink" if channel == "whatsapp" else "")
+    if not kind:
+        raise ProviderNotConfigured(channel)
+    options = {
+        "batch_size": int(_env(channel, "BATCH_SIZE", "100")),
+        "rate_per_second": float(_env(channel, "RATE", "50")),
+        "concurrency": int(_env(channel, "CONCURRENCY", "4")),
+    }
+    if kind == "walink":
+        return WhatsAppLinkBackend(**options)
+    if kind == "webhook":
+        url = _env(channel, "URL", "")
+        if not url:
+            raise RuntimeError(f"ANNOUNCE_{channel.upper()}_BACKEND=webhook requires ANNOUNCE_{channel.upper()}_URL")
+        return WebhookProvider(channel, url, **options)
+    if kind == "fake":
+        return FakeProvider(failure_rate=float(os.getenv("ANNOUNCE_FAKE_FAILURE_RATE", "0")), keep=FAKE_KEEP, **options)
+    raise RuntimeError(f"Unknown announcement backend {kind!r} for {channel}")
+
+
+def normalize_recipients(channel: str, recipients: Iterable[str]) -> List[str]:
+    """Splits comma/semicolon/newline separated entries, normalizes and dedupes (order kept)."""
+    seen = {}
+    for entry in recipients:
+        for recipient in _SPLIT_RE.split(entry or ""):
+            if channel == "email":
+                recipient = recipient.strip().lower()
+            else:
+                # WhatsApp and SMS take bare international numbers
+                recipient = _NOT_DIGIT_RE.sub("", recipient)
+            if recipient:
+                seen.setdefault(recipient, None)
+    return list(seen)
+
+
+async def _upsert_deliveries(rows: List[Dict[str, Any]]) -> None:
+    """Multi-row INSERT ... ON CONFLICT (announcement_id, channel, recipient) DO UPDATE."""
+    async with AsyncSessionLocal() as db:
+        for start in range(0, len(rows), WRITE_CHUNK_ROWS):
+            stmt = pg_insert(AnnouncementDelivery).values(rows[start:start + WRITE_CHUNK_ROWS])
+            await db.execute(stmt.on_conflict_do_update(
+                constraint="uq_delivery_announcement_channel_recipient",
+                set_={
+                    column: stmt.excluded[column]
+                    for column in ("provider", "status", "attempts", "provider_message_id", "link", "error", "updated_at")
+                },
+            ))
+        await db.commit()
+
+
+async def _pending(announcement_id: int, channel: str, recipients: List[str]) -> Dict[str, int]:
+    """recipient -> attempts so far, leaving out those already delivered."""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(AnnouncementDelivery.recipient, AnnouncementDelivery.status, AnnouncementDelivery.attempts)
+            .where(AnnouncementDelivery.announcement_id == announcement_id, AnnouncementDelivery.channel == channel)
+        )).all()
+    known = {recipient: (status, attempts) for recipient, status, attempts in rows}
+    return {
+        r: known.get(r, (QUEUED, 0))[1]
+        for r in recipients
+        if known.get(r, (QUEUED, 0))[0] not in DELIVERED
+    }
+
+
+class AnnouncementDispatcher:
+    def __init__(self, max_attempts: int = MAX_ATTEMPTS, retry_delay: float = RETRY_DELAY_SECONDS):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._backends: Dict[str, ChannelBackend] = {}
+        self._tasks: set = set()
+        self.batches_sent = 0
+        self.retries = 0
+        self.delivered = 0
+        self.failed = 0
+
+    def backend(self, channel: str) -> ChannelBackend:
+        if channel not in self._backends:
+            self._backends[channel] = make_backend(channel)
+        return self._backends[channel]
+
+    def set_backend(self, channel: str, backend: ChannelBackend) -> None:
+        self._backends[channel] = backend
+
+    def submit(self, announcement_id: int, channel: str, message: str, recipients: List[str]) -> asyncio.Task:
+        """Starts delivery in the background."""
+        task = asyncio.create_task(self._dispatch_logged(announcement_id, channel, message, recipients))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _dispatch_logged(self, announcement_id: int, channel: str, message: str, recipients: List[str]) -> None:
+        try:
+            counts = await self.dispatch(announcement_id, channel, message, recipients)
+            logger.info("Announcement %s via %s: %s", announcement_id, channel, counts)
+        except Exception:
+            logger.exception("Announcement %s via %s failed", announcement_id, channel)
+
+    async def dispatch(self, announcement_id: int, channel: str, message: str, recipients: List[str]) -> Dict[str, int]:
+        backend = self.backend(channel)
+        attempts = await _pending(announcement_id, channel, recipients)
+        counts = {SENT: 0, READY: 0, FAILED: 0}
+
+        def row(result: DeliveryResult) -> Dict[str, Any]:
+            return {
+                "announcement_id": announcement_id,
+                "channel": channel,
+                "recipient": result.recipient,
+                "provider": backend.name,
+                "status": result.status,
+                "attempts": attempts[result.recipient],
+                "provider_message_id": result.provider_message_id,
+                "link": result.link,
+                "error": result.error,
+                "updated_at": time.time(),
+            }
+
+        await _upsert_deliveries([row(DeliveryResult(r, QUEUED)) for r in attempts])
+
+        slots = asyncio.Semaphore(backend.concurrency)
+
+        async def send(batch: List[str]) -> List[DeliveryResult]:
+            async with slots:
+                await backend.limiter.acquire(len(batch))
+                try:
+                    results = await backend.send_batch(message, batch)
+                except Exception as e:
+                    logger.exception("%s backend raised on a batch of %d", backend.name, len(batch))
+                    results = [DeliveryResult(r, FAILED, error=f"{type(e).__name__}: {e}", retryable=True) for r in batch]
+                self.batches_sent += 1
+                for result in results:
+                    attempts[result.recipient] += 1
+                await _upsert_deliveries([row(result) for result in results])
+                return results
+
+        pending = list(attempts)
+        for round_number in range(self.max_attempts):
+            if not pending:
+                break
+            if round_number:
+                self.retries += len(pending)
+                await asyncio.sleep(self.retry_delay * (2 ** (round_number - 1)))
+            batches = [pending[i:i + backend.batch_size] for i in range(0, len(pending), backend.batch_size)]
+            pending = []
+            for results in await asyncio.gather(*(send(batch) for batch in batches)):
+                for result in results:
+                    if result.status == FAILED and result.retryable and round_number + 1 < self.max_attempts:
+                        pending.append(result.recipient)
+                    else:
+                        counts[result.status] += 1
+
+        self.delivered += counts[SENT] + counts[READY]
+        self.failed += counts[FAILED]
+        return counts
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_progress": len(self._tasks),
+            "batches_sent": self.batches_sent,
+            "retries": self.retries,
+            "delivered": self.delivered,
+            "failed": self.failed,
+        }
+
+
+async def delivery_counts(announcement_id: int) -> Dict[str, Dict[str, int]]:
+    """channel -> status -> count"""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(AnnouncementDelivery.channel, AnnouncementDelivery.status, func.count())
+            .where(AnnouncementDelivery.announcement_id == announcement_id)
+            .group_by(AnnouncementDelivery.channel, AnnouncementDelivery.status)
+        )).all()
+    counts: Dict[str, Dict[str, int]] = {}
+    for channel, status, count in rows:
+        counts.setdefault(channel, {})[status] = count
+    return counts
+
+
+dispatcher = AnnouncementDispatcher()
@@ -0,0 +1,248 @@
+"""
+Write-behind buffer for in-progress exam answers.
+
+Autosaves land in memory, last write wins per (exam, student, question).
+A background task flushes dirty answers to draft_responses every
+AUTOSAVE_FLUSH_SECONDS with multi-row upserts, and once more on shutdown.
+The buffer holds at most AUTOSAVE_MAX_SESSIONS sessions: clean ones are
+evicted first, and a full buffer of dirty ones triggers an early flush.
+
+Answers are keyed by question item. The route only buffers items of the
+exam's answer key (exam_items), and each flush batch commits on its own. A batch that
+violates a constraint (e.g. a student id with no user row) is retried
+session by session, and only the sessions that still fail are dropped, so
+one bad session cannot block everyone else's drafts. Connection errors put
+the unwritten rows back for the next flush.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import ReadThroughCache
+from app.db.session import AsyncSessionLocal
+from app.models.models import DraftResponse, QuestionItem
+from app.services.grading import TYPE_ORDER
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = float(os.getenv("AUTOSAVE_FLUSH_SECONDS", "5"))
+MAX_SESSIONS = int(os.getenv("AUTOSAVE_MAX_SESSIONS", "5000"))
+FLUSH_BATCH_ROWS = 1000
+
+SessionKey = Tuple[int, int]   # (exam_id, student_id)
+
+# exam_id -> JSON list of [item_id, question_id] in answer-key order
+exam_items_cache = ReadThroughCache("exam-items", ttl=float(os.getenv("AUTOSAVE_EXAM_ITEMS_TTL", "300")))
+
+
+async def _load_exam_items(exam_id: int) -> bytes:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(QuestionItem.id, QuestionItem.question_id, QuestionItem.type, QuestionItem.position)
+            .where(QuestionItem.exam_id == exam_id)
+        )).all()
+    rows.sort(key=lambda r: (r.question_id, TYPE_ORDER.get(r.type, len(TYPE_ORDER)), r.position))
+    return json.dumps([[r.id, r.question_id] for r in rows]).encode("utf-8")
+
+
+async def exam_items(exam_id: int, expected_items: Iterable[int] = (), expected_questions: Iterable[int] = ()) -> Dict[int, Dict[str, int]]:
+    """
+    {item_id: {"question_id"}} for the exam's answer key, cached, in the
+    order grading.first_items expects. If an expected item or question is
+    missing (questions added since the cache was filled), reloads once.
+    """
+    async def load():
+        rows = json.loads(await exam_items_cache.get_or_load(exam_id, lambda: _load_exam_items(exam_id)))
+        return {item_id: {"question_id": question_id} for item_id, question_id in rows}
+
+    items = await load()
+    expected_items = set(expected_items) - {None}
+    expected_questions = set(expected_questions) - {None}
+    if not (expected_items <= items.keys() and expected_questions <= {i["question_id"] for i in items.values()}):
+        await exam_items_cache.invalidate(exam_id)
+        items = await load()
+    return items
+
+
+class AutosaveBuffer:
+    def __init__(self, max_sessions: int = MAX_SESSIONS, flush_seconds: float = FLUSH_SECONDS):
+        self.max_sessions = max_sessions
+        self.flush_seconds = flush_seconds
+        # item_id -> (question_id, response) per session
+        self._answers: "OrderedDict[SessionKey, Dict[int, Tuple[int, str]]]" = OrderedDict()
+        self._dirty: Dict[SessionKey, Set[int]] = {}
+        self._flush_now = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # write amplification: answers received vs rows written
+        self.answers_received = 0
+        self.rows_flushed = 0
+        self.rows_rejected = 0
+        self.flushes = 0
+
+    def save(self, exam_id: int, student_id: int, answers: Iterable[Tuple[int, int, str]]) -> None:
+        """Buffers (item_id, question_id, response) answers."""
+        key = (exam_id, student_id)
+        session = self._answers.setdefault(key, {})
+        dirty = self._dirty.get(key, set())
+        for item_id, question_id, response in answers:
+            self.answers_received += 1
+            # Clients resend the whole sheet; only answers that changed need a write
+            if session.get(item_id) != (question_id, response):
+                session[item_id] = (question_id, response)
+                dirty.add(item_id)
+        if dirty:
+            self._dirty[key] = dirty
+        self._answers.move_to_end(key)
+        self._enforce_bound()
+
+    def peek(self, exam_id: int, student_id: int) -> Optional[Dict[int, str]]:
+        """item_id -> response of a buffered session, or None if it is not buffered."""
+        session = self._answers.get((exam_id, student_id))
+        return {item_id: response for item_id, (_, response) in session.items()} if session is not None else None
+
+    def discard(self, exam_id: int, student_id: int) -> None:
+        self._answers.pop((exam_id, student_id), None)
+        self._dirty.pop((exam_id, student_id), None)
+
+    def _enforce_bound(self) -> None:
+        for key in list(self._answers):
+            if len(self._answers) <= self.max_sessions:
+                return
+            if key not in self._dirty:
+                del self._answers[key]
+        if len(self._answers) > self.max_sessions:
+            self._flush_now.set()
+
+    async def flush(self) -> int:
+        dirty, self._dirty = self._dirty, {}
+        sessions: List[List[Dict[str, Any]]] = [
+            [
+                {"exam_id": exam_id, "student_id": student_id, "item_id": item_id,
+                 "question_id": session[item_id][0], "response": session[item_id][1]}
+                for item_id in item_ids
+            ]
+            for (exam_id, student_id), item_ids in dirty.items()
+            for session in [self._answers.get((exam_id, student_id))]
+            if session is not None
+        ]
+        batches = list(_batches(sessions, FLUSH_BATCH_ROWS))
+        written = 0
+        for i, batch in enumerate(batches):
+            try:
+                written += await self._write_batch(batch)
+            except BaseException:
+                # put the unwritten answers back so the next flush retries them
+                for rows in (rows for pending in batches[i:] for rows in pending):
+                    key = (rows[0]["exam_id"], rows[0]["student_id"])
+                    if key in self._answers:
+                        self._dirty.setdefault(key, set()).update(row["item_id"] for row in rows)
+                raise
+        if written:
+            self.rows_flushed += written
+            self.flushes += 1
+            logger.debug("autosave flush: %s", self.stats())
+        return written
+
+    async def _write_batch(self, sessions: List[List[Dict[str, Any]]]) -> int:
+        """Writes whole sessions in one transaction, or session by session if that is rejected."""
+        try:
+            await self._write([row for rows in sessions for row in rows])
+            return sum(len(rows) for rows in sessions)
+        except IntegrityError:
+            if len(sessions) == 1:
+                rows = sessions[0]
+                logger.warning(
+                    "Dropping %s autosaved answers of student %s in exam %s rejected by the database",
+                    len(rows), rows[0]["student_id"], rows[0]["exam_id"],
+                )
+                self.rows_rejected += len(rows)
+                return 0
+        written = 0
+        for rows in sessions:
+            written += await self._write_batch([rows])
+        return written
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        async with AsyncSessionLocal() as db:
+            stmt = pg_insert(DraftResponse).values(rows)
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[DraftResponse.exam_id, DraftResponse.student_id, DraftResponse.item_id],
+                set_={"response": stmt.excluded.response},
+            ))
+            await db.commit()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Autosave flush failed; will retry")
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        logger.info("autosave buffer stopped: %s", self.stats())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "answers_received": self.answers_received,
+            "rows_flushed": self.rows_flushed,
+            "rows_rejected": self.rows_rejected,
+            "flushes": self.flushes,
+            "write_amplification": round(self.rows_flushed / self.answers_received, 4) if self.answers_received else 0.0,
+        }
+
+
+def _batches(sessions: List[List[Dict[str, Any]]], max_rows: int) -> Iterable[List[List[Dict[str, Any]]]]:
+    """Groups whole sessions into batches of about max_rows rows."""
+    batch, size = [], 0
+    for rows in sessions:
+        if batch and size + len(rows) > max_rows:
+            yield batch
+            batch, size = [], 0
+        batch.append(rows)
+        size += len(rows)
+    if batch:
+        yield batch
+
+
+async def load_drafts(db: AsyncSession, exam_id: int, student_id: int) -> Dict[int, str]:
+    """item_id -> response of the student's flushed drafts."""
+    rows = await db.execute(
+        select(DraftResponse.item_id, DraftResponse.response)
+        .where(DraftResponse.exam_id == exam_id, DraftResponse.student_id == student_id)
+    )
+    return dict(rows.all())
+
+
+async def clear_drafts(db: AsyncSession, exam_id: int, student_id: int) -> None:
+    await db.execute(
+        delete(DraftResponse)
+        .where(DraftResponse.exam_id == exam_id, DraftResponse.student_id == student_id)
+    )
+
+
+autosave_buffer = AutosaveBuffer()
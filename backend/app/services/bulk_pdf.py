@@ -0,0 +1,83 @@
+"""
+Streams many exam PDFs as one ZIP archive.
+
+At most WORKERS exams (the renderer's worker count, so a bulk job cannot
+fill the interactive queue) are in flight at a time: each is read from the
+cache or rendered, appended to the archive as soon as it finishes, and only
+then is the next exam started. Since a new entry is only started after the
+previous bytes were taken by the client, a slow reader holds back the
+renders and cache reads instead of letting finished PDFs pile up. The ZIP
+is written to a non-seekable sink, so zipfile emits data descriptors and
+at most WORKERS PDFs are held in memory.
+"""
+import asyncio
+import re
+import zipfile
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.services import pdf_cache, pdf_renderer
+
+
+class _ChunkSink:
+    """Write-only file object collecting bytes until the generator yields them."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _entry_name(payload: Dict[str, Any]) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", payload["title"]).strip("_")[:60]
+    return f"exam_{payload['exam_id']}_{slug}.pdf" if slug else f"exam_{payload['exam_id']}.pdf"
+
+
+async def _cached_render(payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+    digest = pdf_cache.content_digest(payload)
+    pdf = pdf_cache.get(digest)
+    if pdf is None:
+        pdf = await pdf_renderer.render(payload, wait=True)
+        pdf_cache.put(digest, pdf)
+    return payload, pdf
+
+
+async def stream_pdf_zip(payloads: List[Dict[str, Any]], window: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yields ZIP bytes, adding each exam's PDF in completion order."""
+    window = window or pdf_renderer.WORKERS
+    remaining = iter(payloads)
+    in_flight: Set[asyncio.Future] = set()
+    sink = _ChunkSink()
+
+    def refill():
+        while len(in_flight) < window:
+            payload = next(remaining, None)
+            if payload is None:
+                return
+            in_flight.add(asyncio.ensure_future(_cached_render(payload)))
+
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            refill()
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    in_flight.discard(task)
+                    payload, pdf = task.result()
+                    archive.writestr(_entry_name(payload), pdf)
+                    yield sink.drain()
+                refill()
+        # central directory
+        yield sink.drain()
+    finally:
+        for task in in_flight:
+            task.cancel()
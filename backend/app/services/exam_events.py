@@ -0,0 +1,58 @@
+"""
+Live exam monitoring events.
+
+The exam write paths publish small events on the exam's topic: started
+(session opened), autosaved, submitted, graded and closed. Dashboards
+watch them through GET /exams/{exam_id}/live (SSE) or the /live/ws
+WebSocket, so each event is one broadcast instead of every open results
+page re-querying the stats. Publishing is best effort and never fails the
+request that triggered it.
+"""
+import functools
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from anyio import from_thread
+
+from app.core.pubsub import make_broker
+
+logger = logging.getLogger(__name__)
+
+broker = make_broker()
+
+
+def exam_topic(exam_id: int) -> str:
+    return f"exam:{exam_id}"
+
+
+async def publish_exam_event(exam_id: int, event_type: str, **data: Any) -> None:
+    message = {"type": event_type, "exam_id": exam_id, "at": time.time(), **data}
+    try:
+        await broker.publish(exam_topic(exam_id), message)
+    except Exception:
+        logger.exception("Could not publish %s event for exam %s", event_type, exam_id)
+
+
+def publish_exam_event_from_thread(exam_id: int, event_type: str, **data: Any) -> None:
+    """publish_exam_event for sync routes running in the threadpool."""
+    try:
+        from_thread.run(functools.partial(publish_exam_event, exam_id, event_type, **data))
+    except RuntimeError:
+        logger.exception("Could not publish %s event for exam %s", event_type, exam_id)
+
+
+async def watch_exam(
+    exam_id: int,
+    snapshot: Callable[[], Awaitable[Dict[str, Any]]],
+    keepalive: float = 15,
+) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    Yields a snapshot, then every event of the exam as it is published, and
+    None whenever `keepalive` seconds pass without one. Subscribes before
+    taking the snapshot so nothing published in between is missed.
+    """
+    async with await broker.subscribe(exam_topic(exam_id)) as subscription:
+        yield {"type": "snapshot", "exam_id": exam_id, "at": time.time(), **(await snapshot())}
+        while True:
+            yield await subscription.get(timeout=keepalive)
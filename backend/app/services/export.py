@@ -0,0 +1,73 @@
+"""
+Streaming CSV/NDJSON export of marks and responses.
+
+Rows come from a server-side cursor (AsyncSession.stream + yield_per) on a
+session owned by the generator, and each partition is encoded and yielded
+straight away: memory stays flat however big the class is, and the first
+bytes leave before the query has finished.
+"""
+import csv
+import io
+import json
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.models.models import Exam, Marks, StudentResponse, User
+
+CHUNK_ROWS = 500
+
+EXPORT_COLUMNS = {
+    "marks": ["exam_id", "student_id", "name", "total_marks", "max_marks"],
+    "responses": ["exam_id", "student_id", "question_id", "item_id", "response", "marks_obtained"],
+}
+
+
+def export_query(kind: str, exam_id: Optional[int], class_id: Optional[int]):
+    if kind == "marks":
+        query = (
+            select(Marks.exam_id, Marks.student_id, User.name, Marks.total_marks, Marks.max_marks)
+            .outerjoin(User, User.id == Marks.student_id)
+            .order_by(Marks.exam_id, Marks.student_id)
+        )
+        table = Marks
+    else:
+        query = (
+            select(StudentResponse.exam_id, StudentResponse.student_id, StudentResponse.question_id,
+                   StudentResponse.item_id, StudentResponse.response, StudentResponse.marks_obtained)
+            # Matches uq_response_exam_student_item, so Postgres reads the index instead of sorting
+            .order_by(StudentResponse.exam_id, StudentResponse.student_id, StudentResponse.item_id)
+        )
+        table = StudentResponse
+    if exam_id is not None:
+        query = query.where(table.exam_id == exam_id)
+    if class_id is not None:
+        query = query.where(table.exam_id.in_(select(Exam.id).where(Exam.class_id == class_id)))
+    return query
+
+
+def _encode_csv(rows: List[tuple], header: Optional[List[str]] = None) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _encode_ndjson(rows: List[tuple], columns: List[str]) -> bytes:
+    return "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows).encode("utf-8")
+
+
+async def stream_export(kind: str, fmt: str, exam_id: Optional[int] = None, class_id: Optional[int] = None) -> AsyncIterator[bytes]:
+    columns = EXPORT_COLUMNS[kind]
+    if fmt == "csv":
+        yield _encode_csv([], columns)
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(
+            export_query(kind, exam_id, class_id).execution_options(yield_per=CHUNK_ROWS)
+        )
+        async for partition in result.partitions(CHUNK_ROWS):
+            rows = [tuple(row) for row in partition]
+            yield _encode_csv(rows) if fmt == "csv" else _encode_ndjson(rows, columns)
@@ -0,0 +1,175 @@
+"""
+Result cache for exam and lesson-plan generations.
+
+Requests are reduced to the fields that decide the output (the
+ExamGenerateRequest fields for exams; topic, duration, grade and focus for
+lesson plans), normalized (case, whitespace, zero counts) and hashed, so
+equivalent requests from different teachers share one entry. Entries live
+in the generation_cache table for GENERATION_CACHE_TTL seconds, and at most
+GENERATION_CACHE_MAX_ENTRIES are kept (oldest dropped first). In-flight
+dedupe of identical requests is done by the job queue, which joins callers
+to the running job, and by the SSE streams, which join the webhook stream
+already in progress (app.services.generation_stream).
+
+Exam entries hold only the generated question lists, never the exam_id
+of the generation that filled them: each requester served from the cache
+(or joined to a running generation) gets a new Exam of their own.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.db.session import AsyncSessionLocal
+from app.models.models import GenerationCacheEntry
+from app.schemas.exams import ExamGenerateRequest
+
+logger = logging.getLogger(__name__)
+
+TTL_SECONDS = float(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "5000"))
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = _SPACE_RE.sub(" ", str(value)).strip().lower()
+    return text or None
+
+
+def _exam_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # The exam page sends the syllabus text as syllabus_url
+    request = ExamGenerateRequest(
+        topic=payload.get("topic") or "",
+        syllabus=payload.get("syllabus") or payload.get("syllabus_url"),
+        counts={key: int(value or 0) for key, value in (payload.get("counts") or {}).items()},
+        difficulty=payload.get("difficulty"),
+    )
+    return {
+        "topic": _text(request.topic),
+        "syllabus": _text(request.syllabus),
+        "counts": {key: count for key, count in sorted(request.counts.items()) if count > 0},
+        "difficulty": _text(request.difficulty),
+    }
+
+
+def _lessonplan_request(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # LessonPlanCreate.topic/duration_hours, plus what the generator is given
+    hours = payload.get("duration_hours", payload.get("hours"))
+    return {
+        "topic": _text(payload.get("topic")),
+        "duration_hours": int(hours) if hours not in (None, "") else None,
+        "grade": _text(payload.get("grade")),
+        "specific_focus": _text(payload.get("specific_focus")),
+    }
+
+
+CANONICALIZERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "exam": _exam_request,
+    "lessonplan": _lessonplan_request,
+}
+
+
+def canonical_request(kind: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Normalized request for cacheable kinds, None for everything else."""
+    canonicalize = CANONICALIZERS.get(kind)
+    if canonicalize is None:
+        return None
+    try:
+        return canonicalize(payload)
+    except (TypeError, ValueError):
+        # Malformed requests go straight upstream, which reports the error
+        return None
+
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    canonical = json.dumps([kind, request], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    def __init__(self, ttl_seconds: float = TTL_SECONDS, max_entries: int = MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.joined = 0     # callers attached to an identical in-flight generation
+        self.bypassed = 0   # regenerate requests
+        self.stored = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        try:
+            async with AsyncSessionLocal() as db:
+                response = (await db.execute(
+                    update(GenerationCacheEntry)
+                    .where(
+                        GenerationCacheEntry.key == key,
+                        GenerationCacheEntry.created_at > time.time() - self.ttl_seconds,
+                    )
+                    .values(hits=GenerationCacheEntry.hits + 1)
+                    .returning(GenerationCacheEntry.response)
+                )).scalar()
+                await db.commit()
+        except (SQLAlchemyError, OSError):
+            # A cache outage only costs a generation
+            logger.exception("Generation cache lookup failed")
+            response = None
+        if response is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return response
+
+    async def put(self, kind: str, key: str, request: Dict[str, Any], response: Any) -> None:
+        if response is None:
+            return
+        stmt = pg_insert(GenerationCacheEntry).values(
+            key=key, kind=kind, request=request, response=response, created_at=time.time(), hits=0
+        )
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt.on_conflict_do_update(
+                    index_elements=[GenerationCacheEntry.key],
+                    set_={"response": stmt.excluded.response, "created_at": stmt.excluded.created_at, "hits": 0},
+                ))
+                await self._prune(db)
+                await db.commit()
+        except (SQLAlchemyError, OSError):
+            logger.exception("Generation cache store failed")
+            return
+        self.stored += 1
+
+    async def _prune(self, db) -> None:
+        await db.execute(
+            delete(GenerationCacheEntry)
+            .where(GenerationCacheEntry.created_at <= time.time() - self.ttl_seconds)
+        )
+        overflow = (
+            select(GenerationCacheEntry.key)
+            .order_by(GenerationCacheEntry.created_at.desc())
+            .offset(self.max_entries)
+        )
+        await db.execute(delete(GenerationCacheEntry).where(GenerationCacheEntry.key.in_(overflow)))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "joined": self.joined,
+            "bypassed": self.bypassed,
+            "stored": self.stored,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+generation_cache = GenerationCache()
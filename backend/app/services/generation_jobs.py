@@ -0,0 +1,241 @@
+"""
+In-process job queue for AI generation webhooks.
+
+A submitted job gets an id straight away and runs as a background task
+against its upstream (see app.core.http), so slow generations never hold a
+browser connection open. Callers poll, long-poll (wait) or stream the job.
+Finished jobs are kept for JOB_RETENTION_SECONDS, and at most JOB_MAX_KEPT
+of them are kept, oldest dropped first.
+
+Exam and lesson-plan jobs go through the generation cache: a submit
+identical to a running job gets a job of its own that waits for that
+job's output instead of calling the webhook again, a cached result
+finishes the job without calling the webhook, and regenerate=True skips
+both lookups (the fresh result replaces the cached one). For exams only
+the question lists are shared; every job that did not create its exam
+upstream saves a new Exam, so no two requesters get the same exam_id.
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.http import UPSTREAMS, UpstreamError, post_json
+from app.services.generation_cache import canonical_request, generation_cache, request_key
+from app.services.generation_stream import exam_questions, save_exam
+
+RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+MAX_KEPT = int(os.getenv("JOB_MAX_KEPT", "1000"))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+
+
+class UnknownJobKind(Exception):
+    pass
+
+
+class JobFailed(Exception):
+    """The generation a joined job was waiting for failed."""
+
+    def __str__(self) -> str:
+        return str(self.args[0])
+
+
+class Job:
+    def __init__(self, kind: str, payload: Dict[str, Any], cache_key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.cache_key = cache_key
+        self.cached = False
+        self.content: Any = None   # what the cache holds and joined jobs reuse
+        self.status = QUEUED
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._done = asyncio.Event()
+        self._changed = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    async def _set_status(self, status: str) -> None:
+        async with self._changed:
+            self.status = status
+            if status in (SUCCEEDED, FAILED):
+                self.finished_at = time.time()
+                self._done.set()
+            self._changed.notify_all()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the job has finished; False if timeout ran out first."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def wait_for_change(self, status: str, timeout: Optional[float] = None) -> str:
+        """Waits until the status differs from `status` (or timeout) and returns it."""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(self._changed.wait_for(lambda: self.status != status), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return self.status
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "cached": self.cached,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    def __init__(self, retention_seconds: float = RETENTION_SECONDS, max_kept: int = MAX_KEPT):
+        self.retention_seconds = retention_seconds
+        self.max_kept = max_kept
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._in_flight: Dict[str, Job] = {}   # cache key -> running job
+
+    def submit(self, kind: str, payload: Dict[str, Any], regenerate: bool = False) -> Job:
+        if kind not in UPSTREAMS:
+            raise UnknownJobKind(kind)
+
+        request = canonical_request(kind, payload)
+        cache_key = request_key(kind, request) if request is not None else None
+        if cache_key is not None:
+            if regenerate:
+                generation_cache.bypassed += 1
+            elif cache_key in self._in_flight and not self._in_flight[cache_key].finished:
+                generation_cache.joined += 1
+                leader = self._in_flight[cache_key]
+                return self._start(Job(kind, payload), self._follow(leader))
+
+        job = Job(kind, payload, cache_key)
+        if cache_key is not None:
+            self._in_flight[cache_key] = job
+        return self._start(job, self._generate(request, lookup=not regenerate))
+
+    def _start(self, job: Job, produce) -> Job:
+        self._prune()
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(job, produce))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._finished(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def _finished(self, job: Job) -> None:
+        self._tasks.pop(job.id, None)
+        if self._in_flight.get(job.cache_key) is job:
+            del self._in_flight[job.cache_key]
+
+    async def _run(self, job: Job, produce) -> None:
+        """Runs `produce(job)`, which fills job.content and job.result."""
+        await job._set_status(RUNNING)
+        try:
+            await produce(job)
+        except (UpstreamError, JobFailed) as e:
+            job.error = str(e)
+            await job._set_status(FAILED)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            await job._set_status(FAILED)
+        else:
+            await job._set_status(SUCCEEDED)
+
+    def _generate(self, request: Optional[Dict[str, Any]], lookup: bool = True):
+        async def produce(job: Job) -> None:
+            response = None
+            if job.cache_key is not None and lookup:
+                cached = await generation_cache.get(job.cache_key)
+                job.cached = cached is not None
+                if job.cached:
+                    # Entries written before exams were cached as content still carry an exam_id
+                    job.content = _content(job.kind, cached)
+            if not job.cached:
+                response = await post_json(UPSTREAMS[job.kind], job.payload)
+                job.content = _content(job.kind, response)
+                if job.cache_key is not None:
+                    await generation_cache.put(job.kind, job.cache_key, request, job.content)
+            job.result = await _result(job, response)
+        return produce
+
+    def _follow(self, leader: Job):
+        async def produce(job: Job) -> None:
+            await leader.wait()
+            if leader.error is not None:
+                raise JobFailed(leader.error)
+            job.content = leader.content
+            job.result = await _result(job, None)
+        return produce
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and (job.finished_at < cutoff or len(self._jobs) >= self.max_kept):
+                del self._jobs[job_id]
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        by_status: Dict[str, int] = {}
+        for job in self._jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "jobs": by_status,
+            "cache": generation_cache.stats(),
+            "upstreams": {name: upstream.stats() for name, upstream in UPSTREAMS.items()},
+        }
+
+
+def _content(kind: str, response: Any) -> Any:
+    """The shareable part of a webhook response: exam question lists, or the response itself."""
+    if kind != "exam":
+        return response
+    questions = exam_questions(response)
+    # Nothing to share (or cache) when no questions came back
+    return questions if any(questions.values()) else None
+
+
+async def _result(job: Job, response: Any) -> Any:
+    """
+    The job's own result. An exam generated by this job's webhook call keeps
+    the exam the flow saved, if it saved one; otherwise the questions are
+    saved as a new exam for this requester.
+    """
+    if job.kind != "exam":
+        return job.content if response is None else response
+    if response is not None and (job.content is None or (isinstance(response, dict) and response.get("exam_id"))):
+        return response
+    if job.content is None:
+        raise JobFailed("Generator returned no questions")
+    exam_id = await save_exam(
+        job.payload.get("topic") or "",
+        job.payload.get("syllabus") or job.payload.get("syllabus_url"),
+        job.content,
+        teacher_id=job.payload.get("teacher_id") or 1,
+        class_id=job.payload.get("class_id") or 1,
+    )
+    return {"exam_id": exam_id, **job.content}
+
+
+job_queue = JobQueue()
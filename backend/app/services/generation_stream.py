@@ -0,0 +1,332 @@
+"""
+Server-Sent Events delivery of generated lesson plans and exam previews.
+
+The webhook output is consumed as it arrives (app.core.http.stream_json):
+lesson-plan markdown is cut into sections at headings and each section is
+sent as soon as the next one starts; exam questions are sent one by one.
+Flows that answer in one piece still get their content streamed out
+section by section / question by question, and cached generations are
+replayed the same way without calling the webhook. A stream identical to
+one already in flight joins it: the webhook output is read once and every
+joined stream replays it as it arrives. Once the artifact is
+complete it is saved as a LessonPlan, or an Exam plus its Question row,
+and a final `done` event carries the new id. Only the content is cached,
+under the same key the job queue uses, so every requester gets an exam of
+their own.
+
+Events: started, section | question, done, error.
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.http import UPSTREAMS, UpstreamError, stream_json
+from app.core.sse import sse_event
+from app.db.session import AsyncSessionLocal
+from app.models.models import Exam, LessonPlan, Question
+from app.schemas.exams import ExamGenerateRequest
+from app.schemas.lessonplan import LessonPlanGenerateRequest
+from app.services.generation_cache import canonical_request, generation_cache, request_key
+from app.services.grading import QUESTION_TYPES
+
+logger = logging.getLogger(__name__)
+
+_HEADING_RE = re.compile(r"^#{1,3}\s+(.*)$")
+
+
+class SectionSplitter:
+    """Cuts streamed markdown into {title, content} sections at #, ## and ### headings."""
+
+    def __init__(self):
+        self.text = ""
+        self.sections: List[Dict[str, str]] = []
+        self._partial = ""
+        self._title: Optional[str] = None
+        self._lines: List[str] = []
+
+    def feed(self, text: str) -> List[Dict[str, str]]:
+        """Adds text and returns the sections it completed."""
+        self.text += text
+        *lines, self._partial = (self._partial + text).split("\n")
+        completed = []
+        for line in lines:
+            heading = _HEADING_RE.match(line.strip())
+            if heading:
+                completed.extend(self._cut())
+                self._title = heading.group(1).strip()
+            else:
+                self._lines.append(line)
+        return completed
+
+    def close(self) -> List[Dict[str, str]]:
+        if self._partial:
+            self.feed("\n")
+        return self._cut()
+
+    def _cut(self) -> List[Dict[str, str]]:
+        content = "\n".join(self._lines).strip()
+        title, self._title, self._lines = self._title, None, []
+        if title is None and not content:
+            return []
+        section = {"title": title or "", "content": content}
+        self.sections.append(section)
+        return [section]
+
+
+def _lesson_text(chunk: Any) -> str:
+    """Markdown carried by one webhook chunk (streamed item or whole response)."""
+    if chunk is None:
+        return ""
+    if isinstance(chunk, str):
+        return chunk
+    if isinstance(chunk, list):
+        return "".join(_lesson_text(item) for item in chunk)
+    if isinstance(chunk, dict):
+        if chunk.get("type") == "item":
+            return _lesson_text(chunk.get("content"))
+        if "output" in chunk:
+            return _lesson_text(chunk["output"])
+        if isinstance(chunk.get("plan"), dict):
+            return "".join(f"## {title}\n{_lesson_text(body)}\n" for title, body in chunk["plan"].items())
+        if "content" in chunk:
+            return _lesson_text(chunk["content"])
+        return ""
+    return str(chunk)
+
+
+def _question_type(question: Dict[str, Any], default: Optional[str] = None) -> Optional[str]:
+    qtype = str(question.get("type") or "").strip().lower()
+    return qtype if qtype in QUESTION_TYPES else default
+
+
+def _exam_questions(chunk: Any) -> List[Tuple[str, Dict[str, Any]]]:
+    """(type, question) pairs carried by one webhook chunk."""
+    if isinstance(chunk, list):
+        return [pair for item in chunk for pair in _exam_questions(item)]
+    if isinstance(chunk, str):
+        try:
+            return _exam_questions(json.loads(chunk))
+        except ValueError:
+            return []
+    if not isinstance(chunk, dict):
+        return []
+    if chunk.get("type") == "item":
+        return _exam_questions(chunk.get("content"))
+    if "output" in chunk:
+        return _exam_questions(chunk["output"])
+
+    pairs = []
+    for qtype in QUESTION_TYPES:
+        items = chunk.get(qtype) or []
+        for question in [items] if isinstance(items, dict) else items:
+            if isinstance(question, dict):
+                pairs.append((qtype, question))
+    for question in chunk.get("questions") or []:
+        qtype = isinstance(question, dict) and _question_type(question)
+        if qtype:
+            pairs.append((qtype, question))
+    if not pairs and _question_type(chunk):
+        pairs.append((_question_type(chunk), chunk))
+    return pairs
+
+
+def exam_questions(response: Any) -> Dict[str, List[Dict[str, Any]]]:
+    """Question lists by type from a whole webhook response (or cached content)."""
+    questions: Dict[str, List[Dict[str, Any]]] = {qtype: [] for qtype in QUESTION_TYPES}
+    for qtype, question in _exam_questions(response):
+        questions[qtype].append(question)
+    return questions
+
+
+async def save_exam(title: str, description: Optional[str], questions: Dict[str, List[Dict[str, Any]]],
+                    teacher_id: int = 1, class_id: int = 1) -> int:
+    """Saves generated questions as a new Exam with its Question row and returns the exam id."""
+    async with AsyncSessionLocal() as db:
+        exam = Exam(
+            teacher_id=teacher_id,
+            class_id=class_id,
+            title=title,
+            description=description,
+            status="scheduled"
+        )
+        db.add(exam)
+        await db.flush()
+        db.add(Question(exam_id=exam.id, **questions))
+        await db.commit()
+        return exam.id
+
+
+CACHED, JOINED, UPSTREAM = "cached", "joined", "upstream"
+
+
+class _Flight:
+    """
+    One webhook stream read by a background task, so a stream that goes away
+    does not cut it short for the others; follow() replays the chunks
+    received so far and then the rest as they arrive.
+    """
+
+    def __init__(self, key: str, chunks: AsyncIterator[Any]):
+        self.key = key
+        self.chunks: List[Any] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self._changed = asyncio.Condition()
+        self._task = asyncio.ensure_future(self._read(chunks))
+
+    async def _read(self, chunks: AsyncIterator[Any]) -> None:
+        try:
+            async for chunk in chunks:
+                async with self._changed:
+                    self.chunks.append(chunk)
+                    self._changed.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            if _flights.get(self.key) is self:
+                del _flights[self.key]
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        seen = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: seen < len(self.chunks) or self.done)
+                new, done = self.chunks[seen:], self.done
+            seen += len(new)
+            for chunk in new:
+                yield chunk
+            if done and seen == len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+_flights: Dict[str, _Flight] = {}   # cache key -> webhook stream in progress
+
+
+async def _replay(response: Any) -> AsyncIterator[Any]:
+    yield response
+
+
+async def _source(kind: str, payload: Dict[str, Any],
+                  regenerate: bool) -> Tuple[Optional[str], Optional[Dict[str, Any]], str, AsyncIterator[Any]]:
+    """(cache key, canonical request, where the chunks come from, chunks)"""
+    request = canonical_request(kind, payload)
+    if request is None:
+        return None, None, UPSTREAM, stream_json(UPSTREAMS[kind], payload)
+    # Shared with the job queue: both cache the content (exam question lists, lesson-plan output)
+    key = request_key(kind, request)
+    if regenerate:
+        generation_cache.bypassed += 1
+    else:
+        if key not in _flights:
+            cached = await generation_cache.get(key)
+            if cached is not None:
+                return key, request, CACHED, _replay(cached)
+        # Looked up again: another stream may have started while the cache was read
+        if key in _flights:
+            generation_cache.joined += 1
+            return key, request, JOINED, _flights[key].follow()
+    flight = _flights[key] = _Flight(key, stream_json(UPSTREAMS[kind], payload))
+    return key, request, UPSTREAM, flight.follow()
+
+
+async def stream_lesson_plan(request: LessonPlanGenerateRequest, regenerate: bool = False) -> AsyncIterator[bytes]:
+    payload = {
+        "topic": request.topic,
+        "grade": request.grade,
+        "hours": request.duration_hours,
+        "specific_focus": request.specific_focus or "",
+    }
+    yield sse_event("started", {"topic": request.topic})
+
+    key, canonical, origin, chunks = await _source("lessonplan", payload, regenerate)
+    splitter = SectionSplitter()
+    try:
+        async for chunk in chunks:
+            for section in splitter.feed(_lesson_text(chunk)):
+                yield sse_event("section", section)
+    except UpstreamError as e:
+        yield sse_event("error", {"detail": str(e)})
+        return
+    for section in splitter.close():
+        yield sse_event("section", section)
+
+    if not splitter.sections:
+        yield sse_event("error", {"detail": "Generator returned an empty lesson plan"})
+        return
+
+    try:
+        async with AsyncSessionLocal() as db:
+            plan = LessonPlan(
+                teacher_id=request.teacher_id,
+                topic=request.topic,
+                duration_hours=request.duration_hours,
+                plan={"output": splitter.text, "sections": splitter.sections},
+            )
+            db.add(plan)
+            await db.commit()
+            lessonplan_id = plan.id
+    except (SQLAlchemyError, OSError):
+        logger.exception("Saving streamed lesson plan failed")
+        yield sse_event("error", {"detail": "Lesson plan was generated but could not be saved"})
+        return
+    if origin == UPSTREAM and key is not None:
+        await generation_cache.put("lessonplan", key, canonical, {"output": splitter.text})
+
+    yield sse_event("done", {"lessonplan_id": lessonplan_id, "sections": len(splitter.sections), "cached": origin == CACHED})
+
+
+async def stream_exam_preview(request: ExamGenerateRequest, regenerate: bool = False) -> AsyncIterator[bytes]:
+    # Same payload the exam page posts to the webhook
+    payload = {
+        "topic": request.topic,
+        "teacher_id": 1,  # TODO: replace with auth user
+        "class_id": 1,    # TODO: replace with actual class
+        "difficulty": request.difficulty,
+        "counts": request.counts,
+        "syllabus_url": request.syllabus,
+    }
+    yield sse_event("started", {"topic": request.topic})
+
+    key, canonical, origin, chunks = await _source("exam", payload, regenerate)
+    questions: Dict[str, List[Dict[str, Any]]] = {qtype: [] for qtype in QUESTION_TYPES}
+    upstream_exam_id = None
+    index = 0
+    try:
+        async for chunk in chunks:
+            if isinstance(chunk, dict) and chunk.get("exam_id") and origin == UPSTREAM:
+                # The flow saved the exam itself (for this stream, not one joined to it)
+                upstream_exam_id = chunk["exam_id"]
+            for qtype, question in _exam_questions(chunk):
+                questions[qtype].append(question)
+                yield sse_event("question", {"index": index, "type": qtype, "question": question})
+                index += 1
+    except UpstreamError as e:
+        yield sse_event("error", {"detail": str(e)})
+        return
+
+    if not index:
+        yield sse_event("error", {"detail": "Generator returned no questions"})
+        return
+
+    exam_id = upstream_exam_id
+    if exam_id is None:
+        try:
+            # TODO: teacher_id/class_id from the auth user and the actual class
+            exam_id = await save_exam(request.topic, request.syllabus, questions)
+        except (SQLAlchemyError, OSError):
+            logger.exception("Saving streamed exam failed")
+            yield sse_event("error", {"detail": "Exam was generated but could not be saved"})
+            return
+    if origin == UPSTREAM and key is not None:
+        await generation_cache.put("exam", key, canonical, questions)
+
+    yield sse_event("done", {"exam_id": exam_id, "questions": index, "cached": origin == CACHED})
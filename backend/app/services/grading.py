@@ -0,0 +1,344 @@
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, column, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.models import Marks, QuestionItem, StudentResponse
+
+QUESTION_TYPES = ("mcq", "one_mark", "three_mark")
+TYPE_ORDER = {qtype: i for i, qtype in enumerate(QUESTION_TYPES)}
+# (minimum similarity, fraction of marks) for partial-credit graders;
+# GRADER_THRESHOLDS / GRADER_<TYPE>_THRESHOLDS override it as "0.9:1,0.6:0.5,..."
+DEFAULT_THRESHOLDS = ((0.9, 1.0), (0.6, 0.5), (0.3, 0.25))
+# Filler words that should not cost a short answer its credit
+STOPWORDS = frozenset(os.getenv(
+    "GRADER_STOPWORDS", "a,an,the,is,are,was,were,of,to,in,on,and,it,its"
+).split(","))
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def normalize_answer(text: Optional[str]) -> str:
+    return (text or "").strip().lower()
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall(normalize_answer(text))
+
+
+def content_tokens(text: Optional[str]) -> List[str]:
+    return [token for token in tokenize(text) if token not in STOPWORDS]
+
+
+def parse_thresholds(spec: Optional[str], default: Sequence[Tuple[float, float]] = DEFAULT_THRESHOLDS) -> List[Tuple[float, float]]:
+    """Parses "similarity:fraction,..." (e.g. "0.9:1,0.5:0.5"); empty means `default`."""
+    if not spec:
+        return list(default)
+    thresholds = []
+    for part in spec.split(","):
+        minimum, _, credit = part.partition(":")
+        try:
+            thresholds.append((float(minimum), float(credit)))
+        except ValueError:
+            raise ValueError(f"Invalid grader threshold {part!r}, expected similarity:fraction") from None
+    return thresholds
+
+
+def answer_key_entry(item: Any) -> Dict[str, Any]:
+    """Grading key for one QuestionItem row."""
+    return {
+        "question_id": item.question_id,
+        "type": item.type,
+        "position": item.position,
+        "question": item.text,
+        "answer": item.answer,
+        "marks": item.marks,
+        "options": list(item.options or []),
+    }
+
+
+def _answer_key_query(exam_id: int, item_ids: Optional[Iterable[int]] = None):
+    query = (
+        select(QuestionItem.id, QuestionItem.question_id, QuestionItem.type, QuestionItem.position,
+               QuestionItem.text, QuestionItem.answer, QuestionItem.marks, QuestionItem.options)
+        .where(QuestionItem.exam_id == exam_id)
+    )
+    if item_ids is not None:
+        query = query.where(QuestionItem.id.in_(set(item_ids)))
+    return query
+
+
+def _build_answer_key(items) -> Dict[int, Dict[str, Any]]:
+    return {
+        item.id: answer_key_entry(item)
+        for item in sorted(items, key=lambda i: (i.question_id, TYPE_ORDER.get(i.type, len(TYPE_ORDER)), i.position))
+    }
+
+
+def load_answer_key(db: Session, exam_id: int, item_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """Loads the answer key for an exam in a single query over question_items, indexed by item id."""
+    return _build_answer_key(db.execute(_answer_key_query(exam_id, item_ids)).all())
+
+
+async def load_answer_key_async(db: AsyncSession, exam_id: int, item_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    return _build_answer_key((await db.execute(_answer_key_query(exam_id, item_ids))).all())
+
+
+def first_items(items: Dict[int, Dict[str, Any]]) -> Dict[int, int]:
+    """
+    question_id -> id of its first item (position 0 of its first non-empty
+    list), the item an answer that only names a question refers to.
+    `items` must be in answer-key order.
+    """
+    first: Dict[int, int] = {}
+    for item_id, item in items.items():
+        first.setdefault(item["question_id"], item_id)
+    return first
+
+
+def resolve_item(items: Dict[int, Dict[str, Any]], first: Dict[int, int],
+                 item_id: Optional[int], question_id: Optional[int]) -> Optional[int]:
+    """The exam item an answer refers to, or None if it is not part of the exam."""
+    if item_id is None:
+        return first.get(question_id)
+    item = items.get(item_id)
+    if item is None or question_id not in (None, item["question_id"]):
+        return None
+    return item_id
+
+
+class Grader:
+    """Grades every response to one question as a batch."""
+
+    def grade_batch(self, responses: List[str], key: Dict[str, Any]) -> List[int]:
+        raise NotImplementedError
+
+
+class ExactGrader(Grader):
+    """Exact (case/space-insensitive) match; used for MCQs."""
+
+    def grade_batch(self, responses: List[str], key: Dict[str, Any]) -> List[int]:
+        if key["answer"] is None:
+            return [0] * len(responses)
+        expected = normalize_answer(key["answer"])
+        return [key["marks"] if normalize_answer(r) == expected else 0 for r in responses]
+
+
+class TokenSetGrader(Grader):
+    """
+    Partial credit from token-set (Jaccard) overlap with the key.
+
+    All responses are tokenized into one flat id array so the overlap of the
+    whole batch is computed with a handful of NumPy ops. Stopwords are
+    ignored on both sides. `thresholds` maps a minimum similarity to the
+    fraction of marks awarded, best first; the awarded marks are rounded
+    half up, since marks are stored as integers.
+    """
+
+    def __init__(self, thresholds: Sequence[Tuple[float, float]] = DEFAULT_THRESHOLDS):
+        self.thresholds = sorted(thresholds, reverse=True)
+
+    def similarity(self, responses: List[str], key_text: str) -> np.ndarray:
+        key_tokens = set(content_tokens(key_text))
+        vocab = {token: i for i, token in enumerate(key_tokens)}
+
+        token_ids: List[int] = []
+        lengths = np.empty(len(responses), dtype=np.int64)
+        for i, response in enumerate(responses):
+            tokens = set(content_tokens(response))
+            lengths[i] = len(tokens)
+            token_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+
+        rows = np.repeat(np.arange(len(responses)), lengths)
+        in_key = np.asarray(token_ids, dtype=np.int64) < len(key_tokens)
+        overlap = np.bincount(rows, weights=in_key, minlength=len(responses))
+        union = lengths + len(key_tokens) - overlap
+        return np.divide(overlap, union, out=np.zeros(len(responses)), where=union > 0)
+
+    def grade_batch(self, responses: List[str], key: Dict[str, Any]) -> List[int]:
+        if key["answer"] is None or not responses:
+            return [0] * len(responses)
+        scores = self.similarity(responses, key["answer"])
+        fraction = np.select(
+            [scores >= minimum for minimum, _ in self.thresholds],
+            [credit for _, credit in self.thresholds],
+            default=0.0,
+        )
+        return np.floor(fraction * key["marks"] + 0.5).astype(int).tolist()
+
+
+def _thresholds(question_type: str) -> List[Tuple[float, float]]:
+    return parse_thresholds(
+        os.getenv(f"GRADER_{question_type.upper()}_THRESHOLDS") or os.getenv("GRADER_THRESHOLDS")
+    )
+
+
+GRADERS: Dict[Optional[str], Grader] = {
+    "mcq": ExactGrader(),
+    "one_mark": TokenSetGrader(_thresholds("one_mark")),
+    "three_mark": TokenSetGrader(_thresholds("three_mark")),
+}
+
+
+def get_grader(question_type: Optional[str]) -> Grader:
+    return GRADERS.get(question_type, GRADERS["mcq"])
+
+
+def grade_many(answer_key: Dict[int, Dict[str, Any]], answers: List[Tuple[int, str]]) -> List[int]:
+    """Grades (item_id, response) pairs, batching all responses to the same item."""
+    by_item: Dict[int, List[int]] = {}
+    for i, (item_id, _) in enumerate(answers):
+        by_item.setdefault(item_id, []).append(i)
+
+    scores = [0] * len(answers)
+    for item_id, positions in by_item.items():
+        key = answer_key[item_id]
+        batch = get_grader(key["type"]).grade_batch([answers[i][1] for i in positions], key)
+        for i, score in zip(positions, batch):
+            scores[i] = score
+    return scores
+
+
+def _result_entry(index: int, key: Dict[str, Any], response: str, score: int) -> Dict[str, Any]:
+    is_correct = score > 0
+    return {
+        "index": index,
+        "score": score,
+        "feedback": "Correct" if is_correct else "Incorrect",
+        "question": key["question"],
+        "max_marks": key["marks"],
+        "is_correct": is_correct,
+        "correct_answer": key["answer"] or "",
+        "student_answer": response,
+    }
+
+
+def _apply_response_marks(db: Session, graded: List[tuple]) -> None:
+    """Set-based UPDATE ... FROM (VALUES ...) of marks_obtained for a chunk."""
+    if not graded:
+        return
+    graded_values = values(
+        column("id", Integer), column("marks", Integer), name="graded"
+    ).data(graded)
+    db.execute(
+        update(StudentResponse)
+        .where(StudentResponse.id == graded_values.c.id)
+        .values(marks_obtained=graded_values.c.marks)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _upsert_marks(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """Multi-row INSERT ... ON CONFLICT (student_id, exam_id) DO UPDATE for a chunk."""
+    if not rows:
+        return
+    stmt = pg_insert(Marks).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Marks.exam_id, Marks.student_id],
+            set_={
+                "total_marks": stmt.excluded.total_marks,
+                "max_marks": stmt.excluded.max_marks,
+                "results": stmt.excluded.results,
+            },
+        )
+    )
+
+
+def grade_exam_responses(
+    db: Session,
+    exam_id: int,
+    student_id: Optional[int] = None,
+    chunk_size: int = 500,
+) -> Dict[str, Any]:
+    """
+    Grades every StudentResponse of an exam (or of one student) in a single pass.
+
+    The answer key (every question item of the exam) is loaded once,
+    responses are streamed with a server-side cursor ordered by student and
+    joined to their items by item_id, and each chunk is written back with
+    one bulk UPDATE plus one Marks upsert. Commits once at the end.
+    """
+    answer_key = load_answer_key(db, exam_id)
+    max_marks = sum(key["marks"] for key in answer_key.values())
+
+    query = (
+        select(
+            StudentResponse.id,
+            StudentResponse.student_id,
+            StudentResponse.question_id,
+            StudentResponse.item_id,
+            StudentResponse.response,
+        )
+        .where(StudentResponse.exam_id == exam_id)
+        .order_by(StudentResponse.student_id, StudentResponse.id)
+    )
+    if student_id is not None:
+        query = query.where(StudentResponse.student_id == student_id)
+
+    stream = db.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+
+    current_student = None
+    current: Dict[str, Any] = {}
+    finished: List[Dict[str, Any]] = []
+    details: List[Dict[str, Any]] = []
+    students_graded = 0
+    responses_graded = 0
+
+    def finish():
+        finished.append({
+            "student_id": current_student,
+            "exam_id": exam_id,
+            "total_marks": current["total"],
+            "max_marks": max_marks,
+            "results": current["results"],
+        })
+
+    for chunk in stream.partitions(chunk_size):
+        chunk = [row for row in chunk if row.item_id in answer_key]
+        scores = grade_many(answer_key, [(row.item_id, row.response) for row in chunk])
+        graded = []
+        for (resp_id, sid, question_id, item_id, response), score in zip(chunk, scores):
+            key = answer_key[item_id]
+            if sid != current_student:
+                if current_student is not None:
+                    finish()
+                current_student = sid
+                current = {"total": 0, "results": []}
+                students_graded += 1
+
+            graded.append((resp_id, score))
+            current["total"] += score
+            current["results"].append(_result_entry(len(current["results"]), key, response, score))
+            if student_id is not None:
+                details.append({
+                    "question_id": question_id,
+                    "item_id": item_id,
+                    "response": response,
+                    "marks_obtained": score
+                })
+
+        _apply_response_marks(db, graded)
+        _upsert_marks(db, finished)
+        responses_graded += len(graded)
+        finished.clear()
+
+    if current_student is not None:
+        finish()
+        _upsert_marks(db, finished)
+
+    db.commit()
+
+    return {
+        "exam_id": exam_id,
+        "students_graded": students_graded,
+        "responses_graded": responses_graded,
+        "max_marks": max_marks,
+        "total_marks": sum(d["marks_obtained"] for d in details),
+        "details": details,
+    }
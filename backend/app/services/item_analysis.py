@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.models.models import StudentResponse
+from app.services.grading import load_answer_key, normalize_answer
+
+CACHE_SIZE = 128
+# Bounds how long another worker's writes go unseen; this worker's own
+# writes invalidate straight away
+CACHE_TTL = float(os.getenv("ITEM_ANALYSIS_TTL", "300"))
+OPTION_LABELS = "abcdefghijklmnopqrstuvwxyz"
+
+# exam_id -> (expires at, analysis); routes run in the threadpool, hence the lock
+_lock = threading.Lock()
+_cache: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+# bumped by invalidate so an analysis that raced with a write is not stored
+_generation: Dict[int, int] = {}
+
+
+def invalidate(exam_id: int) -> None:
+    """Drops the exam's analysis; called after its responses, marks or answer key are written."""
+    with _lock:
+        _generation[exam_id] = _generation.get(exam_id, 0) + 1
+        _cache.pop(exam_id, None)
+
+
+def _option_index(options: List[str]) -> Dict[str, int]:
+    """
+    Maps both the full option text and its positional label ("a" for the
+    first option, "b" for the second, ...) to its position. Option texts
+    win when a text is itself a single letter.
+    """
+    index = {normalize_answer(str(opt)): i for i, opt in enumerate(options)}
+    for i, label in zip(range(len(options)), OPTION_LABELS):
+        index.setdefault(label, i)
+    return index
+
+
+def analyze_items(db: Session, exam_id: int) -> Dict[str, Any]:
+    """
+    Difficulty index, point-biserial discrimination and MCQ option counts for
+    every question item, from one query over the exam's responses and NumPy
+    ops on the student x item score matrix. Cached until invalidate(exam_id)
+    or CACHE_TTL.
+    """
+    with _lock:
+        cached = _cache.get(exam_id)
+        if cached and cached[0] > time.monotonic():
+            _cache.move_to_end(exam_id)
+            return cached[1]
+        generation = _generation.get(exam_id, 0)
+
+    answer_key = load_answer_key(db, exam_id)
+    rows = (
+        db.query(
+            StudentResponse.student_id,
+            StudentResponse.item_id,
+            StudentResponse.response,
+            StudentResponse.marks_obtained,
+        )
+        .filter(StudentResponse.exam_id == exam_id)
+        .all()
+    )
+    analysis = {"exam_id": exam_id, **_analyze(answer_key, rows)}
+
+    with _lock:
+        if _generation.get(exam_id, 0) == generation:
+            _cache[exam_id] = (time.monotonic() + CACHE_TTL, analysis)
+            _cache.move_to_end(exam_id)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return analysis
+
+
+def _analyze(answer_key: Dict[int, Dict[str, Any]], rows) -> Dict[str, Any]:
+    """Per-item statistics from (student_id, item_id, response, marks_obtained) rows."""
+    item_ids = list(answer_key)   # answer-key order: question, type, position
+    q_pos = {item_id: i for i, item_id in enumerate(item_ids)}
+    rows = [r for r in rows if r.item_id in q_pos]
+    student_ids = sorted({r.student_id for r in rows})
+    s_pos = {sid: i for i, sid in enumerate(student_ids)}
+
+    q_idx = np.fromiter((q_pos[r.item_id] for r in rows), dtype=np.int64, count=len(rows))
+    s_idx = np.fromiter((s_pos[r.student_id] for r in rows), dtype=np.int64, count=len(rows))
+    marks = np.fromiter((r.marks_obtained or 0 for r in rows), dtype=float, count=len(rows))
+    max_marks = np.array([answer_key[item_id]["marks"] for item_id in item_ids], dtype=float)
+
+    # Proportion of marks earned, student x item; unanswered stays 0
+    scores = np.zeros((len(student_ids), len(item_ids)))
+    answered = np.zeros_like(scores, dtype=bool)
+    scores[s_idx, q_idx] = np.divide(marks, max_marks[q_idx], out=np.zeros_like(marks), where=max_marks[q_idx] > 0)
+    answered[s_idx, q_idx] = True
+
+    difficulty = scores.mean(axis=0) if student_ids else np.zeros(len(item_ids))
+
+    # Point-biserial: correlation of each item column with the total score
+    totals = (scores * max_marks).sum(axis=1)
+    items_c = scores - scores.mean(axis=0)
+    totals_c = totals - totals.mean() if student_ids else totals
+    denom = np.sqrt((items_c ** 2).sum(axis=0) * (totals_c ** 2).sum())
+    discrimination = np.divide(items_c.T @ totals_c, denom, out=np.zeros(len(item_ids)), where=denom > 0)
+
+    # MCQ option selection counts via one bincount over (question, option) cells
+    option_maps = {item_id: _option_index(answer_key[item_id]["options"]) for item_id in item_ids
+                   if answer_key[item_id]["type"] == "mcq"}
+    max_options = max((len(answer_key[item_id]["options"]) for item_id in option_maps), default=0)
+    option_counts = np.zeros((len(item_ids), max_options + 1), dtype=np.int64)
+    if option_maps:
+        opt_idx = np.fromiter(
+            (option_maps[r.item_id].get(normalize_answer(r.response), max_options)
+             if r.item_id in option_maps else max_options for r in rows),
+            dtype=np.int64, count=len(rows),
+        )
+        option_counts = np.bincount(
+            q_idx * (max_options + 1) + opt_idx, minlength=len(item_ids) * (max_options + 1)
+        ).reshape(len(item_ids), max_options + 1)
+
+    items = []
+    for i, item_id in enumerate(item_ids):
+        key = answer_key[item_id]
+        items.append({
+            "item_id": item_id,
+            "question_id": key["question_id"],
+            "type": key["type"],
+            "position": key["position"],
+            "max_marks": key["marks"],
+            "responses": int(answered[:, i].sum()),
+            "difficulty": round(float(difficulty[i]), 4),
+            "discrimination": round(float(discrimination[i]), 4),
+            "option_counts": (
+                {str(opt): int(option_counts[i, j]) for j, opt in enumerate(key["options"])}
+                if item_id in option_maps else None
+            ),
+        })
+
+    return {"students": len(student_ids), "items": items}
@@ -0,0 +1,104 @@
+"""
+Content-addressed cache for rendered exam PDFs.
+
+Entries are keyed by a SHA-256 of the exam title plus the normalized
+mcq/one_mark/three_mark payloads, held in a bounded in-memory LRU and backed
+by files on disk that every worker shares. Callers recompute the digest from
+the exam's question_items on each request (one narrow query), so a question
+written by n8n or by another worker changes the digest, and with it the
+ETag, straight away. Stale blobs stop being asked for, and put() prunes
+the disk tier back to PDF_CACHE_DISK_MAX_FILES files and
+PDF_CACHE_DISK_MAX_MB megabytes, dropping the least recently used files
+first (a disk hit refreshes a file's mtime).
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+MEMORY_ENTRIES = int(os.getenv("PDF_CACHE_MEMORY_ENTRIES", "64"))
+DISK_MAX_FILES = int(os.getenv("PDF_CACHE_DISK_MAX_FILES", "2000"))
+DISK_MAX_BYTES = int(os.getenv("PDF_CACHE_DISK_MAX_MB", "256")) * 1024 * 1024
+CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "teach-assist-pdf-cache"))
+
+_lock = threading.Lock()
+_memory: "OrderedDict[str, bytes]" = OrderedDict()
+
+
+def content_digest(payload: Dict[str, Any]) -> str:
+    canonical = json.dumps(
+        {key: payload[key] for key in ("title", "mcq", "one_mark", "three_mark")},
+        sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, f"{digest}.pdf")
+
+
+def get(digest: str) -> Optional[bytes]:
+    with _lock:
+        pdf = _memory.get(digest)
+        if pdf is not None:
+            _memory.move_to_end(digest)
+            return pdf
+    try:
+        with open(_path(digest), "rb") as f:
+            pdf = f.read()
+        os.utime(_path(digest))   # recently used, pruned last
+    except OSError:
+        return None
+    _remember_in_memory(digest, pdf)
+    return pdf
+
+
+def put(digest: str, pdf: bytes) -> None:
+    _remember_in_memory(digest, pdf)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # write-then-rename so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp_path, _path(digest))
+        _prune_disk()
+    except OSError:
+        pass  # disk is only a second tier; memory still serves this process
+
+
+def _prune_disk(max_files: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+    """Deletes the least recently used PDFs until the disk tier fits both limits."""
+    max_files = DISK_MAX_FILES if max_files is None else max_files
+    max_bytes = DISK_MAX_BYTES if max_bytes is None else max_bytes
+    files = []
+    with os.scandir(CACHE_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue   # removed by another worker meanwhile
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if len(files) <= max_files and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        files = files[1:]
+        total -= size
+
+
+def _remember_in_memory(digest: str, pdf: bytes) -> None:
+    with _lock:
+        _memory[digest] = pdf
+        _memory.move_to_end(digest)
+        while len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
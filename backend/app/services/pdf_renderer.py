@@ -0,0 +1,67 @@
+"""
+Process-pool PDF renderer.
+
+ReportLab layout is CPU-bound, so it runs in separate processes instead of
+the API's threadpool. Jobs take plain payloads from exam_pdf_payload (never
+ORM objects). At most PDF_RENDER_WORKERS render at once and at most
+PDF_RENDER_QUEUE_LIMIT are admitted (running + waiting); beyond that
+interactive callers get RendererBusy so the route can shed load instead of
+piling up, while bulk callers wait for a slot. Workers run at a lower CPU
+priority (PDF_RENDER_NICE) so that on a host with few cores the API process
+still gets the CPU first.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from app.services.exam_pdf import render_exam_pdf
+
+WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+QUEUE_LIMIT = int(os.getenv("PDF_RENDER_QUEUE_LIMIT", "16"))
+NICE = int(os.getenv("PDF_RENDER_NICE", "10"))
+
+
+class RendererBusy(Exception):
+    pass
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_admission = asyncio.Semaphore(QUEUE_LIMIT)
+
+
+def _lower_priority(increment: int) -> None:
+    if hasattr(os, "nice"):
+        os.nice(increment)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_lower_priority,
+            initargs=(NICE,),
+        )
+    return _executor
+
+
+async def render(payload: Dict[str, Any], wait: bool = False) -> bytes:
+    """
+    Renders an exam PDF in the process pool. When the queue is full this
+    raises RendererBusy, or waits for a slot if wait=True (bulk exports).
+    """
+    if not wait and _admission.locked():
+        raise RendererBusy()
+    async with _admission:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), render_exam_pdf, payload)
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
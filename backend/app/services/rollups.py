@@ -0,0 +1,167 @@
+"""
+Incrementally maintained exam/class/student rollups of percentage scores.
+
+A trigger on `marks` applies the delta of every INSERT/UPDATE/DELETE to the
+rollup rows, so grade_exam and any external writer (e.g. the n8n grading
+flow) keep them current. `rebuild_rollups` recomputes everything for backfill.
+Scores outside 0-100 count in the first or last histogram bucket.
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.db.base import Base
+
+HISTOGRAM_BINS = 10
+
+# table, key column, SQL returning (min, max) score for the key $1 from marks
+ROLLUP_LEVELS = (
+    ("exam_rollups", "exam_id",
+     "SELECT min({score}), max({score}) FROM marks m WHERE m.exam_id = $1"),
+    ("class_rollups", "class_id",
+     "SELECT min({score}), max({score}) FROM marks m JOIN exams e ON e.id = m.exam_id WHERE e.class_id = $1"),
+    ("student_rollups", "student_id",
+     "SELECT min({score}), max({score}) FROM marks m WHERE m.student_id = $1"),
+)
+
+SCORE_SQL = "COALESCE(m.total_marks * 100.0 / NULLIF(m.max_marks, 0), 0)"
+BUCKET_SQL = "LEAST(GREATEST(FLOOR({score} / 10)::integer, 0), 9) + 1"
+
+APPLY_FUNCTION = """
+CREATE OR REPLACE FUNCTION marks_rollup_apply(
+    p_table text, p_key_col text, p_key integer, p_score double precision, p_sign integer, p_minmax_sql text
+) RETURNS void AS $$
+DECLARE
+    v_bucket integer := """ + BUCKET_SQL.format(score="p_score") + """;
+    v_min double precision;
+    v_max double precision;
+    v_removed_extreme boolean;
+BEGIN
+    IF p_key IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF p_sign > 0 THEN
+        EXECUTE format(
+            'INSERT INTO %1$I AS r (%2$I, count, total, total_sq, min_score, max_score, histogram)
+             VALUES ($1, 0, 0, 0, $2, $2, array_fill(0, ARRAY[10]))
+             ON CONFLICT (%2$I) DO NOTHING', p_table, p_key_col)
+        USING p_key, p_score;
+        EXECUTE format(
+            'UPDATE %1$I SET count = count + 1, total = total + $2, total_sq = total_sq + $2 * $2,
+                 min_score = LEAST(min_score, $2), max_score = GREATEST(max_score, $2),
+                 histogram[$3] = histogram[$3] + 1
+             WHERE %2$I = $1', p_table, p_key_col)
+        USING p_key, p_score, v_bucket;
+    ELSE
+        EXECUTE format(
+            'UPDATE %1$I SET count = count - 1, total = total - $2, total_sq = total_sq - $2 * $2,
+                 histogram[$3] = histogram[$3] - 1
+             WHERE %2$I = $1
+             RETURNING $2 <= min_score OR $2 >= max_score', p_table, p_key_col)
+        INTO v_removed_extreme
+        USING p_key, p_score, v_bucket;
+        -- min/max are not invertible: rescan only when the removed score was an extreme
+        IF v_removed_extreme THEN
+            EXECUTE p_minmax_sql INTO v_min, v_max USING p_key;
+            EXECUTE format('UPDATE %1$I SET min_score = $2, max_score = $3 WHERE %2$I = $1', p_table, p_key_col)
+            USING p_key, v_min, v_max;
+        END IF;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def _trigger_function() -> str:
+    def apply_all(row: str, sign: int) -> str:
+        score = f"COALESCE({row}.total_marks * 100.0 / NULLIF({row}.max_marks, 0), 0)"
+        keys = (f"{row}.exam_id", f"(SELECT class_id FROM exams WHERE id = {row}.exam_id)", f"{row}.student_id")
+        return "\n".join(
+            f"        PERFORM marks_rollup_apply('{table}', '{key_col}', {key}, {score}, {sign}, "
+            f"'{minmax.format(score=SCORE_SQL)}');"
+            for (table, key_col, minmax), key in zip(ROLLUP_LEVELS, keys)
+        )
+
+    return f"""
+CREATE OR REPLACE FUNCTION marks_rollup_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+{apply_all("OLD", -1)}
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+{apply_all("NEW", 1)}
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+INSTALL_TRIGGER = """
+CREATE OR REPLACE TRIGGER marks_rollup
+AFTER INSERT OR UPDATE OF total_marks, max_marks, exam_id, student_id OR DELETE ON marks
+FOR EACH ROW EXECUTE FUNCTION marks_rollup_trigger();
+"""
+
+
+def trigger_statements() -> List[str]:
+    return [APPLY_FUNCTION, _trigger_function(), INSTALL_TRIGGER]
+
+
+def install_rollup_triggers(connection) -> None:
+    for statement in trigger_statements():
+        connection.execute(text(statement))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection, **kw):
+    install_rollup_triggers(connection)
+
+
+def rebuild_statements() -> List[str]:
+    """SQL that recomputes every rollup row from `marks`."""
+    bucket = BUCKET_SQL.format(score="score")
+    histogram = ", ".join(
+        f"count(*) FILTER (WHERE {bucket} = {b})" for b in range(1, HISTOGRAM_BINS + 1)
+    )
+    scored = f"""
+        SELECT m.exam_id, m.student_id, e.class_id, {SCORE_SQL} AS score
+        FROM marks m JOIN exams e ON e.id = m.exam_id
+    """
+    statements = []
+    for table, key_col, _ in ROLLUP_LEVELS:
+        statements.append(f"DELETE FROM {table}")
+        statements.append(f"""
+            INSERT INTO {table} ({key_col}, count, total, total_sq, min_score, max_score, histogram)
+            SELECT {key_col}, count(*), sum(score), sum(score * score), min(score), max(score),
+                   ARRAY[{histogram}]
+            FROM ({scored}) AS scored
+            GROUP BY {key_col}
+        """)
+    return statements
+
+
+def rebuild_rollups(db: Session) -> None:
+    """Recomputes every rollup row from `marks` (backfill / repair)."""
+    for statement in rebuild_statements():
+        db.execute(text(statement))
+    db.commit()
+
+
+def rollup_summary(rollup: Optional[Any]) -> Dict[str, Any]:
+    """Turns a rollup row into mean/std/min/max/histogram without touching marks."""
+    if rollup is None or not rollup.count:
+        return {"count": 0, "mean": 0.0, "std_dev": 0.0, "min": 0.0, "max": 0.0, "histogram": [0] * HISTOGRAM_BINS}
+    mean = rollup.total / rollup.count
+    variance = max(rollup.total_sq / rollup.count - mean * mean, 0.0)
+    return {
+        "count": rollup.count,
+        "mean": round(mean, 2),
+        "std_dev": round(math.sqrt(variance), 2),
+        "min": round(rollup.min_score or 0.0, 2),
+        "max": round(rollup.max_score or 0.0, 2),
+        "histogram": list(rollup.histogram),
+    }
@@ -0,0 +1,91 @@
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.services.rollups import rollup_summary
+
+PASS_PERCENTAGE = 50.0
+HISTOGRAM_BINS = 10
+PERCENTILES = (25, 50, 75, 90)
+
+EMPTY_SUMMARY = {
+    "count": 0, "mean": 0.0, "median": 0.0, "std_dev": 0.0,
+    "min": 0.0, "max": 0.0, "pass_rate": 0.0,
+    "percentiles": {}, "histogram": [],
+}
+
+
+def summarize_scores(
+    total_marks: Sequence[float],
+    max_marks: Sequence[float],
+    pass_percentage: float = PASS_PERCENTAGE,
+    bins: int = HISTOGRAM_BINS,
+) -> Dict[str, Any]:
+    """
+    Summary statistics over the percentage score of each student.
+    Everything is computed on column arrays, no per-row Python work.
+    """
+    totals = np.asarray(total_marks, dtype=float)
+    maxes = np.asarray(max_marks, dtype=float)
+    scores = np.divide(totals * 100, maxes, out=np.zeros_like(totals), where=maxes > 0)
+
+    if not scores.size:
+        return dict(EMPTY_SUMMARY)
+
+    # Out-of-range scores go in the end buckets, as in the rollup histograms
+    counts, edges = np.histogram(np.clip(scores, 0, 100), bins=bins, range=(0, 100))
+    return {
+        "count": int(scores.size),
+        "mean": round(float(scores.mean()), 2),
+        "median": round(float(np.median(scores)), 2),
+        "std_dev": round(float(scores.std()), 2),
+        "min": round(float(scores.min()), 2),
+        "max": round(float(scores.max()), 2),
+        "pass_rate": round(float((scores >= pass_percentage).mean() * 100), 2),
+        "percentiles": {
+            f"p{p}": round(float(v), 2)
+            for p, v in zip(PERCENTILES, np.percentile(scores, PERCENTILES))
+        },
+        "histogram": [
+            {"lower": float(lo), "upper": float(hi), "count": int(c)}
+            for lo, hi, c in zip(edges[:-1], edges[1:], counts)
+        ],
+    }
+
+
+def summary_from_rollup(rollup: Optional[Any], pass_percentage: float = PASS_PERCENTAGE) -> Dict[str, Any]:
+    """
+    The summarize_scores shape from an exam's exam_rollups row, without
+    reading its marks. pass_rate is exact when pass_percentage is a bucket
+    edge; the median and percentiles are interpolated within the histogram
+    buckets, so they are good to about one bucket.
+    """
+    if rollup is None or not rollup.count:
+        return dict(EMPTY_SUMMARY)
+    base = rollup_summary(rollup)
+    histogram = base["histogram"]
+    width = 100 / len(histogram)
+
+    def percentile(p: float) -> float:
+        rank, seen = p / 100 * base["count"], 0
+        for i, count in enumerate(histogram):
+            if count and seen + count >= rank:
+                value = i * width + (rank - seen) / count * width
+                return round(min(max(value, base["min"]), base["max"]), 2)
+            seen += count
+        return base["max"]
+
+    return {
+        "count": base["count"],
+        "mean": base["mean"],
+        "median": percentile(50),
+        "std_dev": base["std_dev"],
+        "min": base["min"],
+        "max": base["max"],
+        "pass_rate": round(sum(c for i, c in enumerate(histogram) if i * width >= pass_percentage) * 100 / base["count"], 2),
+        "percentiles": {f"p{p}": percentile(p) for p in PERCENTILES},
+        "histogram": [
+            {"lower": i * width, "upper": (i + 1) * width, "count": count}
+            for i, count in enumerate(histogram)
+        ],
+    }
@@ -0,0 +1,65 @@
+"""
+Reusable text layout for PDF renderers.
+
+Word widths are cached per (word, font, size) and lines are measured
+incrementally (line width + space + word), so wrapping is linear in the
+number of words. plan_lines precomputes where page breaks fall for a block.
+"""
+from functools import lru_cache
+from typing import List, Tuple
+
+from reportlab.pdfbase.pdfmetrics import stringWidth # type: ignore
+
+
+@lru_cache(maxsize=65536)
+def word_width(word: str, font: str, size: float) -> float:
+    return stringWidth(word, font, size)
+
+
+def wrap_text(text: str, max_width: float, font: str, size: float) -> List[str]:
+    """
+    Greedy line breaking; a word longer than max_width gets a line of its own.
+    The first line is measured with a leading space, as the renderer always
+    measured it, so existing papers keep their line breaks.
+    """
+    space = word_width(" ", font, size)
+    lines: List[str] = []
+    line: List[str] = []
+    line_width = space
+    for word in text.split():
+        w = word_width(word, font, size)
+        if line and line_width + space + w >= max_width:
+            lines.append(" ".join(line))
+            line, line_width = [word], w
+        elif line:
+            line.append(word)
+            line_width += space + w
+        else:
+            line, line_width = [word], line_width + w
+    if line:
+        lines.append(" ".join(line))
+    return lines
+
+
+def plan_lines(
+    line_count: int,
+    y: float,
+    line_height: float,
+    break_below: float,
+    resume_y: float,
+) -> Tuple[List[Tuple[bool, float]], float]:
+    """
+    Positions for line_count lines starting at y.
+
+    Returns ([(page_break_before, y), ...], y_after). A break happens when the
+    next line would start below break_below; drawing resumes at resume_y.
+    """
+    positions = []
+    page_break = False
+    for i in range(line_count):
+        positions.append((page_break, y))
+        y -= line_height
+        page_break = i < line_count - 1 and y < break_below
+        if page_break:
+            y = resume_y
+    return positions, y
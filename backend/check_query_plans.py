@@ -0,0 +1,12 @@
+import sys
+
+from app.db.plan_check import check_query_plans
+from app.db.session import engine
+
+if __name__ == "__main__":
+    failures = check_query_plans(engine)
+    for name, tables in failures.items():
+        print(f"FAIL {name}: sequential scan on {', '.join(tables)}")
+    if failures:
+        sys.exit(1)
+    print("All hot queries use an index.")
@@ -1,11 +1,14 @@
 from app.db.session import engine
 from app.db.base import Base
+from app.db.migrations import run_migrations
 from app.models import models
+from app.services import rollups  # registers the marks rollup trigger
 
 def create_tables():
     print("Attempting to create tables...")
     Base.metadata.create_all(bind=engine)
     print("Tables created successfully.")
+    print(f"Applied migrations: {run_migrations(engine) or 'none pending'}")
 
 if __name__ == "__main__":
     create_tables()
@@ -17,7 +17,8 @@ import logging
 from sqlalchemy.exc import OperationalError
 #from app.db.base import Base
 from app.db.base import Base
-from app.db.session import engine
+from app.db.session import async_engine, engine
+from app.db.migrations import run_migrations
 #from app.api.v2 import router
 from fastapi.security import HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
@@ -28,7 +29,16 @@ from fastapi import Depends,APIRouter
 from sqlalchemy.orm import Session
 from app.models.models import LessonPlan
 from app.schemas.lessonplan import *
-from app.api.v1 import exams,announce,questions,lessons
+from app.api.v1 import exams,announce,questions,lessons,rollups,jobs
+from app.core.http import close_client
+from app.core.redis_client import close_redis
+from app.core.sessions import session_store
+from app.services import rollups as marks_rollups  # registers the marks rollup trigger on create_all
+from app.services import pdf_renderer
+from app.services.autosave import autosave_buffer
+from app.services.generation_jobs import job_queue
+from app.services.announce_dispatch import dispatcher as announce_dispatcher
+from app.services import exam_events
 
 
 
@@ -53,27 +63,55 @@ app.add_middleware(
     allow_credentials=True,       # REQUIRED for cookies/auth
     allow_methods=["*"],          # Allow all methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],          # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Readable by the browser for paged lists
 )
 app.include_router(exams.router)
 app.include_router(announce.router)
 app.include_router(questions.router)
 app.include_router(lessons.router)
+app.include_router(rollups.router)
+app.include_router(jobs.router)
 
 
 @app.on_event("startup")
 def on_startup():
     create_tables(engine)
 
+@app.on_event("startup")
+async def start_background_tasks():
+    autosave_buffer.start()
+    if not session_store.durable:
+        logger.warning("SESSION_BACKEND=memory: exam sessions are lost on restart and not shared between workers; use SESSION_BACKEND=redis in production")
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await autosave_buffer.stop()
+    await job_queue.stop()
+    await announce_dispatcher.stop()
+    await exam_events.broker.close()
+    await close_redis()
+    await close_client()
+    pdf_renderer.shutdown()
+    await async_engine.dispose()
+
 def create_tables(engine):
+    # Submit's ON CONFLICT upsert and grading depend on the migrated indexes
+    # and triggers, so a failure here stops startup instead of serving a
+    # half-working API
     try:
         logger.info("Attempting to create tables...")
         Base.metadata.create_all(bind=engine)
         logger.info("Tables created successfully.")
+        applied = run_migrations(engine)
+        if applied:
+            logger.info(f"Applied migrations: {applied}")
     except OperationalError as e:
         logger.error("Could not connect to the database. Please check your connection details and ensure the database exists.")
         logger.error(f"Error details: {e}")
-    except Exception as e:
-        logger.error(f"An unexpected error occurred: {e}")
+        raise
+    except Exception:
+        logger.exception("Creating tables or applying migrations failed")
+        raise
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,18 @@
+from app.db.session import engine, Session
+from app.models import models
+from app.services.rollups import install_rollup_triggers, rebuild_rollups
+
+def rebuild():
+    print("Installing marks rollup trigger...")
+    with engine.begin() as connection:
+        install_rollup_triggers(connection)
+    print("Rebuilding rollups from marks...")
+    db = Session()
+    try:
+        rebuild_rollups(db)
+    finally:
+        db.close()
+    print("Rollups rebuilt successfully.")
+
+if __name__ == "__main__":
+    rebuild()
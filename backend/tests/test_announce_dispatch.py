@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from app.services import announce_dispatch
+from app.services.announce_dispatch import (
+    FAILED, SENT, AnnouncementDispatcher, FakeProvider, ProviderNotConfigured, make_backend,
+)
+
+
+@pytest.fixture
+def deliveries(monkeypatch):
+    """announcement_deliveries as a dict keyed by (announcement, channel, recipient)."""
+    table = {}
+
+    async def upsert(rows):
+        for row in rows:
+            table[(row["announcement_id"], row["channel"], row["recipient"])] = row
+
+    async def pending(announcement_id, channel, recipients):
+        return {
+            r: table.get((announcement_id, channel, r), {}).get("attempts", 0)
+            for r in recipients
+            if table.get((announcement_id, channel, r), {}).get("status") not in announce_dispatch.DELIVERED
+        }
+
+    monkeypatch.setattr(announce_dispatch, "_upsert_deliveries", upsert)
+    monkeypatch.setattr(announce_dispatch, "_pending", pending)
+    return table
+
+
+@pytest.mark.parametrize("channel", ["email", "sms"])
+def test_email_and_sms_need_a_configured_provider(monkeypatch, channel):
+    monkeypatch.delenv(f"ANNOUNCE_{channel.upper()}_BACKEND", raising=False)
+    with pytest.raises(ProviderNotConfigured):
+        make_backend(channel)
+    monkeypatch.setenv(f"ANNOUNCE_{channel.upper()}_BACKEND", "fake")
+    assert isinstance(make_backend(channel), FakeProvider)
+
+
+def test_fake_provider_keeps_only_recent_messages():
+    provider = FakeProvider(keep=3)
+    results = asyncio.run(provider.send_batch("hello", [f"p{i}@example.com" for i in range(10)]))
+    assert [r.status for r in results] == [SENT] * 10
+    assert provider.sent_count == 10
+    assert [recipient for recipient, _ in provider.sent] == ["p7@example.com", "p8@example.com", "p9@example.com"]
+
+
+def test_failed_sends_are_retried_and_recorded(deliveries, monkeypatch):
+    outcomes = iter([1.0, 0.0, 1.0])   # below failure_rate fails: the second recipient fails once
+    monkeypatch.setattr(announce_dispatch.random, "random", lambda: next(outcomes))
+    provider = FakeProvider(failure_rate=0.5, batch_size=2)
+    dispatcher = AnnouncementDispatcher(max_attempts=3, retry_delay=0)
+    dispatcher.set_backend("email", provider)
+
+    counts = asyncio.run(dispatcher.dispatch(1, "email", "hello", ["a@example.com", "b@example.com"]))
+    assert counts == {SENT: 2, "ready": 0, FAILED: 0}
+    assert deliveries[(1, "email", "b@example.com")]["attempts"] == 2
+    assert deliveries[(1, "email", "b@example.com")]["status"] == SENT
+    assert dispatcher.retries == 1
+
+    # Re-sending skips recipients that were already delivered
+    assert asyncio.run(dispatcher.dispatch(1, "email", "hello", ["a@example.com", "b@example.com"])) == {SENT: 0, "ready": 0, FAILED: 0}
+    assert provider.sent_count == 2
+
+
+def test_retries_stop_after_max_attempts(deliveries):
+    dispatcher = AnnouncementDispatcher(max_attempts=2, retry_delay=0)
+    dispatcher.set_backend("sms", FakeProvider(failure_rate=1.0))
+    counts = asyncio.run(dispatcher.dispatch(2, "sms", "hello", ["15550001"]))
+    assert counts[FAILED] == 1
+    row = deliveries[(2, "sms", "15550001")]
+    assert (row["status"], row["attempts"], row["error"]) == (FAILED, 2, "fake provider failure")
@@ -0,0 +1,105 @@
+"""
+Requests per second at 500 concurrent clients: GET /exams/{id}/stats on
+the async engine vs the same query in a sync route on the pg8000 engine
+(5+10 pool, Starlette threadpool), as every route ran before.
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db.session import get_async_db
+from app.models.models import Marks, User
+from app.services.stats import summarize_scores
+
+pytestmark = [pytest.mark.postgres, pytest.mark.benchmark]
+
+CLIENTS, REQUESTS_PER_CLIENT = 500, 4
+EXAM, TEACHER, FIRST_STUDENT, STUDENTS = 9500, 9500, 9600, 40
+
+
+def _seed(engine):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 't', 't9500@example.com', 'teacher')"), {"id": TEACHER})
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (:id, 'c', :id)"), {"id": TEACHER})
+        connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (:id, :id, :id, 'bench', 'graded')"), {"id": EXAM})
+        for i, sid in enumerate(range(FIRST_STUDENT, FIRST_STUDENT + STUDENTS)):
+            connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 's', :email, 'student')"),
+                               {"id": sid, "email": f"s{sid}@example.com"})
+            connection.execute(text(
+                "INSERT INTO marks (student_id, exam_id, total_marks, results, max_marks) VALUES (:s, :e, :t, '{}', 40)"
+            ), {"s": sid, "e": EXAM, "t": i % 41})
+
+
+def _sync_app(engine) -> FastAPI:
+    app = FastAPI()
+    SessionLocal = sessionmaker(bind=engine)
+
+    def get_db():
+        with SessionLocal() as db:
+            yield db
+
+    @app.get("/api/v1/exams/{exam_id}/stats")
+    def get_exam_stats(exam_id: int, db: Session = Depends(get_db)):
+        rows = db.execute(
+            select(Marks.student_id, Marks.total_marks, Marks.max_marks, User.name)
+            .outerjoin(User, User.id == Marks.student_id)
+            .where(Marks.exam_id == exam_id)
+            .order_by(Marks.total_marks.desc())
+        ).all()
+        return {
+            "exam_id": exam_id,
+            "stats": [dict(row._mapping) for row in rows],
+            "summary": summarize_scores([r.total_marks for r in rows], [r.max_marks for r in rows]),
+        }
+
+    return app
+
+
+async def _requests_per_second(app: FastAPI) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        async def client_loop():
+            for _ in range(REQUESTS_PER_CLIENT):
+                response = await client.get(f"/api/v1/exams/{EXAM}/stats")
+                assert response.status_code == 200
+                assert response.json()["summary"]["count"] == STUDENTS
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(CLIENTS)))
+        return CLIENTS * REQUESTS_PER_CLIENT / (time.perf_counter() - started)
+
+
+def test_async_stats_route_throughput(pg_engine, pg_async_url):
+    import main
+
+    _seed(pg_engine)
+    sync_engine = create_engine(pg_engine.url, pool_size=5, max_overflow=10, pool_timeout=120)
+    async_engine = create_async_engine(pg_async_url, pool_size=20, max_overflow=20, pool_timeout=120)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False, class_=AsyncSession)
+
+    async def get_test_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    main.app.dependency_overrides[get_async_db] = get_test_async_db
+
+    async def scenario():
+        try:
+            return await _requests_per_second(_sync_app(sync_engine)), await _requests_per_second(main.app)
+        finally:
+            await async_engine.dispose()
+
+    try:
+        sync_rps, async_rps = asyncio.run(scenario())
+    finally:
+        main.app.dependency_overrides.pop(get_async_db, None)
+        sync_engine.dispose()
+
+    print(f"\n{CLIENTS} concurrent clients: sync {sync_rps:.0f} req/s, async {async_rps:.0f} req/s")
+    assert async_rps > sync_rps
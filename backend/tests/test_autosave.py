@@ -0,0 +1,91 @@
+import asyncio
+import random
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services.autosave import AutosaveBuffer
+
+UNKNOWN_STUDENT = 999
+
+
+class RecordingBuffer(AutosaveBuffer):
+    """Buffer whose writes go to a list; a batch holding UNKNOWN_STUDENT fails like the users FK would."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.written = []
+        self.transactions = 0
+        self.down = False
+
+    async def _write(self, rows):
+        self.transactions += 1
+        if self.down:
+            raise OperationalError("INSERT", {}, Exception("connection refused"))
+        if any(row["student_id"] == UNKNOWN_STUDENT for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        self.written.extend(rows)
+
+
+def test_bad_session_only_drops_itself():
+    async def scenario():
+        buffer = RecordingBuffer()
+        buffer.save(1, 10, [(1000, 100, "a"), (1010, 101, "b")])
+        buffer.save(1, UNKNOWN_STUDENT, [(1000, 100, "x")])
+        buffer.save(1, 11, [(1000, 100, "c")])
+
+        assert await buffer.flush() == 3
+        assert {(r["student_id"], r["item_id"]) for r in buffer.written} == {(10, 1000), (10, 1010), (11, 1000)}
+        assert buffer.rows_rejected == 1
+        # Nothing is left dirty, so the next flush does not hit the same error again
+        assert await buffer.flush() == 0
+
+    asyncio.run(scenario())
+
+
+def test_connection_errors_keep_rows_for_the_next_flush():
+    async def scenario():
+        buffer = RecordingBuffer()
+        buffer.save(1, 10, [(1000, 100, "a")])
+        buffer.down = True
+        with pytest.raises(OperationalError):
+            await buffer.flush()
+        buffer.down = False
+        assert await buffer.flush() == 1
+        assert buffer.written == [{"exam_id": 1, "student_id": 10, "item_id": 1000, "question_id": 100, "response": "a"}]
+
+    asyncio.run(scenario())
+
+
+def test_simulated_classroom_write_amplification():
+    """
+    40 students, 30 questions, a 60-minute exam. The client autosaves every
+    10 s and each autosave carries the whole answer sheet, while a student
+    only changes an answer about every 45 s. The buffer flushes every 5 s.
+    """
+    rng = random.Random(1)
+    students, questions, minutes = 40, 30, 60
+    autosave_every, flush_every = 10, 5
+
+    async def scenario():
+        buffer = RecordingBuffer()
+        sheets = {sid: {} for sid in range(students)}
+        for second in range(minutes * 60):
+            for sid, sheet in sheets.items():
+                if rng.random() < 1 / 45:
+                    sheet[rng.randrange(questions)] = f"answer {second}"
+                if second % autosave_every == sid % autosave_every and sheet:
+                    buffer.save(1, sid, [(q, q, response) for q, response in sheet.items()])
+            if second % flush_every == 0:
+                await buffer.flush()
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    stats = buffer.stats()
+    print(f"classroom autosave: {stats}, {buffer.transactions} transactions")
+    # Every autosaved answer written straight through would be one row per answer;
+    # the buffer writes each answer once per flush it is dirty in
+    assert stats["answers_received"] > 10 * stats["rows_flushed"]
+    assert stats["write_amplification"] < 0.1
+    assert buffer.transactions <= minutes * 60 // flush_every + 1
@@ -0,0 +1,40 @@
+import asyncio
+import io
+import zipfile
+
+from app.services import bulk_pdf, pdf_cache, pdf_renderer
+
+
+def test_zip_keeps_a_bounded_window_and_waits_for_the_reader(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    pdf_cache._memory.clear()
+    started = []
+    running = 0
+    peak = 0
+
+    async def fake_render(payload, wait=False):
+        nonlocal running, peak
+        started.append(payload["exam_id"])
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return f"%PDF {payload['exam_id']}".encode()
+
+    monkeypatch.setattr(pdf_renderer, "render", fake_render)
+    payloads = [{"exam_id": i, "title": f"Exam {i}", "mcq": [], "one_mark": [], "three_mark": []} for i in range(10)]
+
+    async def consume():
+        stream = bulk_pdf.stream_pdf_zip(payloads, window=2)
+        chunks = [await stream.__anext__()]
+        # The client stalls after the first entry: nothing beyond the window starts
+        await asyncio.sleep(0.05)
+        assert len(started) <= 3
+        async for chunk in stream:
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(consume())))
+    assert len(archive.namelist()) == 10
+    assert archive.read("exam_3_Exam_3.pdf") == b"%PDF 3"
+    assert peak <= 2
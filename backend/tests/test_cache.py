@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from app.core import cache
+from app.core.cache import MemoryBackend, ReadThroughCache, SingleFlight
+
+
+class CountingLoader:
+    """Loader that counts its calls and holds each one until released."""
+
+    def __init__(self, value: bytes = b"v"):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        return self.value
+
+
+def test_simultaneous_misses_load_once():
+    async def scenario():
+        loader = CountingLoader()
+        store = ReadThroughCache("t", ttl=60, backend=MemoryBackend())
+        waiting = [asyncio.ensure_future(store.get_or_load(1, loader)) for _ in range(20)]
+        await asyncio.sleep(0)
+        loader.release.set()
+        values = await asyncio.gather(*waiting)
+        # Served from the backend from now on
+        again = await store.get_or_load(1, loader)
+        return loader.calls, values, again
+
+    calls, values, again = asyncio.run(scenario())
+    assert calls == 1
+    assert values == [b"v"] * 20
+    assert again == b"v"
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def scenario():
+        loader = CountingLoader()
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("k", loader))
+        second = asyncio.ensure_future(flight.do("k", loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        loader.release.set()
+        value = await second
+        return loader.calls, value
+
+    assert asyncio.run(scenario()) == (1, b"v")
+
+
+@pytest.mark.parametrize("load_started", [True, False])
+def test_a_load_racing_an_invalidate_is_not_stored(load_started):
+    async def scenario():
+        backend = MemoryBackend()
+        store = ReadThroughCache("t", ttl=60, backend=backend)
+        stale = CountingLoader(b"stale")
+        loading = asyncio.ensure_future(store.get_or_load(1, stale))
+        await asyncio.sleep(0)
+        # Either the loader is running, or the miss was seen but its task has not started yet
+        while load_started and not stale.calls:
+            await asyncio.sleep(0)
+        await store.invalidate(1)
+        stale.release.set()
+        served = await loading
+        fresh = CountingLoader(b"fresh")
+        fresh.release.set()
+        return served, await backend.get("t:1"), await store.get_or_load(1, fresh)
+
+    served, stored, reloaded = asyncio.run(scenario())
+    # The caller that started the load still gets its result, but it is not cached
+    assert served == b"stale"
+    assert stored is None
+    assert reloaded == b"fresh"
+
+
+def test_memory_backend_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        backend = MemoryBackend()
+        await backend.set("k", b"v", ttl=10)
+        now[0] += 9
+        before = await backend.get("k")
+        now[0] += 2
+        return before, await backend.get("k"), "k" in backend._entries
+
+    assert asyncio.run(scenario()) == (b"v", None, False)
+
+
+def test_memory_backend_evicts_least_recently_used():
+    async def scenario():
+        backend = MemoryBackend(max_entries=2)
+        await backend.set("a", b"1", ttl=60)
+        await backend.set("b", b"2", ttl=60)
+        await backend.get("a")
+        await backend.set("c", b"3", ttl=60)
+        return [await backend.get(key) for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [b"1", None, b"3"]
@@ -0,0 +1,73 @@
+import asyncio
+import csv
+import io
+import json
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import export
+from app.services.export import _encode_csv, _encode_ndjson, export_query, stream_export
+
+
+def test_csv_encoding_quotes_and_header():
+    body = _encode_csv([(1, 2, "Ann, \"A\"", 5, 10)], ["exam_id", "student_id", "name", "total_marks", "max_marks"])
+    assert list(csv.reader(io.StringIO(body.decode()))) == [
+        ["exam_id", "student_id", "name", "total_marks", "max_marks"],
+        ["1", "2", "Ann, \"A\"", "5", "10"],
+    ]
+
+
+def test_ndjson_encoding_one_object_per_line():
+    body = _encode_ndjson([(1, 2, None), (1, 3, "x")], ["exam_id", "student_id", "response"])
+    assert [json.loads(line) for line in body.decode().splitlines()] == [
+        {"exam_id": 1, "student_id": 2, "response": None},
+        {"exam_id": 1, "student_id": 3, "response": "x"},
+    ]
+
+
+def test_responses_are_ordered_like_their_unique_index():
+    sql = str(export_query("responses", 1, None).compile(dialect=postgresql.dialect()))
+    order_by = sql.split("ORDER BY")[1].strip()
+    assert order_by == "student_responses.exam_id, student_responses.student_id, student_responses.item_id"
+
+
+class _StreamingSession:
+    """Stands in for AsyncSession.stream: partitions arrive one by one, gated by the test."""
+
+    def __init__(self, partitions):
+        self.partitions_left = list(partitions)
+        self.release = asyncio.Event()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, query):
+        return self
+
+    async def partitions(self, size):
+        for i, partition in enumerate(self.partitions_left):
+            if i:
+                await self.release.wait()
+            yield partition
+
+
+def test_first_rows_leave_before_the_query_finishes(monkeypatch):
+    session = _StreamingSession([[(1, 10, "Ann", 5, 10)], [(1, 11, "Bob", 7, 10)]])
+    monkeypatch.setattr(export, "AsyncSessionLocal", lambda: session)
+
+    async def scenario():
+        stream = stream_export("marks", "csv", exam_id=1)
+        header = await stream.__anext__()
+        first = await stream.__anext__()
+        # The second partition is still held back by the "database"
+        session.release.set()
+        rest = [chunk async for chunk in stream]
+        return header, first, rest
+
+    header, first, rest = asyncio.run(scenario())
+    assert header == b"exam_id,student_id,name,total_marks,max_marks\r\n"
+    assert first == b"1,10,Ann,5,10\r\n"
+    assert rest == [b"1,11,Bob,7,10\r\n"]
@@ -0,0 +1,95 @@
+import asyncio
+import itertools
+
+import pytest
+
+from app.services import generation_jobs
+from app.services.generation_jobs import FAILED, SUCCEEDED, JobQueue
+
+EXAM_REQUEST = {"topic": "Photosynthesis", "counts": {"mcq": 2}, "difficulty": "easy", "teacher_id": 1, "class_id": 1}
+QUESTIONS = {"mcq": [{"question": "Q1", "options": ["a", "b"]}, {"question": "Q2", "options": ["a", "b"]}]}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Fake webhook, generation cache and exam storage."""
+    state = {"calls": 0, "cache": {}, "exams": [], "release": None, "fail": False}
+    exam_ids = itertools.count(100)
+
+    async def post_json(upstream, payload):
+        state["calls"] += 1
+        if state["release"] is not None:
+            await state["release"].wait()
+        if state["fail"]:
+            raise generation_jobs.UpstreamError("exam", "HTTP 500")
+        # The n8n flow saves the exam it generated and returns its id
+        return {"exam_id": next(exam_ids), **QUESTIONS}
+
+    async def cache_get(key):
+        return state["cache"].get(key)
+
+    async def cache_put(kind, key, request, response):
+        state["cache"][key] = response
+
+    async def save_exam(title, description, questions, teacher_id=1, class_id=1):
+        state["exams"].append(questions)
+        return next(exam_ids)
+
+    monkeypatch.setattr(generation_jobs, "post_json", post_json)
+    monkeypatch.setattr(generation_jobs.generation_cache, "get", cache_get)
+    monkeypatch.setattr(generation_jobs.generation_cache, "put", cache_put)
+    monkeypatch.setattr(generation_jobs, "save_exam", save_exam)
+    return state
+
+
+def test_joined_requests_get_their_own_exams(upstream):
+    async def scenario():
+        upstream["release"] = asyncio.Event()
+        queue = JobQueue()
+        first = queue.submit("exam", EXAM_REQUEST)
+        second = queue.submit("exam", {**EXAM_REQUEST, "topic": " photosynthesis "})
+        await asyncio.sleep(0)
+        upstream["release"].set()
+        await asyncio.gather(first.wait(), second.wait())
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert upstream["calls"] == 1
+    assert first.id != second.id
+    assert first.status == second.status == SUCCEEDED
+    assert first.result["exam_id"] != second.result["exam_id"]
+    assert second.result["mcq"] == QUESTIONS["mcq"]
+
+
+def test_cache_hits_save_a_new_exam_and_never_store_exam_ids(upstream):
+    async def scenario():
+        queue = JobQueue()
+        first = queue.submit("exam", EXAM_REQUEST)
+        await first.wait()
+        second = queue.submit("exam", EXAM_REQUEST)
+        await second.wait()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert upstream["calls"] == 1
+    assert second.cached
+    assert first.result["exam_id"] != second.result["exam_id"]
+    assert all("exam_id" not in entry for entry in upstream["cache"].values())
+    assert upstream["exams"] == [{"mcq": QUESTIONS["mcq"], "one_mark": [], "three_mark": []}]
+
+
+def test_joined_requests_fail_with_the_generation(upstream):
+    async def scenario():
+        upstream["release"] = asyncio.Event()
+        upstream["fail"] = True
+        queue = JobQueue()
+        first = queue.submit("exam", EXAM_REQUEST)
+        second = queue.submit("exam", EXAM_REQUEST)
+        upstream["release"].set()
+        await asyncio.gather(first.wait(), second.wait())
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.status == second.status == FAILED
+    assert second.error == first.error == "exam: HTTP 500"
+    assert upstream["exams"] == []
@@ -0,0 +1,102 @@
+import asyncio
+import itertools
+import json
+
+import pytest
+
+from app.schemas.exams import ExamGenerateRequest
+from app.services import generation_stream
+from app.services.generation_stream import stream_exam_preview
+
+REQUEST = ExamGenerateRequest(topic="Photosynthesis", counts={"mcq": 2}, difficulty="easy")
+QUESTIONS = [{"type": "mcq", "question": "Q1", "options": ["a", "b"]},
+             {"type": "mcq", "question": "Q2", "options": ["a", "b"]}]
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Webhook that streams one question, then holds the rest until released."""
+    state = {"calls": 0, "cache": {}, "exams": [], "release": None}
+    exam_ids = itertools.count(100)
+
+    async def stream_json(upstream, payload):
+        state["calls"] += 1
+        yield {"type": "item", "content": QUESTIONS[0]}
+        await state["release"].wait()
+        yield {"type": "item", "content": QUESTIONS[1]}
+
+    async def cache_get(key):
+        return state["cache"].get(key)
+
+    async def cache_put(kind, key, request, response):
+        state["cache"][key] = response
+
+    async def save_exam(title, description, questions, teacher_id=1, class_id=1):
+        state["exams"].append(questions)
+        return next(exam_ids)
+
+    monkeypatch.setattr(generation_stream, "stream_json", stream_json)
+    monkeypatch.setattr(generation_stream.generation_cache, "get", cache_get)
+    monkeypatch.setattr(generation_stream.generation_cache, "put", cache_put)
+    monkeypatch.setattr(generation_stream, "save_exam", save_exam)
+    return state
+
+
+def _event(chunk: bytes):
+    name, data = chunk.decode().strip().split("\n")
+    return name[len("event: "):], json.loads(data[len("data: "):])
+
+
+async def _collect(stream):
+    return [_event(chunk) async for chunk in stream]
+
+
+def test_first_question_is_sent_before_the_webhook_finishes(upstream):
+    async def scenario():
+        upstream["release"] = asyncio.Event()
+        stream = stream_exam_preview(REQUEST)
+        started = _event(await stream.__anext__())
+        first = _event(await asyncio.wait_for(stream.__anext__(), 1))
+        still_running = not upstream["release"].is_set()
+        upstream["release"].set()
+        return started, first, still_running, await _collect(stream)
+
+    started, first, still_running, rest = asyncio.run(scenario())
+    assert started[0] == "started"
+    assert first == ("question", {"index": 0, "type": "mcq", "question": QUESTIONS[0]})
+    assert still_running
+    assert [name for name, _ in rest] == ["question", "done"]
+
+
+def test_identical_streams_share_one_webhook_call(upstream):
+    async def scenario():
+        upstream["release"] = asyncio.Event()
+        first = asyncio.ensure_future(_collect(stream_exam_preview(REQUEST)))
+        second = asyncio.ensure_future(_collect(stream_exam_preview(ExamGenerateRequest(topic=" photosynthesis ", counts={"mcq": 2}, difficulty="easy"))))
+        await asyncio.sleep(0.01)
+        upstream["release"].set()
+        return await asyncio.gather(first, second)
+
+    first, second = asyncio.run(scenario())
+    assert upstream["calls"] == 1
+    for events in (first, second):
+        assert [data["question"] for name, data in events if name == "question"] == QUESTIONS
+    first_done, second_done = first[-1][1], second[-1][1]
+    assert first_done["exam_id"] != second_done["exam_id"]
+    assert len(upstream["exams"]) == 2
+    # Stored under the job queue's key, as the normalized question lists
+    assert list(upstream["cache"].values()) == [{"mcq": QUESTIONS, "one_mark": [], "three_mark": []}]
+    assert generation_stream._flights == {}
+
+
+def test_a_cached_stream_replays_without_the_webhook(upstream):
+    async def scenario():
+        upstream["release"] = asyncio.Event()
+        upstream["release"].set()
+        await _collect(stream_exam_preview(REQUEST))
+        return await _collect(stream_exam_preview(REQUEST))
+
+    events = asyncio.run(scenario())
+    assert upstream["calls"] == 1
+    assert events[-1][0] == "done" and events[-1][1]["cached"] is True
+    assert len([name for name, _ in events if name == "question"]) == 2
@@ -0,0 +1,147 @@
+import json
+import random
+import time
+
+import pytest
+
+from types import SimpleNamespace
+
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import Session
+
+from app.models.models import Marks, QuestionItem, StudentResponse
+from app.services.grading import (
+    ExactGrader, TokenSetGrader, _build_answer_key, first_items, grade_exam_responses, grade_many, parse_thresholds,
+    resolve_item,
+)
+
+
+def key(answer, marks=1, qtype="one_mark"):
+    return {"type": qtype, "question": "Q", "answer": answer, "marks": marks, "options": []}
+
+
+def test_exact_grader_ignores_case_and_spaces():
+    assert ExactGrader().grade_batch([" Paris ", "paris", "London"], key("Paris", qtype="mcq")) == [1, 1, 0]
+
+
+def test_token_set_grader_ignores_filler_words():
+    assert TokenSetGrader().grade_batch(["the mitochondria", "Mitochondria."], key("mitochondria")) == [1, 1]
+
+
+def test_token_set_grader_rounds_partial_credit():
+    grader = TokenSetGrader(((0.9, 1.0), (0.4, 0.5)))
+    # Jaccard 0.5 -> half of 3 marks rounds to 2, half of 1 mark rounds to 1
+    assert grader.grade_batch(["cell membrane"], key("cell wall membrane lipid", marks=3)) == [2]
+    assert grader.grade_batch(["cell membrane"], key("cell wall membrane lipid", marks=1)) == [1]
+    assert grader.grade_batch(["unrelated words"], key("cell wall", marks=3)) == [0]
+
+
+def test_token_set_grader_without_answer_key_scores_zero():
+    assert TokenSetGrader().grade_batch(["anything"], key(None)) == [0]
+
+
+def test_parse_thresholds():
+    assert parse_thresholds("0.8:1, 0.5:0.5") == [(0.8, 1.0), (0.5, 0.5)]
+    assert parse_thresholds("") == parse_thresholds(None)
+    with pytest.raises(ValueError):
+        parse_thresholds("0.8")
+
+
+def test_grade_many_batches_by_question():
+    answer_key = {1: key("Paris", qtype="mcq"), 2: key("photosynthesis", marks=3)}
+    answers = [(1, "paris"), (2, "photosynthesis"), (1, "rome"), (2, "no idea")]
+    assert grade_many(answer_key, answers) == [1, 3, 0, 0]
+
+
+@pytest.mark.benchmark
+def test_grade_many_10k_responses_throughput():
+    rng = random.Random(0)
+    words = "energy light plant cell sugar oxygen water carbon chlorophyll leaf".split()
+    answer_key = {
+        qid: key(" ".join(rng.sample(words, 4)), marks=3, qtype="three_mark" if qid % 2 else "mcq")
+        for qid in range(20)
+    }
+    answers = [(rng.randrange(20), " ".join(rng.sample(words, rng.randint(1, 8)))) for _ in range(10_000)]
+
+    started = time.perf_counter()
+    scores = grade_many(answer_key, answers)
+    elapsed = time.perf_counter() - started
+
+    assert len(scores) == 10_000
+    print(f"graded 10k responses in {elapsed * 1000:.1f} ms ({10_000 / elapsed:,.0f}/s)")
+    assert elapsed < 2.0
+
+
+def item(id, question_id, qtype, position, answer, marks=1):
+    return SimpleNamespace(id=id, question_id=question_id, type=qtype, position=position,
+                           text=f"Q{id}", options=["Paris", "London"] if qtype == "mcq" else [],
+                           answer=answer, marks=marks)
+
+
+def test_every_item_of_a_question_is_graded():
+    answer_key = _build_answer_key([
+        item(3, 1, "one_mark", 1, "oxygen"),
+        item(2, 1, "one_mark", 0, "nitrogen"),
+        item(1, 1, "mcq", 0, "Paris"),
+    ])
+    assert list(answer_key) == [1, 2, 3]
+    assert grade_many(answer_key, [(1, "paris"), (2, "nitrogen"), (3, "oxygen")]) == [1, 1, 1]
+
+
+def test_answers_resolve_to_items():
+    answer_key = _build_answer_key([item(5, 1, "one_mark", 0, "x"), item(4, 1, "mcq", 0, "Paris"), item(6, 2, "mcq", 0, "a")])
+    first = first_items(answer_key)
+    assert first == {1: 4, 2: 6}
+    assert resolve_item(answer_key, first, None, 1) == 4
+    assert resolve_item(answer_key, first, 5, 1) == 5
+    assert resolve_item(answer_key, first, 5, None) == 5
+    assert resolve_item(answer_key, first, 5, 2) is None   # item of another question
+    assert resolve_item(answer_key, first, 99, None) is None
+
+
+@pytest.mark.postgres
+def test_chunked_grading_spans_students_and_regrades_in_place(pg_engine):
+    answers = ["a", "b", "c", "d", "e"]
+    with pg_engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (9700, 't', 't9700@example.com', 'teacher')"))
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (9700, 'c', 9700)"))
+        connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (9700, 9700, 9700, 't', 'scheduled')"))
+        for student_id in (9701, 9702):
+            connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 's', :email, 'student')"),
+                               {"id": student_id, "email": f"s{student_id}@example.com"})
+        connection.execute(text("INSERT INTO questions (id, exam_id, mcq) VALUES (9700, 9700, CAST(:mcq AS jsonb))"),
+                           {"mcq": json.dumps([{"question": f"Q{i}", "options": answers, "answer": a} for i, a in enumerate(answers)])})
+
+    with Session(pg_engine) as db:
+        item_ids = db.execute(select(QuestionItem.id).where(QuestionItem.exam_id == 9700).order_by(QuestionItem.position)).scalars().all()
+        given = {9701: ["a", "x", "c", "x", "e"], 9702: answers}
+        db.add_all([
+            StudentResponse(student_id=student_id, exam_id=9700, question_id=9700, item_id=item_id, response=response)
+            for student_id, responses in given.items() for item_id, response in zip(item_ids, responses)
+        ])
+        db.commit()
+
+        # Each student's five responses span several chunks of two
+        summary = grade_exam_responses(db, 9700, chunk_size=2)
+        assert (summary["students_graded"], summary["responses_graded"], summary["max_marks"]) == (2, 10, 5)
+
+        def graded():
+            marks = db.execute(select(StudentResponse.student_id, StudentResponse.marks_obtained)
+                               .where(StudentResponse.exam_id == 9700).order_by(StudentResponse.student_id, StudentResponse.item_id)).all()
+            rows = db.execute(select(Marks).where(Marks.exam_id == 9700).order_by(Marks.student_id)).scalars().all()
+            return marks, [(m.student_id, m.total_marks, m.max_marks, [r["score"] for r in m.results]) for m in rows]
+
+        marks, rows = graded()
+        assert [m for _, m in marks] == [1, 0, 1, 0, 1, 1, 1, 1, 1, 1]
+        assert rows == [(9701, 3, 5, [1, 0, 1, 0, 1]), (9702, 5, 5, [1, 1, 1, 1, 1])]
+
+        for position in (1, 3):
+            db.execute(update(StudentResponse).where(StudentResponse.student_id == 9701, StudentResponse.item_id == item_ids[position])
+                       .values(response=answers[position]))
+        db.commit()
+        grade_exam_responses(db, 9700, chunk_size=3)
+
+        marks, rows = graded()
+        assert all(m == 1 for _, m in marks)
+        # Regrading upserts: still one Marks row per student
+        assert rows == [(9701, 5, 5, [1, 1, 1, 1, 1]), (9702, 5, 5, [1, 1, 1, 1, 1])]
@@ -0,0 +1,138 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core import http
+from app.core.http import Upstream, UpstreamError, post_json, stream_json
+
+
+@pytest.fixture
+def upstream_app(monkeypatch):
+    """Points the shared client at an in-process stub webhook; records backoff delays."""
+    delays = []
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay):
+        delays.append(delay)
+        await real_sleep(0)
+
+    def install(handler):
+        monkeypatch.setattr(http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    monkeypatch.setattr(http.random, "uniform", lambda low, high: 0)
+    monkeypatch.setattr(http.asyncio, "sleep", sleep)
+    install.delays = delays
+    return install
+
+
+def test_post_json_retries_transient_statuses_with_backoff(upstream_app):
+    statuses = iter([503, 429, 200])
+    upstream_app(lambda request: httpx.Response(next(statuses), json={"ok": True}))
+
+    async def scenario():
+        upstream = Upstream("exam", "exam/generate-ai", concurrency=1, timeout=5, retries=2, backoff=0.5)
+        return upstream, await post_json(upstream, {"topic": "x"})
+
+    upstream, body = asyncio.run(scenario())
+    assert body == {"ok": True}
+    assert upstream_app.delays == [0.5, 1.0]
+    assert upstream.stats() == {"in_flight": 0, "calls": 1, "retried": 2, "failures": 0}
+
+
+def test_post_json_does_not_retry_client_errors(upstream_app):
+    requests = []
+    upstream_app(lambda request: requests.append(request) or httpx.Response(400, text="bad topic"))
+
+    async def scenario():
+        upstream = Upstream("exam", "exam/generate-ai", concurrency=1, timeout=5)
+        with pytest.raises(UpstreamError) as error:
+            await post_json(upstream, {})
+        return upstream, error.value
+
+    upstream, error = asyncio.run(scenario())
+    assert error.status_code == 400
+    assert len(requests) == 1
+    assert upstream.failures == 1
+
+
+def test_post_json_gives_up_after_the_last_retry(upstream_app):
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+    upstream_app(refuse)
+
+    async def scenario():
+        upstream = Upstream("exam", "exam/generate-ai", concurrency=1, timeout=5, retries=3, backoff=0.1)
+        with pytest.raises(UpstreamError):
+            await post_json(upstream, {})
+        return upstream
+
+    upstream = asyncio.run(scenario())
+    assert upstream_app.delays == pytest.approx([0.1, 0.2, 0.4])
+    assert upstream.stats() == {"in_flight": 0, "calls": 1, "retried": 3, "failures": 1}
+
+
+def test_post_json_respects_the_upstream_concurrency_limit(monkeypatch):
+    active = peak = 0
+
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return httpx.Response(200, json={})
+
+    monkeypatch.setattr(http, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    async def scenario():
+        upstream = Upstream("announcement", "announcements/format", concurrency=3, timeout=5)
+        await asyncio.gather(*(post_json(upstream, {"i": i}) for i in range(12)))
+        return upstream
+
+    upstream = asyncio.run(scenario())
+    assert peak == 3
+    assert upstream.calls == 12
+
+
+class _BrokenStream(httpx.AsyncByteStream):
+    """One NDJSON line, then the connection drops."""
+
+    async def __aiter__(self):
+        yield b'{"n": 1}\n'
+        raise httpx.ReadError("connection reset")
+
+
+def test_stream_json_retries_only_before_the_first_chunk(upstream_app):
+    ndjson = {"content-type": "application/x-ndjson"}
+    responses = iter([
+        httpx.Response(502),
+        httpx.Response(200, headers=ndjson, content=b'{"n": 1}\n\n{"n": 2}\n'),
+        httpx.Response(200, headers=ndjson, stream=_BrokenStream()),
+    ])
+    upstream_app(lambda request: next(responses))
+
+    async def scenario():
+        upstream = Upstream("exam", "exam/generate-ai", concurrency=1, timeout=5, retries=2, backoff=0.5)
+        lines = [line async for line in stream_json(upstream, {})]
+        received = []
+        with pytest.raises(UpstreamError):
+            async for line in stream_json(upstream, {}):
+                received.append(line)
+        return upstream, lines, received
+
+    upstream, lines, received = asyncio.run(scenario())
+    assert lines == [{"n": 1}, {"n": 2}]
+    assert received == [{"n": 1}]
+    assert upstream_app.delays == [0.5]
+    assert upstream.stats() == {"in_flight": 0, "calls": 2, "retried": 1, "failures": 1}
+
+
+def test_stream_json_yields_a_plain_json_body_once(upstream_app):
+    upstream_app(lambda request: httpx.Response(200, json={"questions": []}))
+
+    async def scenario():
+        upstream = Upstream("exam", "exam/generate-ai", concurrency=1, timeout=5)
+        return [line async for line in stream_json(upstream, {})]
+
+    assert asyncio.run(scenario()) == [{"questions": []}]
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+
+from app.services import item_analysis
+from app.services.item_analysis import _analyze, _option_index, analyze_items
+
+
+def test_letter_labels_map_by_position():
+    index = _option_index(["Paris", "London", "Berlin", "Athens"])
+    assert index["a"] == 0
+    assert index["b"] == 1
+    assert index["d"] == 3
+    assert index["athens"] == 3
+
+
+def test_option_text_wins_over_label():
+    index = _option_index(["B", "A"])
+    assert index["a"] == 1
+    assert index["b"] == 0
+
+
+def key(question_id, qtype, marks, options=()):
+    return {"question_id": question_id, "type": qtype, "position": 0, "marks": marks, "options": list(options),
+            "question": "Q", "answer": None}
+
+
+ANSWER_KEY = {10: key(1, "mcq", 1, ["Paris", "London"]), 11: key(2, "one_mark", 2)}
+# student 1 scores 3, students 2 and 3 score 1
+ROWS = [
+    SimpleNamespace(student_id=1, item_id=10, response="Paris", marks_obtained=1),
+    SimpleNamespace(student_id=1, item_id=11, response="x", marks_obtained=2),
+    SimpleNamespace(student_id=2, item_id=10, response="a", marks_obtained=1),
+    SimpleNamespace(student_id=2, item_id=11, response="x", marks_obtained=0),
+    SimpleNamespace(student_id=3, item_id=10, response="b", marks_obtained=0),
+    SimpleNamespace(student_id=3, item_id=11, response="x", marks_obtained=1),
+]
+
+
+def test_difficulty_and_discrimination_on_a_known_matrix():
+    analysis = _analyze(ANSWER_KEY, ROWS)
+    mcq, short = analysis["items"]
+    assert analysis["students"] == 3
+    # Mean proportion of marks: (1 + 1 + 0) / 3 and (1 + 0 + 0.5) / 3
+    assert (mcq["difficulty"], short["difficulty"]) == (0.6667, 0.5)
+    # Correlation with totals [3, 1, 1]: 0.5 and sqrt(3) / 2
+    assert (mcq["discrimination"], short["discrimination"]) == (0.5, 0.866)
+    assert mcq["option_counts"] == {"Paris": 2, "London": 1}
+    assert short["option_counts"] is None
+
+
+class _Db:
+    """Answers analyze_items' one response query and counts it."""
+
+    def __init__(self):
+        self.queries = 0
+
+    def query(self, *columns):
+        self.queries += 1
+        return SimpleNamespace(filter=lambda *_: SimpleNamespace(all=lambda: ROWS))
+
+
+def test_analysis_is_cached_until_invalidated(monkeypatch):
+    monkeypatch.setattr(item_analysis, "load_answer_key", lambda db, exam_id: ANSWER_KEY)
+    monkeypatch.setattr(item_analysis, "_cache", OrderedDict())
+    db = _Db()
+
+    first = analyze_items(db, 7)
+    assert analyze_items(db, 7) is first
+    assert db.queries == 1
+
+    item_analysis.invalidate(7)
+    assert analyze_items(db, 7) == first
+    assert db.queries == 2
+
+
+def test_an_analysis_racing_a_write_is_not_cached(monkeypatch):
+    def load_answer_key(db, exam_id):
+        # A submission lands while this analysis is being computed
+        item_analysis.invalidate(exam_id)
+        return ANSWER_KEY
+
+    monkeypatch.setattr(item_analysis, "load_answer_key", load_answer_key)
+    monkeypatch.setattr(item_analysis, "_cache", OrderedDict())
+    analyze_items(_Db(), 8)
+    assert 8 not in item_analysis._cache
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+
+from app.db.migrations import MIGRATIONS, run_migrations
+from app.db.plan_check import check_query_plans
+
+pytestmark = pytest.mark.postgres
+
+
+def test_every_migration_is_recorded(pg_engine):
+    with pg_engine.connect() as connection:
+        versions = set(connection.execute(text("SELECT version FROM schema_migrations")).scalars())
+    assert versions == {m.version for m in MIGRATIONS}
+
+
+def test_concurrent_startups_apply_nothing_twice(pg_engine):
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: run_migrations(pg_engine), range(4)))
+    assert results == [[], [], [], []]
+
+
+def test_unique_index_build_dedupes_rows_written_after_the_first_dedupe(pg_engine):
+    with pg_engine.begin() as connection:
+        connection.execute(text("DROP INDEX IF EXISTS uq_response_exam_student_item"))
+        connection.execute(text("ALTER TABLE student_responses DROP CONSTRAINT IF EXISTS uq_response_exam_student_item"))
+        connection.execute(text("DELETE FROM schema_migrations WHERE version = 13"))
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (9001, 's', 's@example.com', 'student')"))
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (9001, 'c', 9001)"))
+        connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (9001, 9001, 9001, 't', 'published')"))
+        connection.execute(text("INSERT INTO questions (id, exam_id, mcq) VALUES (9001, 9001, '[{\"question\": \"q\", \"options\": [\"a\"], \"correct_answer\": \"a\"}]')"))
+        for response in ("old", "new"):
+            connection.execute(text(
+                "INSERT INTO student_responses (student_id, exam_id, question_id, item_id, response) "
+                "SELECT 9001, 9001, 9001, id, :r FROM question_items WHERE question_id = 9001"
+            ), {"r": response})
+
+    assert run_migrations(pg_engine) == [13]
+    with pg_engine.connect() as connection:
+        assert connection.execute(text("SELECT response FROM student_responses WHERE exam_id = 9001")).scalars().all() == ["new"]
+        assert connection.execute(text("""
+            SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'uq_response_exam_student_item'
+        """)).scalar() is True
+
+
+def test_hot_queries_use_indexes(pg_engine):
+    assert check_query_plans(pg_engine) == {}
@@ -0,0 +1,43 @@
+import os
+
+from app.services import pdf_cache
+
+
+def payload(question="What is 2+2?"):
+    return {"exam_id": 1, "title": "Maths", "mcq": [{"question": question, "options": ["3", "4"]}],
+            "one_mark": [], "three_mark": []}
+
+
+def test_digest_follows_content_not_exam_id():
+    assert pdf_cache.content_digest(payload()) == pdf_cache.content_digest({**payload(), "exam_id": 2})
+    assert pdf_cache.content_digest(payload()) != pdf_cache.content_digest(payload("What is 3+3?"))
+
+
+def test_disk_tier_is_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    digest = pdf_cache.content_digest(payload())
+    pdf_cache.put(digest, b"%PDF-1.4")
+    pdf_cache._memory.clear()   # as seen from another worker
+    assert pdf_cache.get(digest) == b"%PDF-1.4"
+
+
+def test_disk_tier_drops_least_recently_used_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "DISK_MAX_FILES", 3)
+    digests = [pdf_cache.content_digest(payload(f"Question {i}")) for i in range(5)]
+    for i, digest in enumerate(digests[:3]):
+        pdf_cache.put(digest, b"%PDF")
+        os.utime(pdf_cache._path(digest), (1000 + i, 1000 + i))
+    pdf_cache._memory.clear()
+    pdf_cache.get(digests[0])   # a disk hit makes the oldest file the newest
+    for digest in digests[3:]:
+        pdf_cache.put(digest, b"%PDF")
+    assert sorted(p.name for p in tmp_path.glob("*.pdf")) == sorted(f"{d}.pdf" for d in (digests[0], *digests[3:]))
+
+
+def test_disk_tier_is_bounded_by_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "DISK_MAX_BYTES", 2500)
+    for i in range(5):
+        pdf_cache.put(pdf_cache.content_digest(payload(f"Question {i}")), b"x" * 1000)
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.pdf")) <= 2500
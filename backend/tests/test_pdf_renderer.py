@@ -0,0 +1,82 @@
+"""
+JSON latency while PDFs render: a JSON route is polled while a burst of
+exam PDFs renders either on the threadpool (the old sync route) or in the
+process-pool renderer.
+"""
+import asyncio
+import time
+
+import httpx
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
+
+from app.services import pdf_renderer
+from app.services.exam_pdf import render_exam_pdf
+
+pytestmark = pytest.mark.benchmark
+
+PDFS = 8
+PAYLOAD = {
+    "exam_id": 1,
+    "title": "Load test",
+    "mcq": [{"question": f"Question {i} " + "word " * 40, "options": ["alpha", "beta", "gamma", "delta"]} for i in range(150)],
+    "one_mark": [{"question": f"Short {i} " + "word " * 60} for i in range(60)],
+    "three_mark": [{"question": f"Long {i} " + "word " * 120} for i in range(30)],
+}
+
+app = FastAPI()
+
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+
+async def _json_latencies_while(render_one):
+    """
+    Latency (ms) of /ping requests issued every 5 ms while PDFS renders run,
+    measured from when each request was due, so a starved loop counts too.
+    """
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async def timed(due):
+            assert (await client.get("/ping")).status_code == 200
+            return (time.perf_counter() - due) * 1000
+
+        renders = asyncio.gather(*(render_one() for _ in range(PDFS)))
+        requests = []
+        due = time.perf_counter()
+        while not renders.done():
+            # Requests that fell due while the loop was starved go out late, and count as late
+            while due <= time.perf_counter():
+                requests.append(asyncio.ensure_future(timed(due)))
+                due += 0.005
+            await asyncio.sleep(due - time.perf_counter())
+        pdfs = await renders
+        latencies = np.array(await asyncio.gather(*requests))
+    assert all(pdf.startswith(b"%PDF") for pdf in pdfs)
+    return latencies
+
+
+def test_json_latency_stays_flat_while_pdfs_render():
+    async def scenario():
+        # Start every worker process before measuring
+        await asyncio.gather(*(pdf_renderer.render(PAYLOAD, wait=True) for _ in range(pdf_renderer.WORKERS)))
+        idle = await _json_latencies_while(lambda: asyncio.sleep(0.5, b"%PDF"))
+        threaded = await _json_latencies_while(lambda: run_in_threadpool(render_exam_pdf, PAYLOAD))
+        pooled = await _json_latencies_while(lambda: pdf_renderer.render(PAYLOAD, wait=True))
+        return idle, threaded, pooled
+
+    try:
+        idle, threaded, pooled = asyncio.run(scenario())
+    finally:
+        pdf_renderer.shutdown()
+
+    for name, latencies in (("idle", idle), ("threadpool", threaded), ("process pool", pooled)):
+        print(f"\n{name:>12}: /ping p50 {np.percentile(latencies, 50):.2f} ms, "
+              f"p99 {np.percentile(latencies, 99):.2f} ms over {len(latencies)} requests")
+    # Typical latency stays at the idle level; the tail depends on how many
+    # cores the host leaves the API next to the render workers
+    assert np.percentile(pooled, 50) < np.percentile(idle, 50) + 10
+    assert np.percentile(pooled, 99) < np.percentile(threaded, 99)
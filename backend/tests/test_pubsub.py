@@ -0,0 +1,63 @@
+import asyncio
+
+from app.core.pubsub import MemoryBroker
+from app.services import exam_events
+from app.services.exam_events import exam_topic, publish_exam_event, watch_exam
+
+
+def test_a_full_queue_drops_its_oldest_message():
+    async def scenario():
+        broker = MemoryBroker(queue_size=2)
+        subscription = await broker.subscribe("t")
+        for n in range(3):
+            await broker.publish("t", {"n": n})
+        received = [await subscription.get(timeout=1) for _ in range(2)]
+        return received, subscription.dropped, await subscription.get(timeout=0.01)
+
+    received, dropped, empty = asyncio.run(scenario())
+    assert received == [{"n": 1}, {"n": 2}]
+    assert dropped == 1
+    assert empty is None
+
+
+def test_watch_exam_sends_the_snapshot_first_then_events(monkeypatch):
+    monkeypatch.setattr(exam_events, "broker", MemoryBroker())
+
+    async def snapshot():
+        # Published while the snapshot is taken: must still reach the watcher, after it
+        await publish_exam_event(1, "started", student_id=7)
+        return {"active_sessions": 0}
+
+    async def scenario():
+        feed = watch_exam(1, snapshot, keepalive=0.01)
+        first = await feed.__anext__()
+        second = await feed.__anext__()
+        await publish_exam_event(1, "submitted", student_id=7)
+        third = await feed.__anext__()
+        keepalive = await feed.__anext__()
+        await feed.aclose()
+        return first, second, third, keepalive
+
+    first, second, third, keepalive = asyncio.run(scenario())
+    assert (first["type"], first["active_sessions"]) == ("snapshot", 0)
+    assert (second["type"], second["student_id"]) == ("started", 7)
+    assert third["type"] == "submitted"
+    assert keepalive is None
+
+
+def test_a_disconnected_watcher_is_unsubscribed(monkeypatch):
+    broker = MemoryBroker()
+    monkeypatch.setattr(exam_events, "broker", broker)
+
+    async def snapshot():
+        return {}
+
+    async def scenario():
+        feed = watch_exam(1, snapshot, keepalive=60)
+        await feed.__anext__()
+        watching = broker.subscriber_count(exam_topic(1))
+        # What StreamingResponse does when the client goes away
+        await feed.aclose()
+        return watching, broker.subscriber_count(exam_topic(1)), await broker.publish(exam_topic(1), {"type": "graded"})
+
+    assert asyncio.run(scenario()) == (1, 0, 0)
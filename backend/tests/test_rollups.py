@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.rollups import ROLLUP_LEVELS, rebuild_rollups
+
+pytestmark = pytest.mark.postgres
+
+EXAM, CLASS, TEACHER, FIRST_STUDENT = 9900, 9900, 9900, 9901
+
+
+def _rollups(connection):
+    """Every non-empty rollup row, with the float sums rounded."""
+    rows = {}
+    for table, key_col, _ in ROLLUP_LEVELS:
+        for row in connection.execute(text(
+            f"SELECT {key_col}, count, total, total_sq, min_score, max_score, histogram FROM {table} WHERE count > 0"
+        )):
+            key, count, total, total_sq, low, high, histogram = row
+            rows[(table, key)] = (count, round(total, 6), round(total_sq, 4), low, high, list(histogram))
+    return rows
+
+
+def _assert_matches_rebuild(pg_engine):
+    with pg_engine.connect() as connection:
+        maintained = _rollups(connection)
+    with Session(pg_engine) as db:
+        rebuild_rollups(db)
+    with pg_engine.connect() as connection:
+        assert maintained == _rollups(connection)
+
+
+def test_trigger_keeps_rollups_equal_to_a_rebuild(pg_engine):
+    with pg_engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 't', 't9900@example.com', 'teacher')"), {"id": TEACHER})
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (:id, 'c', :t)"), {"id": CLASS, "t": TEACHER})
+        connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (:e, :t, :c, 't', 'graded')"),
+                           {"e": EXAM, "t": TEACHER, "c": CLASS})
+        for i in range(4):
+            connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 's', :email, 'student')"),
+                               {"id": FIRST_STUDENT + i, "email": f"s{FIRST_STUDENT + i}@example.com"})
+
+    def write(sql, **params):
+        with pg_engine.begin() as connection:
+            connection.execute(text(sql), {"e": EXAM, **params})
+        _assert_matches_rebuild(pg_engine)
+
+    insert = "INSERT INTO marks (student_id, exam_id, total_marks, results, max_marks) VALUES (:s, :e, :t, '{}', 40)"
+    for i, total in enumerate((10, 25, 40, 33)):
+        write(insert, s=FIRST_STUDENT + i, t=total)
+    # Moves a score without touching the extremes, then lowers the maximum below the minimum
+    write("UPDATE marks SET total_marks = 38 WHERE exam_id = :e AND student_id = :s", s=FIRST_STUDENT + 1)
+    write("UPDATE marks SET total_marks = 4 WHERE exam_id = :e AND student_id = :s", s=FIRST_STUDENT + 2)
+    # Deleting the current minimum, then the current maximum, forces the rescan
+    write("DELETE FROM marks WHERE exam_id = :e AND student_id = :s", s=FIRST_STUDENT + 2)
+    write("DELETE FROM marks WHERE exam_id = :e AND student_id = :s", s=FIRST_STUDENT + 1)
+    with pg_engine.connect() as connection:
+        low, high = connection.execute(text("SELECT min_score, max_score FROM exam_rollups WHERE exam_id = :e"), {"e": EXAM}).one()
+    assert (low, high) == (25.0, 82.5)
@@ -0,0 +1,67 @@
+import asyncio
+import importlib.util
+import time
+
+import pytest
+
+from app.core.redis_client import get_redis
+from app.core import sessions
+from app.core.sessions import MemorySessionStore
+
+
+def test_memory_session_lifecycle():
+    async def scenario():
+        store = MemorySessionStore()
+        session = await store.create(7, ttl=60, student_id=3)
+        assert await store.validate(session["token"], 7, 3)
+        assert not await store.validate(session["token"], 7, 4)
+        assert not await store.validate(session["token"], 8, 3)
+        assert [s["token"] for s in await store.active_for_exam(7)] == [session["token"]]
+        assert await store.expire_exam(7) == 1
+        assert not await store.validate(session["token"], 7, 3)
+
+    asyncio.run(scenario())
+
+
+def test_expired_sessions_are_rejected(monkeypatch):
+    async def scenario():
+        store = MemorySessionStore()
+        session = await store.create(7, ttl=60, student_id=3)
+        later = time.time() + 61
+        monkeypatch.setattr(sessions.time, "time", lambda: later)
+        assert not await store.validate(session["token"], 7, 3)
+        assert await store.active_for_exam(7) == []
+
+    asyncio.run(scenario())
+
+
+def test_tokens_are_bound_to_one_student():
+    async def scenario():
+        store = MemorySessionStore()
+        with pytest.raises(ValueError):
+            await store.create(7, ttl=60, student_id=None)
+        with pytest.raises(ValueError):
+            await store.create(7, ttl=-60, student_id=3)
+        session = await store.create(5, ttl=60, student_id=123)
+        assert await store.validate(session["token"], 5, 123)
+        assert not await store.validate(session["token"], 5, 999)
+        assert not await store.validate(session["token"], 5, None)
+
+    asyncio.run(scenario())
+
+
+def test_start_rejects_unbounded_durations_and_anonymous_sessions():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    client = TestClient(main.app)
+    for query in ("student_id=3&duration_minutes=0", "student_id=3&duration_minutes=-5",
+                  "student_id=3&duration_minutes=100000000", "duration_minutes=60"):
+        assert client.post(f"/api/v1/exams/1/start?{query}").status_code == 422
+
+
+@pytest.mark.skipif(importlib.util.find_spec("redis") is not None, reason="redis is installed")
+def test_redis_backends_name_the_setting_when_redis_is_missing():
+    with pytest.raises(RuntimeError, match="SESSION_BACKEND=redis"):
+        get_redis("SESSION_BACKEND")
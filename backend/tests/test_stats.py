@@ -0,0 +1,74 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.models.models import ExamRollup
+from app.services.stats import summarize_scores, summary_from_rollup
+
+# Fields a rollup reproduces exactly; the median and percentiles are estimated
+EXACT_FIELDS = ("count", "mean", "std_dev", "min", "max", "pass_rate", "histogram")
+
+
+def rollup_of(scores):
+    """An exam_rollups row as the trigger would leave it for these percentage scores."""
+    histogram = [0] * 10
+    for score in scores:
+        histogram[min(max(int(score // 10), 0), 9)] += 1
+    return SimpleNamespace(count=len(scores), total=sum(scores), total_sq=sum(s * s for s in scores),
+                           min_score=min(scores), max_score=max(scores), histogram=histogram)
+
+
+def test_out_of_range_scores_land_in_the_end_buckets():
+    histogram = summarize_scores([45, -4, 10, 40], [40, 40, 40, 40])["histogram"]
+    assert [bucket["count"] for bucket in histogram] == [1, 0, 1, 0, 0, 0, 0, 0, 0, 2]
+
+
+def test_rollup_summary_matches_the_numpy_summary():
+    rng = random.Random(5)
+    totals = [rng.randint(0, 40) for _ in range(300)]
+    expected = summarize_scores(totals, [40] * len(totals))
+    summary = summary_from_rollup(rollup_of([t * 100 / 40 for t in totals]))
+    for field in EXACT_FIELDS:
+        assert summary[field] == pytest.approx(expected[field], abs=0.01), field
+    # Interpolated within a 10-point bucket
+    assert summary["median"] == pytest.approx(expected["median"], abs=10)
+    for name, value in expected["percentiles"].items():
+        assert summary["percentiles"][name] == pytest.approx(value, abs=10)
+
+
+def test_an_exam_without_rollup_has_an_empty_summary():
+    assert summary_from_rollup(None)["count"] == 0
+
+
+@pytest.mark.postgres
+def test_trigger_maintained_summary_matches_numpy_summary(pg_engine):
+    rng = random.Random(3)
+    scores = [(rng.randint(0, 40), 40) for _ in range(200)] + [(40, 40), (0, 0), (44, 40)]
+    with pg_engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (9100, 't', 't9100@example.com', 'teacher')"))
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (9100, 'c', 9100)"))
+        connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (9100, 9100, 9100, 't', 'graded')"))
+        for i, (total, maximum) in enumerate(scores):
+            connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 's', :email, 'student')"),
+                               {"id": 9200 + i, "email": f"s{9200 + i}@example.com"})
+            connection.execute(text(
+                "INSERT INTO marks (student_id, exam_id, total_marks, results, max_marks) VALUES (:s, 9100, :t, '{}', :m)"
+            ), {"s": 9200 + i, "t": total, "m": maximum})
+    with Session(pg_engine) as db:
+        summary = summary_from_rollup(db.get(ExamRollup, 9100))
+
+    expected = summarize_scores([t for t, _ in scores], [m for _, m in scores])
+    for field in EXACT_FIELDS:
+        assert summary[field] == pytest.approx(expected[field], abs=0.01), field
+
+
+def test_cursor_header_is_readable_cross_origin():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    response = TestClient(main.app).get("/no-such-route", headers={"Origin": "http://localhost:5173"})
+    assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import main
+from app.api.v1 import exams
+from app.core.cache import MemoryBackend, ReadThroughCache
+from app.schemas.exams import Answer, ExamSubmitRequest
+
+EXAM, STUDENT = 9800, 9801
+
+
+@pytest.fixture
+def submissions(monkeypatch):
+    """Accepts any session token and records the submissions that reach the database."""
+    calls = []
+
+    async def validate(token, exam_id, student_id):
+        return True
+
+    async def submit_answers(exam_id, payload):
+        calls.append(payload)
+        return json.dumps({"submission_id": len(calls), "partial_grades": [], "status": "received"}).encode("utf-8")
+
+    monkeypatch.setattr(exams.session_store, "validate", validate)
+    monkeypatch.setattr(exams, "_submit_answers", submit_answers)
+    monkeypatch.setattr(exams, "submission_results", ReadThroughCache("exam-submissions", ttl=60, backend=MemoryBackend()))
+    return calls
+
+
+def _payload(response):
+    return {"session_token": "t", "student_id": STUDENT, "answers": [{"question_id": 1, "response": response}]}
+
+
+def test_a_replayed_key_returns_the_stored_response(submissions):
+    client = TestClient(main.app)
+    first = client.post(f"/api/v1/exams/{EXAM}/submit", json=_payload("a"), headers={"Idempotency-Key": "k1"})
+    replay = client.post(f"/api/v1/exams/{EXAM}/submit", json=_payload("a"), headers={"Idempotency-Key": "k1"})
+    assert first.status_code == replay.status_code == 200
+    assert replay.content == first.content
+    assert first.json()["submission_id"] == 1
+    assert len(submissions) == 1
+
+    other = client.post(f"/api/v1/exams/{EXAM}/submit", json=_payload("a"), headers={"Idempotency-Key": "k2"})
+    assert other.json()["submission_id"] == 2
+
+
+def test_a_key_reused_with_other_answers_is_rejected(submissions):
+    client = TestClient(main.app)
+    client.post(f"/api/v1/exams/{EXAM}/submit", json=_payload("a"), headers={"Idempotency-Key": "k1"})
+    reused = client.post(f"/api/v1/exams/{EXAM}/submit", json=_payload("b"), headers={"Idempotency-Key": "k1"})
+    assert reused.status_code == 422
+    assert len(submissions) == 1
+
+
+@pytest.mark.postgres
+def test_a_resubmission_overwrites_the_same_rows(pg_engine, pg_async_url, monkeypatch):
+    with pg_engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (9800, 't', 't9800@example.com', 'teacher')"))
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:s, 's', 's9801@example.com', 'student')"), {"s": STUDENT})
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (9800, 'c', 9800)"))
+        connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (:e, 9800, 9800, 't', 'published')"), {"e": EXAM})
+        connection.execute(text("INSERT INTO questions (id, exam_id, mcq) VALUES (9800, :e, CAST(:mcq AS jsonb))"), {
+            "e": EXAM,
+            "mcq": json.dumps([{"question": "Q0", "options": ["a", "b"], "correct_answer": "a"},
+                               {"question": "Q1", "options": ["a", "b"], "correct_answer": "b"}]),
+        })
+        item_ids = connection.execute(text("SELECT id FROM question_items WHERE question_id = 9800 ORDER BY position")).scalars().all()
+
+    async def submit_twice():
+        engine = create_async_engine(pg_async_url)
+        monkeypatch.setattr(exams, "AsyncSessionLocal", async_sessionmaker(bind=engine, expire_on_commit=False, class_=AsyncSession))
+        try:
+            results = []
+            for responses in (["b", "b"], ["a", "b"]):
+                results.append(json.loads(await exams._submit_answers(EXAM, ExamSubmitRequest(
+                    session_token="t", student_id=STUDENT,
+                    answers=[Answer(item_id=item_id, response=r) for item_id, r in zip(item_ids, responses)],
+                ))))
+            return results
+        finally:
+            await engine.dispose()
+
+    first, second = asyncio.run(submit_twice())
+    assert second["submission_id"] == first["submission_id"]
+    assert [g["marks_obtained"] for g in second["partial_grades"]] == [1, 1]
+    with pg_engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT item_id, response, marks_obtained FROM student_responses WHERE exam_id = :e AND student_id = :s ORDER BY item_id"
+        ), {"e": EXAM, "s": STUDENT}).all()
+    assert [tuple(row) for row in rows] == [(item_ids[0], "a", 1), (item_ids[1], "b", 1)]
@@ -0,0 +1,115 @@
+"""
+Submission at the bell: every student of a class submits a 40-question
+paper at once, per-answer (query + commit + refresh per answer, as the
+route did before) vs the batched _submit_answers path.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1 import exams
+from app.models.models import QuestionItem, StudentResponse
+from app.schemas.exams import Answer, ExamSubmitRequest
+
+pytestmark = [pytest.mark.postgres, pytest.mark.benchmark]
+
+QUESTIONS, STUDENTS = 40, 30
+TEACHER, PER_ANSWER_EXAM, BATCHED_EXAM, FIRST_STUDENT = 9300, 9300, 9301, 9450
+
+
+def _seed(engine):
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 't', 't9300@example.com', 'teacher')"), {"id": TEACHER})
+        connection.execute(text("INSERT INTO classes (id, name, teacher_id) VALUES (:id, 'c', :id)"), {"id": TEACHER})
+        for sid in range(FIRST_STUDENT, FIRST_STUDENT + STUDENTS):
+            connection.execute(text("INSERT INTO users (id, name, email, role) VALUES (:id, 's', :email, 'student')"),
+                               {"id": sid, "email": f"s{sid}@example.com"})
+        for exam_id in (PER_ANSWER_EXAM, BATCHED_EXAM):
+            connection.execute(text("INSERT INTO exams (id, teacher_id, class_id, title, status) VALUES (:e, :t, :t, 'bench', 'published')"),
+                               {"e": exam_id, "t": TEACHER})
+            for q in range(QUESTIONS):
+                connection.execute(text("INSERT INTO questions (exam_id, mcq) VALUES (:e, CAST(:mcq AS jsonb))"), {
+                    "e": exam_id, "mcq": f'[{{"question": "Q{q}", "options": ["a", "b"], "correct_answer": "a"}}]',
+                })
+        return {
+            exam_id: connection.execute(text("SELECT id FROM questions WHERE exam_id = :e ORDER BY id"), {"e": exam_id}).scalars().all()
+            for exam_id in (PER_ANSWER_EXAM, BATCHED_EXAM)
+        }
+
+
+def _count_round_trips(sync_engine, counter):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def on_execute(*args):
+        counter[0] += 1
+
+    @event.listens_for(sync_engine, "commit")
+    def on_commit(*args):
+        counter[0] += 1
+
+
+def _submit_per_answer(Session, exam_id, student_id, question_ids):
+    started = time.perf_counter()
+    with Session() as db:
+        for question_id in question_ids:
+            item = db.query(QuestionItem).filter(QuestionItem.exam_id == exam_id, QuestionItem.question_id == question_id).first()
+            row = StudentResponse(student_id=student_id, exam_id=exam_id, question_id=question_id,
+                                  item_id=item.id, response="a", marks_obtained=1)
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+    return time.perf_counter() - started
+
+
+def test_batched_submission_round_trips_and_latency(pg_engine, pg_async_url, monkeypatch):
+    question_ids = _seed(pg_engine)
+    students = range(FIRST_STUDENT, FIRST_STUDENT + STUDENTS)
+
+    # Before: sync engine with the app's 5+10 pool, one threadpool worker per request
+    engine = create_engine(pg_engine.url, pool_size=5, max_overflow=10)
+    before_trips = [0]
+    _count_round_trips(engine, before_trips)
+    Session = sessionmaker(bind=engine)
+    with ThreadPoolExecutor(STUDENTS) as pool:
+        before = list(pool.map(lambda sid: _submit_per_answer(Session, PER_ANSWER_EXAM, sid, question_ids[PER_ANSWER_EXAM]), students))
+    engine.dispose()
+
+    # After: the route's batched path on the async engine
+    after_trips = [0]
+    async_engine = create_async_engine(pg_async_url, pool_size=5, max_overflow=10)
+    _count_round_trips(async_engine.sync_engine, after_trips)
+    monkeypatch.setattr(exams, "AsyncSessionLocal", async_sessionmaker(bind=async_engine, expire_on_commit=False, class_=AsyncSession))
+
+    async def batched():
+        async def submit(sid):
+            started = time.perf_counter()
+            await exams._submit_answers(BATCHED_EXAM, ExamSubmitRequest(
+                session_token="bench", student_id=sid,
+                answers=[Answer(question_id=qid, response="a") for qid in question_ids[BATCHED_EXAM]],
+            ))
+            return time.perf_counter() - started
+
+        try:
+            return await asyncio.gather(*(submit(sid) for sid in students))
+        finally:
+            await async_engine.dispose()
+
+    after = asyncio.run(batched())
+
+    with pg_engine.connect() as connection:
+        counts = dict(connection.execute(text(
+            "SELECT exam_id, count(*) FROM student_responses WHERE exam_id IN (:a, :b) GROUP BY exam_id"
+        ), {"a": PER_ANSWER_EXAM, "b": BATCHED_EXAM}).all())
+    assert counts == {PER_ANSWER_EXAM: QUESTIONS * STUDENTS, BATCHED_EXAM: QUESTIONS * STUDENTS}
+
+    before_p99, after_p99 = np.percentile(before, 99) * 1000, np.percentile(after, 99) * 1000
+    print(f"\nper-answer: {before_trips[0] / STUDENTS:.0f} round-trips/submission, p99 {before_p99:.1f} ms"
+          f"\nbatched:    {after_trips[0] / STUDENTS:.0f} round-trips/submission, p99 {after_p99:.1f} ms")
+    assert before_trips[0] / STUDENTS >= 3 * QUESTIONS
+    assert after_trips[0] / STUDENTS <= 6
+    assert after_p99 < before_p99
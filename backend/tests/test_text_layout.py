@@ -0,0 +1,89 @@
+import random
+import time
+
+import pytest
+from reportlab.pdfbase.pdfmetrics import stringWidth  # type: ignore
+
+from app.services.text_layout import plan_lines, wrap_text
+
+FONT, SIZE, LINE_HEIGHT = "Helvetica", 11, 14
+BREAK_BELOW, RESUME_Y = 54 + 50, 792 - 54 - 30
+WORDS = ("photosynthesis light energy chlorophyll the a of in plant cells convert carbon dioxide and water "
+         "into glucose oxygen mitochondria membrane respiration W").split()
+
+
+def sample_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def old_draw_wrapped_text(text, y, max_w):
+    """The renderer's loop before text_layout: (event, value) for each line drawn or page started."""
+    events = []
+    line = ""
+    for word in text.split():
+        if stringWidth(line + " " + word, FONT, SIZE) < max_w:
+            line += " " + word
+        else:
+            events.append(("line", line.strip(), y))
+            y -= LINE_HEIGHT
+            if y < BREAK_BELOW:
+                events.append(("page", None, None))
+                y = RESUME_Y
+            line = word
+    if line:
+        events.append(("line", line.strip(), y))
+        y -= LINE_HEIGHT
+    return events, y
+
+
+def new_draw_wrapped_text(text, y, max_w):
+    events = []
+    lines = wrap_text(text, max_w, FONT, SIZE)
+    positions, y = plan_lines(len(lines), y, LINE_HEIGHT, BREAK_BELOW, RESUME_Y)
+    for line, (page_break, line_y) in zip(lines, positions):
+        if page_break:
+            events.append(("page", None, None))
+        events.append(("line", line, line_y))
+    return events, y
+
+
+@pytest.mark.parametrize("max_w", [120, 300, 485.5])
+def test_wrap_text_matches_the_old_wrapping(max_w):
+    rng = random.Random(max_w)
+    for _ in range(50):
+        text = sample_text(rng, rng.randint(1, 120))
+        old = [value for event, value, _ in old_draw_wrapped_text(text, 10_000, max_w)[0] if event == "line"]
+        assert wrap_text(text, max_w, FONT, SIZE) == old
+
+
+def test_a_word_wider_than_the_line_gets_its_own_line():
+    assert wrap_text("a supercalifragilistic b", 40, FONT, SIZE) == ["a", "supercalifragilistic", "b"]
+
+
+@pytest.mark.parametrize("start_y", [RESUME_Y, 300, BREAK_BELOW + 20, BREAK_BELOW + 1])
+def test_plan_lines_breaks_pages_where_the_old_loop_did(start_y):
+    rng = random.Random(start_y)
+    for _ in range(20):
+        text = sample_text(rng, rng.randint(1, 600))
+        assert new_draw_wrapped_text(text, start_y, 300) == old_draw_wrapped_text(text, start_y, 300)
+
+
+@pytest.mark.benchmark
+def test_large_paper_layout_throughput():
+    rng = random.Random(0)
+    # 200 questions of ~150 words each
+    paper = [sample_text(rng, 150) for _ in range(200)]
+
+    started = time.perf_counter()
+    for text in paper:
+        old_draw_wrapped_text(text, RESUME_Y, 485.5)
+    old_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for text in paper:
+        new_draw_wrapped_text(text, RESUME_Y, 485.5)
+    new_elapsed = time.perf_counter() - started
+
+    print(f"laid out 200 questions in {new_elapsed * 1000:.1f} ms (old loop {old_elapsed * 1000:.1f} ms)")
+    assert new_elapsed < old_elapsed
+    assert new_elapsed < 1.0
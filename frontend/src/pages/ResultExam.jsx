@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { motion } from 'framer-motion';
 import { 
   FileDown, RefreshCw, Search, Trophy, 
@@ -20,6 +20,49 @@ const StatCard = ({ icon: Icon, label, value, color, bg }) => (
   </div>
 );
 
+// Grade calculation (kept as is)
+const calculateGrade = (percentage) => {
+  if (percentage >= 90) return 'A+';
+  if (percentage >= 80) return 'A';
+  if (percentage >= 70) return 'B+';
+  if (percentage >= 60) return 'B';
+  if (percentage >= 50) return 'C';
+  return 'F';
+};
+
+// One table row from a student's marks
+const toStudentRow = (id, name, total, max) => {
+  const percentage = max > 0 ? (total / max) * 100 : 0;
+  return {
+    id,
+    rollNo: `STU${String(id).padStart(3, "0")}`,
+    name,
+    marks: total,
+    total: max,
+    grade: calculateGrade(percentage),
+    status: percentage >= 50 ? "Pass" : "Fail"
+  };
+};
+
+// Header stats computed from the rows on screen
+const computeTotals = (students) => {
+  const totalStudents = students.length;
+  const averageScore = totalStudents > 0
+    ? Math.round(
+        students.reduce(
+          (acc, s) => acc + (s.total > 0 ? (s.marks / s.total) * 100 : 0),
+          0
+        ) / totalStudents
+      )
+    : 0;
+  // "Highest Score" is the best single student's marks
+  const highestScore = Math.max(...students.map(s => s.marks), 0);
+  const passPercentage = totalStudents > 0 ? Math.round(
+    (students.filter(s => s.status === "Pass").length / totalStudents) * 100
+  ) : 0;
+  return { totalStudents, averageScore, highestScore, passPercentage };
+};
+
 const ResultExam = () => {
   const navigate = useNavigate();
   const { exam_id } = useParams();
@@ -37,6 +80,10 @@ const ResultExam = () => {
   });
 
   const [students, setStudents] = useState([]);
+  // Latest rows, for applying live events outside React's render cycle
+  const studentsRef = useRef([]);
+  // Who is sitting the exam right now, from the live feed
+  const [live, setLive] = useState({ inProgress: [], submitted: [], lastSavedAt: null, closed: false });
 
   // ================================
   // FETCH API DATA (Logic remains the same)
@@ -69,53 +116,23 @@ const ResultExam = () => {
           grouped[item.student_id].max += item.max_marks;
         });
 
-        // Grade calculation (kept as is)
-        const calculateGrade = (percentage) => {
-          if (percentage >= 90) return 'A+';
-          if (percentage >= 80) return 'A';
-          if (percentage >= 70) return 'B+';
-          if (percentage >= 60) return 'B';
-          if (percentage >= 50) return 'C';
-          return 'F';
-        };
-
         // Process each student
-        const processedStudents = Object.values(grouped).map(student => {
-          const percentage = student.max > 0 
-            ? (student.total / student.max) * 100 
-            : 0;
-
-          return {
-            id: student.id,
-            rollNo: `STU${String(student.id).padStart(3, "0")}`,
-            name: student.name,
-            marks: student.total,
-            total: student.max,
-            grade: calculateGrade(percentage),
-            status: percentage >= 50 ? "Pass" : "Fail"
-          };
-        });
+        const processedStudents = Object.values(grouped).map(student =>
+          toStudentRow(student.id, student.name, student.total, student.max)
+        );
 
         processedStudents.sort((a, b) => b.marks - a.marks);
 
         // Compute global exam stats
+        // Prefer the server-side summary; fall back to client-side for older APIs
+        const summary = data.summary;
+        const clientTotals = computeTotals(processedStudents);
         const totalStudents = processedStudents.length;
-        const averageScore = totalStudents > 0
-          ? Math.round(
-              processedStudents.reduce(
-                (acc, s) => acc + (s.marks / s.total) * 100,
-                0
-              ) / totalStudents
-            )
-          : 0;
-
-        const highestScore = Math.max(...processedStudents.map(s => s.marks), 0);
-        // Assuming max possible score is for all students is the max score of a single student * total students,
-        // but the current logic is to just take the highest student's score, which is correct for "Highest Score" display.
-        const passPercentage = totalStudents > 0 ? Math.round(
-          (processedStudents.filter(s => s.status === "Pass").length / totalStudents) * 100
-        ) : 0;
+        const averageScore = summary ? Math.round(summary.mean) : clientTotals.averageScore;
+        const highestScore = clientTotals.highestScore;
+        const passPercentage = summary ? Math.round(summary.pass_rate) : clientTotals.passPercentage;
 
+        studentsRef.current = processedStudents;
         setStudents(processedStudents);
         setExamStats(prev => ({
           ...prev,
@@ -134,6 +151,61 @@ const ResultExam = () => {
     };
 
     fetchExamStats();
+
+    // Live feed: a single student's grade arrives in the event itself and is
+    // applied in place; only grade-all (no student_id) needs a fresh /stats
+    const events = new EventSource(`http://localhost:8000/api/v1/exams/${exam_id}/live`);
+    let refreshTimer;
+    const without = (ids, id) => ids.filter(other => other !== id);
+    events.addEventListener('snapshot', (event) => {
+      const snapshot = JSON.parse(event.data);
+      setLive(state => ({ ...state, inProgress: snapshot.student_ids }));
+    });
+    events.addEventListener('started', (event) => {
+      const { student_id } = JSON.parse(event.data);
+      setLive(state => ({ ...state, inProgress: [...without(state.inProgress, student_id), student_id] }));
+    });
+    events.addEventListener('autosaved', (event) => {
+      const { at } = JSON.parse(event.data);
+      setLive(state => ({ ...state, lastSavedAt: at }));
+    });
+    events.addEventListener('submitted', (event) => {
+      const { student_id } = JSON.parse(event.data);
+      setLive(state => ({
+        ...state,
+        inProgress: without(state.inProgress, student_id),
+        submitted: [...without(state.submitted, student_id), student_id]
+      }));
+    });
+    events.addEventListener('closed', () => {
+      setLive(state => ({ ...state, inProgress: [], closed: true }));
+    });
+    events.addEventListener('graded', (event) => {
+      const graded = JSON.parse(event.data);
+      if (graded.student_id == null) {
+        clearTimeout(refreshTimer);
+        refreshTimer = setTimeout(fetchExamStats, 1000);
+        return;
+      }
+      const prev = studentsRef.current;
+      const existing = prev.find(s => s.id === graded.student_id);
+      const row = toStudentRow(
+        graded.student_id,
+        existing ? existing.name : `Student ${graded.student_id}`,
+        graded.total_marks,
+        graded.max_marks
+      );
+      const next = [...prev.filter(s => s.id !== graded.student_id), row];
+      next.sort((a, b) => b.marks - a.marks);
+      studentsRef.current = next;
+      setStudents(next);
+      setExamStats(stats => ({ ...stats, ...computeTotals(next) }));
+    });
+
+    return () => {
+      clearTimeout(refreshTimer);
+      events.close();
+    };
   }, [exam_id]);
 
 
@@ -168,6 +240,12 @@ const ResultExam = () => {
                 <Zap size={14} className="text-cyan-400" /> 
                 Deployment ID: <span className="text-white font-mono">{exam_id}</span> | Date: {examStats.date}
             </p>
+            <p className="text-slate-400 text-sm mt-1 flex items-center gap-2">
+                <Activity size={14} className={live.closed ? "text-slate-500" : "text-emerald-400 animate-pulse"} />
+                {live.closed ? "Exam closed" : `${live.inProgress.length} in progress`}
+                {" | "}{live.submitted.length} submitted
+                {live.lastSavedAt && ` | Last autosave ${new Date(live.lastSavedAt * 1000).toLocaleTimeString()}`}
+            </p>
           </div>
 
           